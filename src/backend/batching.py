@@ -0,0 +1,128 @@
+import asyncio
+from fastapi.concurrency import run_in_threadpool
+from metrics import Histogram, power_of_2_buckets
+
+# Micro-batching of concurrent single-record requests
+# Requests arriving within a few milliseconds of each other are scored with one predict_proba call
+# Every record is scored by the model it was submitted with (the serving model of its request), so a batch straddling
+# a model swap is scored with one call per model
+
+
+class MicroBatcher:
+    def __init__(self, score, max_wait_ms=5, max_batch_size=64, max_concurrent_batches=1):
+        self.score = score # (model, list of records) -> list of probabilities
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self.max_concurrent_batches = max_concurrent_batches # >1 only pays off with several scoring processes
+        self.batch_sizes = Histogram(power_of_2_buckets(max_batch_size))
+        self._queue = None
+        self._task = None
+        self._slots = None
+        self._scoring_tasks = set()
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.gather(*self._scoring_tasks, return_exceptions=True)
+
+        # Fail the requests still waiting in the queue
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, record, model=None):
+        # Queue the record & wait for its probability
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((record, model, future))
+        return await future
+
+    async def _collect(self):
+        # Wait for a first request, then gather more until the window closes or the batch is full
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+
+        # A lone request with nothing being scored is dispatched right away (no waiting window under low load)
+        if self._queue.empty() and not self._scoring_tasks:
+            return batch
+        deadline = loop.time() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            # Requests already queued are taken without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            # While all the scoring slots are busy, requests keep queuing up for the next batch
+            await self._slots.acquire()
+            batch = await self._collect()
+            batch = [item for item in batch if not item[-1].done()] # skip cancelled requests
+            if not batch:
+                self._slots.release()
+                continue
+            self.batch_sizes.observe(len(batch))
+            task = asyncio.create_task(self._score_batch(batch))
+            self._scoring_tasks.add(task)
+            task.add_done_callback(self._scoring_tasks.discard)
+
+    async def _score_batch(self, batch):
+        try:
+            groups = {}
+            for record, model, future in batch:
+                groups.setdefault(model, []).append((record, future))
+            for model, items in groups.items():
+                await self._score_items(model, items)
+        finally:
+            self._slots.release()
+
+    async def _score_items(self, model, items):
+        records = [record for record, _ in items]
+        try:
+            probs = await run_in_threadpool(self.score, model, records)
+        except Exception:
+            # An invalid record fails the whole batch, so the records are scored one by one
+            for record, future in items:
+                try:
+                    prob = (await run_in_threadpool(self.score, model, [record]))[0]
+                except Exception as e:
+                    _resolve(future, exception=e)
+                    continue
+                _resolve(future, result=prob)
+            return
+        for (_, future), prob in zip(items, probs):
+            _resolve(future, result=prob)
+
+    def stats(self):
+        return {
+            "max_wait_ms": self.max_wait_ms,
+            "max_batch_size": self.max_batch_size,
+            "max_concurrent_batches": self.max_concurrent_batches,
+            "batch_size": self.batch_sizes.snapshot(),
+        }
+
+
+# Resolve a request future unless its caller has gone away
+def _resolve(future, result=None, exception=None):
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
@@ -0,0 +1,89 @@
+# Columnar (Arrow IPC) ingest against the JSON body of /predict_batch: decode & validation time, scoring time & parity
+# Run from src/backend: python -m benchmarks.arrow_ingest [--sizes 1000 10000 100000] [--invalid 0.01]
+import json
+import argparse
+import warnings
+import numpy as np
+import pyarrow as pa
+
+from config import MODEL_ARTIFACT_DIR
+from benchmarks.suite import time_calls
+from benchmarks.synthetic import generate_records
+from data_preprocessing.artifact import load_artifact
+from columnar import ARROW_STREAM_TYPE, read_table, validate_table, to_columns
+from routers.predict import INPUT_DOMAINS, parse_batch_body, validate_records
+
+
+# Request bodies of the same records: a JSON list & an Arrow IPC stream
+def build_bodies(X):
+    table = pa.Table.from_pandas(X, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return X.to_json(orient="records").encode(), sink.getvalue().to_pybytes()
+
+
+# Scorer inputs (& errors per row) of the JSON path: decode, pydantic validation & record dicts
+def ingest_json(body):
+    records, errors = validate_records(parse_batch_body(body, "application/json"))
+    return [record.model_dump() for record in records.values()], sorted(records), errors
+
+
+# Scorer inputs (& errors per row) of the columnar path: IPC read, column checks & arrays
+def ingest_arrow(body):
+    valid_table, rows, errors = validate_table(read_table(body, ARROW_STREAM_TYPE), INPUT_DOMAINS)
+    return to_columns(valid_table, INPUT_DOMAINS), rows.tolist(), errors
+
+
+# Same rows rejected, for the same fields & error types, & same probabilities for the others
+def check_parity(scorer, json_body, arrow_body):
+    json_records, json_rows, json_errors = ingest_json(json_body)
+    columns, arrow_rows, arrow_errors = ingest_arrow(arrow_body)
+    same_errors = json_rows == arrow_rows and all(
+        [(error["loc"][0], error["type"]) for error in json_errors[row]] == [(error["loc"][0], error["type"]) for error in arrow_errors[row]]
+        for row in json_errors
+    ) and sorted(json_errors) == sorted(arrow_errors)
+    max_diff = float(np.abs(scorer.predict_proba(json_records)[:, 1] - scorer.predict_proba(columns)[:, 1]).max())
+    return same_errors, max_diff, len(json_errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arrow IPC ingest vs JSON ingest of bulk scoring requests")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--invalid", type=float, default=0.01, help="fraction of rows with an out-of-domain value")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--atol", type=float, default=1e-12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.filterwarnings(action="ignore", category=UserWarning)
+
+    scorer = load_artifact(MODEL_ARTIFACT_DIR)
+    X_all = generate_records(max(args.sizes), args.seed)
+    rng = np.random.default_rng([args.seed, 3])
+    invalid = rng.random(len(X_all)) < args.invalid
+    X_all.loc[invalid & (rng.random(len(X_all)) < 0.5), "sub_grade"] = "Z9"
+    X_all.loc[invalid & ~X_all["sub_grade"].eq("Z9"), "int_rate"] = 150.0
+
+    all_ok = True
+    print(f"{'rows':>8}{'json body (MB)':>16}{'arrow body (MB)':>17}{'json ingest (ms)':>18}{'arrow ingest (ms)':>19}"
+          f"{'speedup':>9}{'json score (ms)':>17}{'arrow score (ms)':>18}{'errors':>8}{'same errors':>13}{'max diff':>10}")
+    for size in args.sizes:
+        json_body, arrow_body = build_bodies(X_all.iloc[:size])
+        same_errors, max_diff, n_errors = check_parity(scorer, json_body, arrow_body)
+        all_ok = all_ok and same_errors and max_diff <= args.atol
+
+        json_inputs, arrow_inputs = ingest_json(json_body)[0], ingest_arrow(arrow_body)[0]
+        json_s = np.median(time_calls(lambda _: ingest_json(json_body), repeats=args.repeats))
+        arrow_s = np.median(time_calls(lambda _: ingest_arrow(arrow_body), repeats=args.repeats))
+        json_score_s = np.median(time_calls(lambda _: scorer.predict_proba(json_inputs), repeats=args.repeats))
+        arrow_score_s = np.median(time_calls(lambda _: scorer.predict_proba(arrow_inputs), repeats=args.repeats))
+        print(f"{size:>8}{len(json_body) / 1e6:>16.2f}{len(arrow_body) / 1e6:>17.2f}{json_s * 1e3:>18.1f}{arrow_s * 1e3:>19.1f}"
+              f"{f'{json_s / arrow_s:.1f}x':>9}{json_score_s * 1e3:>17.1f}{arrow_score_s * 1e3:>18.1f}{n_errors:>8}"
+              f"{'yes' if same_errors else 'NO':>13}{max_diff:>10.1e}")
+
+    if not all_ok:
+        raise SystemExit("Columnar ingest differs from the JSON ingest")
+
+
+if __name__ == "__main__":
+    main()
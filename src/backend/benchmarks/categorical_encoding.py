@@ -0,0 +1,71 @@
+# Fitted categorical dictionaries vs per-call dict maps & category inference (CatEncoder ordinal encoding, DtypeConverter)
+# Run from src/backend: python -m benchmarks.categorical_encoding [--sizes 1 100 10000 1000000]
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_records
+from data_preprocessing.transformers import DataCleaner, CatEncoder, DtypeConverter
+
+
+# Ordinal encoding of the CatEncoder before the fitted dictionary (baseline, in-place)
+def legacy_ordinal_encoding(encoder, X):
+    X["term"] = X["term"].map(encoder.term_map)
+    X["grade"] = X["grade"].map(encoder.grade_map)
+    X["sub_grade"] = X["sub_grade"].map(encoder.sub_grade_map)
+    X["emp_length"] = X["emp_length"].map(encoder.emp_length_map)
+    return X
+
+
+# Dtype conversion of the DtypeConverter before the fitted categories (baseline, in-place)
+def legacy_dtype_conversion(X):
+    cat_feat = [feat for feat in X.columns if X[feat].dtype=="object"]
+    X[cat_feat] = X[cat_feat].astype("category")
+    return X
+
+
+# Median time (in microseconds) of an in-place call on fresh copies of a frame, repeated for about a second at most
+def time_call(call, X):
+    call(X.copy())
+    timings = []
+    deadline = time.perf_counter() + 1
+    while len(timings) < 3 or (time.perf_counter() < deadline and len(timings) < 1000):
+        X_call = X.copy()
+        start = time.perf_counter()
+        call(X_call)
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time of the ordinal encoding & dtype conversion with & without fitted dictionaries")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Cleaned synthetic records as training data (the dictionaries are fitted on them)
+    X_train = DataCleaner().transform(generate_records(max(args.sizes), args.seed))
+    X_train["address"] = X_train["address"].astype(object)
+    encoder = CatEncoder(copy=False).fit(X_train)
+    X_cat = X_train.drop(columns=["issue_d", "earliest_cr_line"])
+    converter = DtypeConverter(copy=False).fit(X_cat)
+
+    # Identical outputs on the training data
+    pd.testing.assert_frame_equal(encoder.transform(X_train.copy()), legacy_ordinal_encoding(encoder, X_train.copy()))
+    pd.testing.assert_frame_equal(converter.transform(X_cat.copy()), legacy_dtype_conversion(X_cat.copy()))
+    print("Outputs identical to the previous encoding on the training data\n")
+
+    print(f"{'rows':>10}{'ordinal map (us)':>18}{'fitted (us)':>14}{'dtype infer (us)':>18}{'fitted (us)':>14}{'inferred = fitted':>19}")
+    for size in args.sizes:
+        X = X_train.iloc[:size].copy()
+        X_small = X_cat.iloc[:size].copy()
+        legacy_categories = legacy_dtype_conversion(X_small.copy())["purpose"].cat.categories
+        same_categories = legacy_categories.equals(converter.dtypes_["purpose"].categories)
+        print(f"{size:>10}{time_call(lambda X: legacy_ordinal_encoding(encoder, X), X):>18.1f}{time_call(encoder.transform, X):>14.1f}"
+              f"{time_call(legacy_dtype_conversion, X_small):>18.1f}{time_call(converter.transform, X_small):>14.1f}"
+              f"{'yes' if same_categories else 'no':>19}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# Chunked (sketch-based) fit of the custom transformers against their exact in-memory fit: errors, bounds & timings
+# Run from src/backend: python -m benchmarks.chunked_fit [--rows 200000] [--chunk-size 20000] [--n-jobs 1 2]
+import time
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+from xgboost import XGBClassifier
+from sklearn.linear_model import LogisticRegression
+
+from benchmarks.synthetic import generate_records
+from benchmarks.suite import (NUMERICAL_FEATURES, ENGINEERED_FEATURES, ONEHOT_FEATURES, SUPERVISED_FEATURES,
+                              ORDINAL_FEATURES, FEATURES_TO_DROP, synthetic_target)
+from data_preprocessing.sketches import RELATIVE_ACCURACY
+from data_preprocessing.transformers import DataCleaner, FeatureEngineer, Imputer, OutlierHandler, Scaler, CatEncoder
+from data_preprocessing.preprocessor import build_pipeline, fit_in_chunks, fit_preprocessing_in_chunks
+
+CATEGORICAL_FEATURES = ONEHOT_FEATURES + SUPERVISED_FEATURES + ORDINAL_FEATURES
+
+
+# Chunks of (X, y) of a frame, as read from a file in chunks
+def make_chunks(X, y, chunk_size):
+    return lambda: ((X.iloc[start:start + chunk_size], y[start:start + chunk_size]) for start in range(0, len(X), chunk_size))
+
+
+# Order statistics an exact quantile interpolates between: the error bound of a sketched quantile scales with them
+def quantile_bound(values, q):
+    values = np.sort(values[~np.isnan(values)])
+    position = q * (len(values) - 1)
+    return RELATIVE_ACCURACY * max(abs(values[int(np.floor(position))]), abs(values[int(np.ceil(position))]))
+
+
+# Largest relative error of sketched statistics & whether every one of them is within its (absolute) bound
+def check_errors(exact, approx, bounds):
+    exact = np.asarray(exact, dtype=float)
+    errors = np.abs(np.asarray(approx, dtype=float) - exact)
+    relative_errors = errors / np.maximum(np.abs(exact), 1e-12)
+    return float(relative_errors.max()), bool(np.all(errors <= np.asarray(bounds) + 1e-12))
+
+
+def check_transformers(X, y, chunks, n_jobs):
+    fit_chunked = lambda transformer: fit_in_chunks(transformer, chunks(), n_jobs)
+    results = []
+
+    # Imputer: sketched medians, exact modes
+    imputer = Imputer(num_features=NUMERICAL_FEATURES, cat_features=CATEGORICAL_FEATURES)
+    exact, chunked = imputer.fit(X), fit_chunked(imputer)
+    bounds = [quantile_bound(X[feat].to_numpy(dtype=float), 0.5) for feat in NUMERICAL_FEATURES]
+    results.append(("imputer medians", *check_errors(exact.num_imputer_.statistics_, chunked.num_imputer_.statistics_, bounds)))
+    same_modes = list(exact.cat_imputer_.statistics_) == list(chunked.cat_imputer_.statistics_)
+    results.append(("imputer modes", 0.0 if same_modes else np.nan, same_modes))
+
+    # Outlier handler: sketched 98th percentiles
+    capper = OutlierHandler(features=NUMERICAL_FEATURES)
+    exact, chunked = capper.fit(X), fit_chunked(capper)
+    bounds = [quantile_bound(X[feat].to_numpy(dtype=float), 0.98) for feat in NUMERICAL_FEATURES]
+    results.append(("outlier caps", *check_errors(list(exact.bounds_.values()), list(chunked.bounds_.values()), bounds)))
+
+    # Scaler: sketched medians & IQR (bounded by the errors of both quartiles)
+    scaler = Scaler(features=NUMERICAL_FEATURES)
+    exact, chunked = scaler.fit(X), fit_chunked(scaler)
+    values = {feat: X[feat].to_numpy(dtype=float) for feat in NUMERICAL_FEATURES}
+    bounds = [quantile_bound(values[feat], 0.5) for feat in NUMERICAL_FEATURES]
+    results.append(("scaler centers", *check_errors(exact.scaler_.center_, chunked.scaler_.center_, bounds)))
+    bounds = [quantile_bound(values[feat], 0.25) + quantile_bound(values[feat], 0.75) for feat in NUMERICAL_FEATURES]
+    results.append(("scaler IQRs", *check_errors(exact.scaler_.scale_, chunked.scaler_.scale_, bounds)))
+
+    # Categorical encoder: exact target encodings (of the categories seen, missing & unknown ones) & one-hot categories
+    encoder = CatEncoder(ohe_features=ONEHOT_FEATURES, supervised_features=SUPERVISED_FEATURES)
+    exact, chunked = encoder.fit(X, y), fit_chunked(encoder)
+    X_unknown = X.iloc[:1].assign(**{feat: "unknown" for feat in SUPERVISED_FEATURES})
+    exact_encodings, chunked_encodings = [fitted.transform(pd.concat([X, X_unknown]))[SUPERVISED_FEATURES].to_numpy().ravel()
+                                          for fitted in (exact, chunked)]
+    results.append(("target encodings", *check_errors(exact_encodings, chunked_encodings, np.zeros(len(exact_encodings)))))
+    same_categories = all(list(a) == list(b) for a, b in zip(exact.ohe_encoder_.categories_, chunked.ohe_encoder_.categories_))
+    results.append(("one-hot categories", 0.0 if same_categories else np.nan, same_categories))
+    return results
+
+
+# Pipelines of build_pipeline with their model appended, as trained (the last step is left to fit on the chunked output)
+def get_pipelines():
+    common = dict(numerical_features=NUMERICAL_FEATURES, engineered_features=ENGINEERED_FEATURES,
+                  categorical_features=CATEGORICAL_FEATURES, ordinal_features=ORDINAL_FEATURES, features_to_drop=FEATURES_TO_DROP)
+    pipelines = {
+        "lr-like": (build_pipeline(**common, supervised_features=None, onehot_features=ONEHOT_FEATURES + SUPERVISED_FEATURES,
+                                   use_outlier_capping=False), LogisticRegression(max_iter=1000)),
+        "xgb-like": (build_pipeline(**common, supervised_features=SUPERVISED_FEATURES, onehot_features=ONEHOT_FEATURES,
+                                    use_imputation=False, use_scaling=False, convert_cat_dtype=True), XGBClassifier(n_estimators=10)),
+        # Categorical features left to XGBoost's native categorical support
+        "xgb-cat": (build_pipeline(**common, supervised_features=None, onehot_features=None, use_imputation=False,
+                                   use_encoding=False, use_scaling=False, convert_cat_dtype=True),
+                    XGBClassifier(n_estimators=10, enable_categorical=True)),
+    }
+    for pipeline, model in pipelines.values():
+        pipeline.steps.append(("model", model))
+    return {name: pipeline for name, (pipeline, _) in pipelines.items()}
+
+
+# Median time of a fit (in seconds)
+def time_fit(fit, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fit()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunked fit of the custom transformers vs their exact fit")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=20_000)
+    parser.add_argument("--n-jobs", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--missing", type=float, default=0.02, help="fraction of missing values per feature")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.filterwarnings(action="ignore", category=UserWarning)
+
+    # Synthetic records with missing values (except in the address, whose pincode is always extracted)
+    X_raw = generate_records(args.rows, args.seed)
+    rng = np.random.default_rng([args.seed, 2])
+    for feat in NUMERICAL_FEATURES + ONEHOT_FEATURES + ["purpose"] + ORDINAL_FEATURES:
+        X_raw.loc[rng.random(len(X_raw)) < args.missing, feat] = np.nan
+    y = synthetic_target(len(X_raw), args.seed)
+    X = FeatureEngineer().transform(DataCleaner().transform(X_raw))
+
+    all_ok = True
+    for n_jobs in args.n_jobs:
+        print(f"Transformers fitted in chunks of {args.chunk_size} rows, n_jobs={n_jobs} (relative accuracy {RELATIVE_ACCURACY})")
+        print(f"{'statistic':<22}{'max rel error':>16}{'within bound':>14}")
+        for name, max_error, ok in check_transformers(X, y, make_chunks(X, y, args.chunk_size), n_jobs):
+            all_ok = all_ok and ok
+            print(f"{name:<22}{max_error:>16.3e}{'yes' if ok else 'NO':>14}")
+        print()
+
+    # Whole preprocessing of the pipelines: output differences on a sample & fit times
+    # (each chunked step takes one pass over the raw chunks, through the steps before it)
+    X_sample = X_raw.iloc[:10_000]
+    chunks = make_chunks(X_raw, y, args.chunk_size)
+    print(f"{'pipeline':<10}{'max abs diff':>14}{'exact fit (s)':>15}" + "".join(f"{f'chunked n_jobs={n} (s)':>22}" for n in args.n_jobs))
+    for name, pipeline in get_pipelines().items():
+        preprocessing = pipeline[:-1]
+        exact = preprocessing.fit(X_raw.copy(), y)
+        X_exact = exact.transform(X_sample.copy())
+        chunked = fit_preprocessing_in_chunks(get_pipelines()[name], chunks)[:-1]
+        X_chunked = chunked.transform(X_sample.copy())
+        # Categorical features compared by their codes
+        to_numeric = lambda X_out: np.column_stack([X_out[feat].cat.codes if X_out[feat].dtype == "category" else X_out[feat]
+                                                    for feat in X_exact.columns]).astype(float)
+        max_diff = np.nanmax(np.abs(to_numeric(X_exact) - to_numeric(X_chunked)))
+        exact_s = time_fit(lambda: get_pipelines()[name][:-1].fit(X_raw.copy(), y))
+        chunked_s = [time_fit(lambda: fit_preprocessing_in_chunks(get_pipelines()[name], chunks, n_jobs)) for n_jobs in args.n_jobs]
+        print(f"{name:<10}{max_diff:>14.3e}{exact_s:>15.2f}" + "".join(f"{s:>22.2f}" for s in chunked_s))
+
+    if not all_ok:
+        raise SystemExit("Chunked fit outside of its error bounds")
+
+
+if __name__ == "__main__":
+    main()
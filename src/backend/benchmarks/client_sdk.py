@@ -0,0 +1,182 @@
+# Checks of the API client package (src/frontend/loantap_client) against an in-process instance of the app:
+# batch coalescing, input order, bounded concurrency, retries, timeouts & keep-alive vs a new connection per call
+# Run from src/backend: python -m benchmarks.client_sdk [--records 5000] [--batch-size 500] [--max-concurrency 4]
+import sys
+import time
+import asyncio
+import argparse
+import threading
+import warnings
+import httpx
+import numpy as np
+from pathlib import Path
+
+from benchmarks.synthetic import generate_records
+from benchmarks.shadow_load import start_server
+
+# The client ships with the frontend (appended to the path: the frontend has a main.py too)
+sys.path.append(str(Path(__file__).resolve().parents[2] / "frontend"))
+from loantap_client import LoanTapClient, AsyncLoanTapClient, LoanTapError
+
+
+# Transports counting the requests in flight, to check that the batch calls stay within max_concurrency
+class CountingTransport(httpx.HTTPTransport):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_flight = self.peak = self.calls = 0
+        self._lock = threading.Lock()
+
+    def handle_request(self, request):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            return super().handle_request(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class AsyncCountingTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_flight = self.peak = self.calls = 0
+
+    async def handle_async_request(self, request):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self.in_flight -= 1
+
+
+# Transport failing the first calls (connection error, then 503) before passing the others to the API
+class FlakyTransport(httpx.HTTPTransport):
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = list(failures)
+        self.calls = 0
+
+    def handle_request(self, request):
+        self.calls += 1
+        if self.failures:
+            failure = self.failures.pop(0)
+            if failure == "connect":
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(failure, json={"detail": "unavailable"}, request=request)
+        return super().handle_request(request)
+
+
+# Records with a few invalid ones (rejected by the API with errors, in place)
+def build_records(n_records, seed):
+    records = generate_records(n_records, seed).to_dict(orient="records")
+    for idx in range(0, n_records, 97):
+        records[idx]["int_rate"] = 150.0
+    return records
+
+
+# Results in input order, the invalid records rejected in place & the probabilities of a single batch call
+def check_results(results, reference):
+    same_order = [result["index"] for result in results] == list(range(len(reference)))
+    same_errors = all(("errors" in result) == ("errors" in expected) for result, expected in zip(results, reference))
+    probs = np.array([result.get("probability", np.nan) for result in results])
+    expected = np.array([result.get("probability", np.nan) for result in reference])
+    max_diff = float(np.nanmax(np.abs(probs - expected)))
+    return same_order and same_errors and max_diff <= 1e-12, max_diff
+
+
+def time_calls(call, n_calls):
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        call()
+    return (time.perf_counter() - start) / n_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Client package checks against an in-process API")
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--calls", type=int, default=200, help="single-record calls of the keep-alive comparison")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.filterwarnings(action="ignore", category=UserWarning)
+
+    server = start_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}/api/v1"
+    records = build_records(args.records, args.seed)
+    options = dict(batch_size=args.batch_size, max_concurrency=args.max_concurrency, backoff_s=0.01)
+    checks = []
+    try:
+        with LoanTapClient(base_url, batch_size=args.records) as client:
+            reference = client.predict_batch(records) # one call
+            checks.append(("single record", client.predict(records[1]) in ("Defaulter", "Not a defaulter"), ""))
+
+        # Sync & async batch coalescing: same results as one call, in order, within max_concurrency calls at a time
+        transport = CountingTransport()
+        with LoanTapClient(base_url, transport=transport, **options) as client:
+            ok, max_diff = check_results(client.predict_batch(records), reference)
+        n_batches = -(-args.records // args.batch_size)
+        checks.append(("sync batches", ok and transport.calls == n_batches and transport.peak <= args.max_concurrency,
+                       f"{transport.calls} calls, peak {transport.peak} in flight, max diff {max_diff:.1e}"))
+
+        async def run_async():
+            async_transport = AsyncCountingTransport()
+            async with AsyncLoanTapClient(base_url, transport=async_transport, **options) as client:
+                return check_results(await client.predict_batch(records), reference), async_transport
+        (ok, max_diff), async_transport = asyncio.run(run_async())
+        checks.append(("async batches", ok and async_transport.calls == n_batches and async_transport.peak <= args.max_concurrency,
+                       f"{async_transport.calls} calls, peak {async_transport.peak} in flight, max diff {max_diff:.1e}"))
+
+        # Retries of connection errors & 503 answers, none of 4xx answers, & an error once the retries are used up
+        flaky = FlakyTransport(["connect", 503])
+        with LoanTapClient(base_url, transport=flaky, retries=2, backoff_s=0.01) as client:
+            label = client.predict(records[1])
+        checks.append(("retried failures", label == reference[1]["prediction"] and flaky.calls == 3, f"{flaky.calls} calls"))
+        flaky = FlakyTransport([503, 503, 503])
+        with LoanTapClient(base_url, transport=flaky, retries=2, backoff_s=0.01) as client:
+            try:
+                client.predict(records[1])
+                status = None
+            except LoanTapError as e:
+                status = e.status_code
+        checks.append(("retries used up", status == 503 and flaky.calls == 3, f"{flaky.calls} calls, status {status}"))
+        counting = CountingTransport()
+        with LoanTapClient(base_url, transport=counting, retries=2) as client:
+            try:
+                client.predict({"loan_amnt": -1})
+                status = None
+            except LoanTapError as e:
+                status = e.status_code
+        checks.append(("4xx not retried", status == 422 and counting.calls == 1, f"{counting.calls} call, status {status}"))
+
+        # Timeouts: a read timeout shorter than a large batch call fails after the retries
+        with LoanTapClient(base_url, timeout=0.001, retries=1, backoff_s=0.01, batch_size=args.records) as client:
+            try:
+                client.predict_batch(records)
+                timed_out = False
+            except LoanTapError as e:
+                timed_out = e.status_code is None and "Timeout" in str(e)
+        checks.append(("timeout", timed_out, ""))
+
+        # Keep-alive: pooled client vs a new connection per call (as requests.post without a session)
+        with LoanTapClient(base_url) as client:
+            pooled_s = time_calls(lambda: client.predict(records[1]), args.calls)
+        new_connection_s = time_calls(lambda: httpx.post(f"{base_url}/predict", json=records[1]).json(), args.calls)
+        checks.append(("keep-alive", True, f"{pooled_s * 1e3:.2f} ms/call pooled vs {new_connection_s * 1e3:.2f} ms/call with a new connection"))
+    finally:
+        server.should_exit = True
+
+    print(f"{'check':<20}{'ok':>5}  details")
+    for name, ok, details in checks:
+        print(f"{name:<20}{'yes' if ok else 'NO':>5}  {details}")
+    if not all(ok for _, ok, _ in checks):
+        raise SystemExit("Client check failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Single-record latency of the compiled fast-path scorer against the pipelines
+# (its parity with the logged models is checked by tests/test_fast_scorer.py)
+# Run from src/backend: python -m benchmarks.fast_scorer [--calls 5000]
+import gc
+import time
+import pickle
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from model_registry import load_serving_examples
+from data_preprocessing.compiler import compile_model
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+MODEL_PATH = BACKEND_DIR / "models" / "ensemble_model.pkl"
+
+
+# Latency percentiles (in microseconds) of single-record calls
+def time_single_record(predict_proba, record, n_calls):
+    for _ in range(100): # warm-up
+        predict_proba(record)
+
+    gc.disable()
+    timings = np.empty(n_calls)
+    for idx in range(n_calls):
+        start = time.perf_counter()
+        predict_proba(record)
+        timings[idx] = time.perf_counter() - start
+    gc.enable()
+    return np.percentile(timings, [50, 99]) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-record latency of the compiled scorer vs the pipelines")
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+    warnings.filterwarnings(action="ignore", category=UserWarning)
+
+    # Single-record latency of the deployed ensemble, as a request dict
+    with open(MODEL_PATH, "rb") as f:
+        model = pickle.load(f)
+    scorer = compile_model(model)
+    record = load_serving_examples().iloc[0].to_dict()
+    print(f"{'scorer':<22}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, predict_proba in [("pipelines (dataframe)", lambda rec: model.predict_proba(pd.DataFrame([rec]))), ("compiled (dict)", scorer.predict_proba)]:
+        p50, p99 = time_single_record(predict_proba, record, args.calls)
+        print(f"{name:<22}{p50:>12.1f}{p99:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
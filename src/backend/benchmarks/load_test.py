@@ -0,0 +1,112 @@
+# Load test of the /predict route for increasing numbers of scoring worker processes
+# Run from src/backend: python -m benchmarks.load_test [--workers 0 1 2 4] [--concurrency 32] [--duration 10]
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import http.client
+import numpy as np
+from pathlib import Path
+
+from model_registry import read_serving_examples
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+EXAMPLES_PATH = BACKEND_DIR / "models" / "serving_input_example.json"
+
+
+# Serving examples as valid /predict request bodies
+def load_request_bodies():
+    examples = read_serving_examples(EXAMPLES_PATH)
+    for feat in examples.columns[examples.dtypes == "object"]:
+        examples[feat] = examples[feat].str.strip()
+    examples = examples.replace({"verification_status": {"Source Verified": "Verified"}})
+    return [json.dumps(record).encode() for record in examples.to_dict(orient="records")]
+
+
+# Start the API with a given number of scoring workers & wait until it serves requests
+def start_server(n_workers, port, timeout=300):
+    env = dict(os.environ, LOANTAP_SERVING_WORKERS=str(n_workers))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/stats")
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.5)
+    server.kill()
+    raise RuntimeError("API did not start in time")
+
+
+# Proportional set size (shared pages split between the processes) of the server & its workers, in MB
+def total_pss(pid):
+    pids = [pid]
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        pids += [int(child) for child in f.read().split()]
+    pss = 0
+    for child_pid in pids:
+        with open(f"/proc/{child_pid}/smaps_rollup") as f:
+            pss += sum(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+    return pss / 1024
+
+
+# Send requests back-to-back on a keep-alive connection until the deadline
+def client_loop(port, bodies, deadline, latencies, errors):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    idx = 0
+    while time.time() < deadline:
+        start = time.perf_counter()
+        connection.request("POST", "/predict", body=bodies[idx % len(bodies)], headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status != 200:
+            errors.append(response.status)
+        idx += 1
+
+
+def run_load(port, bodies, concurrency, duration):
+    latencies, errors = [], []
+    deadline = time.time() + duration
+    threads = [threading.Thread(target=client_loop, args=(port, bodies, deadline, latencies, errors)) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requests/sec of /predict by number of scoring workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    bodies = load_request_bodies()
+
+    print(f"{os.cpu_count()} CPUs, {args.concurrency} concurrent clients, {args.duration}s per run")
+    print(f"{'workers':>8}{'req/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'errors':>8}{'PSS (MB)':>10}")
+    for n_workers in args.workers:
+        server = start_server(n_workers, args.port)
+        try:
+            run_load(args.port, bodies, args.concurrency, min(2, args.duration)) # warm-up
+            latencies, errors = run_load(args.port, bodies, args.concurrency, args.duration)
+            pss = total_pss(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        print(f"{n_workers:>8}{len(latencies) / args.duration:>10.1f}{p50:>10.1f}{p99:>10.1f}{len(errors):>8}{pss:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Reason codes of the deployed model: overhead of explaining over plain scoring & consistency of the contributions
+# Run from src/backend: python -m benchmarks.reason_codes [--sizes 1 100 10000] [--exact-max-rows 100]
+import argparse
+import warnings
+import numpy as np
+
+from config import MODEL_ARTIFACT_DIR
+from benchmarks.suite import time_calls
+from benchmarks.synthetic import generate_records
+from data_preprocessing.artifact import load_artifact
+from data_preprocessing.explainer import build_explainer
+
+
+# Contributions add up to the probabilities, which match the scorer's, & the linear branch is explained by coef_ * x
+def check_explainer(explainer, X, atol):
+    scorer = explainer.scorer
+    probs, baselines, contributions = explainer.explain(X)
+    checks = [
+        ("probability vs scorer", np.abs(probs - scorer.predict_proba(X)[:, 1]).max()),
+        ("baseline + sum vs prob", np.abs(baselines + contributions.sum(axis=1) - probs).max()),
+    ]
+
+    num, codes, age_days = scorer.decode(X)
+    for branch, branch_meta in scorer.meta["branches"].items():
+        if branch_meta["model"] == "linear":
+            X_branch = scorer.branch_features(branch, num, codes, age_days)
+            branch_contributions, _ = explainer._branch_contributions(branch, X_branch)
+            expected = X_branch * scorer.branch_arrays_[branch]["coef"]
+            checks.append((f"{branch} vs coef_ * x", np.abs(branch_contributions - expected).max()))
+    return [(name, float(diff), bool(diff <= atol)) for name, diff in checks]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reason-code overhead over scoring & contribution checks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000])
+    parser.add_argument("--exact-max-rows", type=int, default=100, help="Largest batch explained with TreeSHAP (~100x slower)")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--atol", type=float, default=1e-6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.filterwarnings(action="ignore", category=UserWarning)
+
+    scorer = load_artifact(MODEL_ARTIFACT_DIR)
+    explainers = {"approx": build_explainer(scorer, MODEL_ARTIFACT_DIR), "exact": build_explainer(scorer, MODEL_ARTIFACT_DIR, exact=True)}
+    X_all = generate_records(max(args.sizes), args.seed)
+
+    all_ok = True
+    print(f"{'check':<32}{'max abs diff':>14}{'ok':>6}")
+    for mode, explainer in explainers.items():
+        for name, diff, ok in check_explainer(explainer, X_all.iloc[:min(len(X_all), 1000)], args.atol):
+            all_ok = all_ok and ok
+            print(f"{f'{mode}: {name}':<32}{diff:>14.2e}{'yes' if ok else 'NO':>6}")
+
+    # Median times of scoring vs scoring & explaining (contributions & top-k reasons) per batch size
+    print(f"\n{'rows':>8}{'predict (ms)':>14}{'approx (ms)':>13}{'overhead':>10}{'exact (ms)':>12}{'overhead':>10}")
+    for size in args.sizes:
+        X = X_all.iloc[:size]
+        predict_s = np.median(time_calls(lambda _: scorer.predict_proba(X), repeats=args.repeats))
+        row = f"{size:>8}{predict_s * 1e3:>14.2f}"
+        for mode, explainer in explainers.items():
+            if mode == "exact" and size > args.exact_max_rows:
+                row += f"{'-':>12}{'-':>10}"
+                continue
+            explain = lambda _: explainer.top_reasons(explainer.explain(X)[2], args.top_k)
+            explain_s = np.median(time_calls(explain, repeats=args.repeats))
+            row += f"{explain_s * 1e3:>{13 if mode == 'approx' else 12}.2f}{f'{explain_s / predict_s:.2f}x':>10}"
+        print(row)
+
+    if not all_ok:
+        raise SystemExit("Reason-code check failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Latency of the primary /predict requests under load, without & with shadow scoring (in-process: the API runs in a
+# thread of this process, so the shadow dispatcher shares its GIL as in production)
+# Run from src/backend: python -m benchmarks.shadow_load [--shadows Logreg_eval_model Ensemble_eval_model]
+#                       [--concurrency 8] [--duration 10]
+import time
+import argparse
+import tempfile
+import threading
+import warnings
+import numpy as np
+import uvicorn
+from pathlib import Path
+
+from main import app
+from shadow import ShadowScorer, ShadowLog, load_shadow_models
+from benchmarks.load_test import load_request_bodies, run_load
+
+
+# Serve the app from a thread of this process until the returned server is told to exit
+def start_server(port, timeout=300):
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + timeout
+    while not (server.started and getattr(app.state, "ready", False)):
+        if time.time() > deadline:
+            raise RuntimeError("API did not start in time")
+        time.sleep(0.1)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Primary /predict latency without & with shadow scoring")
+    parser.add_argument("--shadows", nargs="+", default=["Logreg_eval_model", "Ensemble_eval_model"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--shed-max-pending", type=int, default=16, help="queue bound of the load-shedding scenario")
+    parser.add_argument("--max-p99-ratio", type=float, default=1.25, help="p99 with shadows / p99 without, to pass")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    warnings.filterwarnings(action="ignore", category=UserWarning)
+
+    bodies = load_request_bodies()
+    server = start_server(args.port)
+    log_dir = tempfile.mkdtemp(prefix="shadow_load_")
+
+    # Shadow models scored by low-priority processes, in the API process itself (for comparison) & behind a tiny queue
+    scenarios = [
+        ("no shadow", None),
+        ("shadow processes", dict(n_workers=1, max_pending=10_000)),
+        ("shadow in-process", dict(n_workers=0, max_pending=10_000)),
+        ("shadow, shedding", dict(n_workers=1, max_pending=args.shed_max_pending)),
+    ]
+    results = {}
+    print(f"{'scenario':<20}{'requests/s':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'errors':>8}{'queued':>8}{'shed':>8}{'scored':>8}")
+    try:
+        for name, options in scenarios:
+            shadow = None
+            if options is not None:
+                shadow = ShadowScorer(ShadowLog(Path(log_dir) / f"{name.replace(' ', '_')}.sqlite"), options["max_pending"])
+                load_shadow_models(shadow, args.shadows, n_workers=options["n_workers"])
+                if shadow.load_errors:
+                    raise SystemExit(f"Shadow models could not be loaded: {shadow.load_errors}")
+                shadow.start()
+            app.state.shadow = shadow
+            app.state.cache.clear() # every scenario scores its requests
+
+            latencies, errors = run_load(args.port, bodies, args.concurrency, args.duration)
+            app.state.shadow = None
+            counts = {"queued": 0, "shed": 0, "scored": 0}
+            if shadow is not None:
+                shadow.stop()
+                counts = shadow.counts
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+            results[name] = p99
+            print(f"{name:<20}{len(latencies) / args.duration:>12.0f}{p50:>10.2f}{p99:>10.2f}{len(errors):>8}"
+                  f"{counts['queued']:>8}{counts['shed']:>8}{counts['scored']:>8}")
+    finally:
+        server.should_exit = True
+
+    # Shadow work off the API process must leave the primary p99 unchanged (within noise)
+    worst = max(results["shadow processes"], results["shadow, shedding"]) / results["no shadow"]
+    print(f"\nWorst p99 with shadow processes / without: {worst:.2f} (limit {args.max_p99_ratio})")
+    if worst > args.max_p99_ratio:
+        raise SystemExit("Shadow scoring slowed down the primary requests")
+
+
+if __name__ == "__main__":
+    main()
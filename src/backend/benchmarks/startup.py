@@ -0,0 +1,71 @@
+# Cold start benchmark: time from launching the API to its first prediction, pickle vs compiled artifact
+# Run from src/backend (with an up-to-date artifact, see build_artifact.py): python -m benchmarks.startup [--runs 3]
+import os
+import sys
+import time
+import argparse
+import subprocess
+import http.client
+import numpy as np
+from pathlib import Path
+
+from benchmarks.load_test import load_request_bodies
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+MODES = {
+    "pickle": {"LOANTAP_USE_MODEL_ARTIFACT": "0"},
+    "artifact": {"LOANTAP_USE_MODEL_ARTIFACT": "1"},
+}
+
+
+# Status of a request (None while the server is not accepting connections)
+def request_status(port, method, url, body=None):
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        connection.request(method, url, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except OSError:
+        return None
+
+
+# Seconds from process launch to the first successful prediction & to readiness
+def time_startup(env, port, body, timeout=300):
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=dict(os.environ, **env), stdout=subprocess.DEVNULL
+    )
+    try:
+        first_prediction = ready = None
+        while time.perf_counter() - start < timeout and (first_prediction is None or ready is None):
+            if first_prediction is None and request_status(port, "POST", "/predict", body) == 200:
+                first_prediction = time.perf_counter() - start
+            if ready is None and request_status(port, "GET", "/ready") == 200:
+                ready = time.perf_counter() - start
+            time.sleep(0.01)
+        if first_prediction is None or ready is None:
+            raise RuntimeError("API did not start in time")
+        return first_prediction, ready
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first prediction of the API, pickle vs compiled artifact")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+    body = load_request_bodies()[0]
+
+    print(f"{'model':<10}{'first prediction (s)':>22}{'ready (s)':>12}  (median of {args.runs} runs)")
+    for mode, env in MODES.items():
+        timings = np.array([time_startup(env, args.port, body) for _ in range(args.runs)])
+        first_prediction, ready = np.median(timings, axis=0)
+        print(f"{mode:<10}{first_prediction:>22.2f}{ready:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
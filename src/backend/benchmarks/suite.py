@@ -0,0 +1,251 @@
+# Reproducible benchmark suite on synthetic loan records, with a JSON report to compare two commits
+# Run from src/backend:
+#   python -m benchmarks.suite run [--rows 100000] [--seed 0] --output report.json
+#   python -m benchmarks.suite compare base.json new.json [--threshold 0.10] [--threshold-for "api.*=0.25"]
+import gc
+import os
+import sys
+import json
+import time
+import pickle
+import fnmatch
+import argparse
+import itertools
+import platform
+import warnings
+import subprocess
+import numpy as np
+from pathlib import Path
+
+from benchmarks.synthetic import generate_records
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+MODEL_PATH = BACKEND_DIR / "models" / "ensemble_model.pkl"
+
+# Feature groups of the benchmarked preprocessing pipeline (every step enabled)
+NUMERICAL_FEATURES = ["loan_amnt", "int_rate", "installment", "annual_inc", "dti", "open_acc", "pub_rec", "revol_bal",
+                      "revol_util", "total_acc", "mort_acc", "pub_rec_bankruptcies"]
+ENGINEERED_FEATURES = ["emi_ratio", "credit_age_years", "closed_acc", "credit_util_ratio", "mortgage_ratio"]
+ONEHOT_FEATURES = ["verification_status", "application_type", "initial_list_status", "home_ownership"]
+SUPERVISED_FEATURES = ["purpose", "address"]
+ORDINAL_FEATURES = ["grade", "sub_grade", "emp_length"]
+FEATURES_TO_DROP = ["issue_d", "earliest_cr_line"]
+
+BATCH_SIZES = [1, 100, 10_000]
+
+
+# Timings (in seconds) of repeated calls, each after an untimed setup
+def time_calls(call, setup=lambda: None, repeats=5, warmup=1):
+    for _ in range(warmup):
+        call(setup())
+
+    gc.disable()
+    timings = []
+    for _ in range(repeats):
+        arg = setup()
+        start = time.perf_counter()
+        call(arg)
+        timings.append(time.perf_counter() - start)
+    gc.enable()
+    return timings
+
+
+# Result of a benchmark (the median is compared across reports)
+def summarize(timings, n_rows):
+    median = float(np.median(timings))
+    return {
+        "median_s": median,
+        "p99_s": float(np.percentile(timings, 99)),
+        "repeats": len(timings),
+        "rows": n_rows,
+        "rows_per_s": n_rows / median if median > 0 else None,
+    }
+
+
+# Synthetic target, so supervised encoders & sampling see both classes
+def synthetic_target(n_rows, seed):
+    return np.random.default_rng([seed, 1]).binomial(1, 0.2, n_rows)
+
+
+# Fit & transform of every custom transformer, each step fitted on the output of the previous ones
+def bench_transformers(X, y, repeats):
+    from sklearn.base import clone
+    from data_preprocessing.preprocessor import build_pipeline
+
+    pipeline = build_pipeline(
+        NUMERICAL_FEATURES, ENGINEERED_FEATURES,
+        categorical_features=ONEHOT_FEATURES + SUPERVISED_FEATURES + ORDINAL_FEATURES,
+        supervised_features=SUPERVISED_FEATURES, onehot_features=ONEHOT_FEATURES, ordinal_features=ORDINAL_FEATURES,
+        features_to_drop=FEATURES_TO_DROP, convert_cat_dtype=True
+    )
+
+    results = {}
+    X_step = X
+    for name, step in pipeline.steps:
+        if not hasattr(step, "transform"): # passthrough steps & samplers
+            continue
+        results[f"transformers.{name}.fit"] = summarize(
+            time_calls(lambda X_in: clone(step).fit(X_in, y), lambda: X_step, repeats), len(X)
+        )
+        step.fit(X_step, y)
+        results[f"transformers.{name}.transform"] = summarize(time_calls(step.transform, lambda: X_step, repeats), len(X))
+        X_step = step.transform(X_step)
+    return results
+
+
+# predict_proba of the pipelines (shared trunk) & of the compiled scorer at several batch sizes
+def bench_ensemble(X, repeats):
+    from data_preprocessing.preprocessor import build_shared_ensemble, set_copy_mode
+    from data_preprocessing.compiler import compile_model
+
+    with open(MODEL_PATH, "rb") as f:
+        ensemble_model = pickle.load(f)
+    scorer = compile_model(ensemble_model)
+    model = build_shared_ensemble(ensemble_model)
+    # Copy-free transformers, as served: the per-call copy of the input is made in the (untimed) setup
+    for pipeline in model.pipelines:
+        set_copy_mode(pipeline, copy=False)
+
+    results = {}
+    for batch_size in sorted({size for size in BATCH_SIZES if size < len(X)} | {len(X)}):
+        batch = X.iloc[:batch_size]
+        n_repeats = repeats * 20 if batch_size <= 100 else repeats
+        results[f"ensemble.pipelines.batch_{batch_size}"] = summarize(
+            time_calls(model.predict_proba, batch.copy, n_repeats), batch_size
+        )
+        records = batch.to_dict(orient="list")
+        results[f"ensemble.compiled.batch_{batch_size}"] = summarize(
+            time_calls(scorer.predict_proba, lambda: records, n_repeats), batch_size
+        )
+    return results
+
+
+# Routes of the FastAPI app, served in-process (the model is loaded as configured, see config.py)
+def bench_api(X, repeats):
+    from fastapi.testclient import TestClient
+    from main import app
+
+    records = X.iloc[:1000].to_dict(orient="records")
+    results = {}
+    with TestClient(app) as client:
+        # Single records, bypassing the prediction cache
+        next_record = itertools.cycle(records).__next__
+        predict_timings = time_calls(
+            lambda record: client.post("/predict", params={"use_cache": "false"}, json=record).raise_for_status(),
+            next_record, repeats * 100, warmup=20
+        )
+        results["api.predict"] = summarize(predict_timings, 1)
+
+        batch_timings = time_calls(lambda body: client.post("/predict_batch", json=body).raise_for_status(), lambda: records, repeats)
+        results[f"api.predict_batch_{len(records)}"] = summarize(batch_timings, len(records))
+    return results
+
+
+# Environment of the run, to tell apart the reports of two commits
+def get_meta(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "rows": args.rows,
+        "seed": args.seed,
+        "repeats": args.repeats,
+    }
+
+
+def run(args):
+    warnings.filterwarnings(action="ignore", category=UserWarning)
+    X = generate_records(args.rows, args.seed)
+    y = synthetic_target(args.rows, args.seed)
+
+    benchmarks = {}
+    for group, bench in [("transformers", lambda: bench_transformers(X, y, args.repeats)),
+                         ("ensemble", lambda: bench_ensemble(X, args.repeats)),
+                         ("api", lambda: bench_api(X, args.repeats))]:
+        if args.only and group not in args.only:
+            continue
+        print(f"Running {group} benchmarks...", file=sys.stderr)
+        benchmarks.update(bench())
+
+    report = {"meta": get_meta(args), "benchmarks": benchmarks}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'benchmark':<45}{'median (ms)':>14}{'rows/s':>14}")
+    for name, result in benchmarks.items():
+        print(f"{name:<45}{result['median_s'] * 1000:>14.3f}{result['rows_per_s'] or 0:>14,.0f}")
+
+
+# Allowed relative slowdown of a benchmark (the first matching pattern wins over the default)
+def get_threshold(name, default, pattern_thresholds):
+    for pattern, threshold in pattern_thresholds:
+        if fnmatch.fnmatch(name, pattern):
+            return threshold
+    return default
+
+
+def parse_pattern_threshold(value):
+    pattern, _, threshold = value.rpartition("=")
+    if not pattern:
+        raise argparse.ArgumentTypeError(f"expected PATTERN=VALUE, got {value!r}")
+    return pattern, float(threshold)
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if base["meta"].get("rows") != new["meta"].get("rows"):
+        print(f"Warning: reports ran on different numbers of rows ({base['meta'].get('rows')} vs {new['meta'].get('rows')})", file=sys.stderr)
+
+    print(f"base {base['meta'].get('commit')} vs new {new['meta'].get('commit')}")
+    print(f"{'benchmark':<45}{'base (ms)':>12}{'new (ms)':>12}{'change':>10}{'limit':>8}")
+    regressions = []
+    for name, new_result in new["benchmarks"].items():
+        base_result = base["benchmarks"].get(name)
+        if base_result is None:
+            print(f"{name:<45}{'-':>12}{new_result['median_s'] * 1000:>12.3f}{'new':>10}")
+            continue
+        change = new_result["median_s"] / base_result["median_s"] - 1
+        threshold = get_threshold(name, args.threshold, args.threshold_for)
+        is_regression = change > threshold
+        if is_regression:
+            regressions.append(name)
+        print(f"{name:<45}{base_result['median_s'] * 1000:>12.3f}{new_result['median_s'] * 1000:>12.3f}"
+              f"{change:>+10.1%}{threshold:>8.0%}{'  REGRESSION' if is_regression else ''}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of the transformers, the ensemble & the API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks & write a JSON report")
+    run_parser.add_argument("--rows", type=int, default=100_000, help="Synthetic records (1 to 10M)")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeats", type=int, default=5)
+    run_parser.add_argument("--only", nargs="+", choices=["transformers", "ensemble", "api"], default=None)
+    run_parser.add_argument("--output", required=True)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two reports & exit with 1 on regressions")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown of the medians")
+    compare_parser.add_argument("--threshold-for", type=parse_pattern_threshold, action="append", default=[],
+                                metavar="PATTERN=VALUE", help="Allowed slowdown of the benchmarks matching a glob pattern")
+
+    args = parser.parse_args()
+    run(args) if args.command == "run" else compare(args)
+
+
+if __name__ == "__main__":
+    main()
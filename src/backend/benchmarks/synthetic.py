@@ -0,0 +1,138 @@
+# Synthetic loan records following the InputRecord schema of the API (Literal domains & numeric bounds)
+# Run from src/backend to write a file: python -m benchmarks.synthetic --rows 10000000 --output data.csv|data.parquet
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from columnar import get_field_domains
+from routers.predict import InputRecord
+
+# Free-text domains of the str fields
+PURPOSES = ["debt_consolidation", "credit_card", "home_improvement", "other", "major_purchase", "small_business", "car",
+            "medical", "moving", "vacation", "house", "wedding", "renewable_energy", "educational"]
+PINCODES = ["00813", "05113", "11650", "22690", "29597", "30723", "48052", "70466", "86630", "93700"]
+STREETS = ["Oak", "Maple", "Cedar", "Pine", "Elm", "Lake", "Hill", "Park", "Sunset", "River"]
+STATES = ["CA", "NY", "TX", "FL", "IL", "NJ", "PA", "OH", "GA", "NC"]
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+# Records per generated chunk (the same seed & chunk size always give the same records)
+CHUNK_SIZE = 100_000
+
+
+# Keep generated numbers strictly within the (exclusive) bounds of the schema
+def clip_to_bounds(values, lower, upper):
+    if lower is not None:
+        values = np.maximum(values, lower + 0.01)
+    if upper is not None:
+        values = np.minimum(values, upper - 0.01)
+    return values
+
+
+# Month-year strings (e.g. Jan-2015) from month indices since year 0
+def format_months(month_indices):
+    return [f"{MONTHS[idx % 12]}-{idx // 12}" for idx in month_indices]
+
+
+# Realistic values of the known numeric & text fields
+def generate_known_fields(rng, n_rows, columns):
+    loan_amnt = np.round(rng.uniform(1000, 40000, n_rows) / 25) * 25
+    int_rate = np.round(rng.uniform(5.3, 30.9, n_rows), 2)
+    n_months = np.where(np.asarray(columns["term"]) == "60 months", 60, 36)
+    monthly_rate = int_rate / 1200
+    installment = np.round(loan_amnt * monthly_rate / (1 - (1 + monthly_rate) ** -n_months), 2) # annuity
+    open_acc = rng.poisson(11, n_rows).astype(float)
+    issue_month = rng.integers(2007 * 12, 2017 * 12, n_rows)
+
+    return {
+        "loan_amnt": loan_amnt,
+        "int_rate": int_rate,
+        "installment": installment,
+        "annual_inc": np.round(rng.lognormal(11.1, 0.5, n_rows), 0),
+        "dti": np.round(rng.gamma(4, 4.5, n_rows), 2),
+        "open_acc": open_acc,
+        "pub_rec": rng.poisson(0.2, n_rows).astype(float),
+        "revol_bal": np.round(rng.lognormal(9.5, 1.0, n_rows), 0),
+        "revol_util": np.round(rng.uniform(0, 100, n_rows), 1),
+        "total_acc": open_acc + rng.poisson(14, n_rows),
+        "mort_acc": rng.poisson(1.8, n_rows).astype(float),
+        "pub_rec_bankruptcies": rng.poisson(0.1, n_rows).astype(float),
+        "issue_d": format_months(issue_month),
+        "earliest_cr_line": format_months(issue_month - rng.integers(36, 480, n_rows)),
+        "purpose": rng.choice(PURPOSES, n_rows),
+        "address": [
+            f"{number} {street} Street\n{city}ville, {state} {pincode}"
+            for number, street, city, state, pincode in zip(
+                rng.integers(1, 9999, n_rows), rng.choice(STREETS, n_rows), rng.choice(STREETS, n_rows),
+                rng.choice(STATES, n_rows), rng.choice(PINCODES, n_rows)
+            )
+        ],
+    }
+
+
+# One chunk of synthetic records
+def generate_chunk(n_rows, seed=0, chunk_idx=0):
+    rng = np.random.default_rng([seed, chunk_idx])
+    domains = get_field_domains(InputRecord)
+
+    # Literal fields are sampled from their domain (grade follows the sub-grade)
+    columns = {name: rng.choice(domain[1], n_rows) for name, domain in domains.items() if domain[0] == "literal"}
+    if "grade" in columns and "sub_grade" in columns:
+        columns["grade"] = np.array([sub_grade[0] for sub_grade in columns["sub_grade"]])
+
+    # Known fields get realistic values, other numbers are uniform within their bounds
+    known_fields = generate_known_fields(rng, n_rows, columns)
+    for name, domain in domains.items():
+        if name in columns:
+            continue
+        if domain[0] == "number":
+            values = known_fields[name] if name in known_fields else rng.uniform(domain[1] or 0, domain[2] or 1000, n_rows)
+            columns[name] = clip_to_bounds(values, domain[1], domain[2])
+        else:
+            columns[name] = known_fields.get(name, [name] * n_rows)
+
+    return pd.DataFrame(columns, columns=list(domains))
+
+
+# Chunks of synthetic records up to a total number of rows
+def iter_synthetic_chunks(n_rows, seed=0, chunk_size=CHUNK_SIZE):
+    for chunk_idx, start in enumerate(range(0, n_rows, chunk_size)):
+        yield generate_chunk(min(chunk_size, n_rows - start), seed, chunk_idx)
+
+
+def generate_records(n_rows, seed=0, chunk_size=CHUNK_SIZE):
+    return pd.concat(iter_synthetic_chunks(n_rows, seed, chunk_size), ignore_index=True)
+
+
+# Check that records pass the API validation
+def validate_records(records, schema=InputRecord):
+    for record in records.to_dict(orient="records"):
+        schema.model_validate(record)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic loan records (InputRecord schema) to a CSV/Parquet file")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    # Written chunk by chunk, so any number of rows fits in memory
+    if Path(args.output).suffix == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        for chunk in iter_synthetic_chunks(args.rows, args.seed, args.chunk_size):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            writer = writer or pq.ParquetWriter(args.output, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    else:
+        for chunk_idx, chunk in enumerate(iter_synthetic_chunks(args.rows, args.seed, args.chunk_size)):
+            chunk.to_csv(args.output, mode="w" if chunk_idx == 0 else "a", header=chunk_idx == 0, index=False)
+
+
+if __name__ == "__main__":
+    main()
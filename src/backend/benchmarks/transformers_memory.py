@@ -0,0 +1,96 @@
+# Memory benchmark of the copy-free transformer mode
+# Run from src/backend: python -m benchmarks.transformers_memory [--rows 1000000]
+import os
+import sys
+import time
+import pickle
+import argparse
+import warnings
+import threading
+import subprocess
+import pandas as pd
+from pathlib import Path
+
+from model_registry import load_serving_examples
+from data_preprocessing.preprocessor import build_shared_ensemble, set_copy_mode
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+MODEL_PATH = BACKEND_DIR / "models" / "ensemble_model.pkl"
+MODES = {
+    "copy": dict(copy=True, sparse_ohe=False),
+    "no-copy": dict(copy=False, sparse_ohe=False),
+    "no-copy+sparse-ohe": dict(copy=False, sparse_ohe=True),
+}
+
+
+# Current resident set size of the process in bytes (Linux only)
+def current_rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+# Sample the RSS in a background thread to track its peak while the benchmarked code runs
+class PeakRSSSampler(threading.Thread):
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, current_rss())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, current_rss())
+
+
+# Run a single mode in the current process & print its result
+def run_mode(mode, n_rows):
+    warnings.filterwarnings(action="ignore", category=UserWarning)
+    with open(MODEL_PATH, "rb") as f:
+        model = build_shared_ensemble(pickle.load(f))
+    for pipeline in model.pipelines:
+        set_copy_mode(pipeline, **MODES[mode])
+
+    # Tile the serving examples up to the requested number of rows
+    examples = load_serving_examples()
+    X = pd.concat([examples] * (n_rows // len(examples) + 1), ignore_index=True).iloc[:n_rows].copy()
+
+    baseline = current_rss()
+    sampler = PeakRSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    model.predict_proba(X)
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+
+    print(f"{mode},{elapsed:.3f},{(sampler.peak - baseline) / 2**20:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS & time of the ensemble predict_proba with & without copies")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--mode", choices=list(MODES), default=None, help="Run a single mode (used internally)")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.rows)
+        return
+
+    # Every mode runs in a fresh process so the peaks are not shared
+    print(f"{'mode':<22}{'time (s)':>10}{'peak RSS over input (MB)':>28}")
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.transformers_memory", "--mode", mode, "--rows", str(args.rows)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        _, elapsed, peak = output.split(",")
+        print(f"{mode:<22}{elapsed:>10}{peak:>28}")
+
+
+if __name__ == "__main__":
+    main()
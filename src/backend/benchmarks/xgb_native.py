@@ -0,0 +1,75 @@
+# Parity & latency of the native XGBoost inference path against XGBClassifier.predict_proba
+# Run from src/backend: python -m benchmarks.xgb_native [--sizes 1 100 10000 100000] [--parallel-min-rows 2048]
+import time
+import pickle
+import argparse
+import warnings
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from benchmarks.synthetic import generate_records
+from model_registry import load_serving_examples
+from data_preprocessing.preprocessor import build_shared_ensemble
+from data_preprocessing.xgb_native import NativeXGBClassifier, use_native_xgboost
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+MODEL_PATH = BACKEND_DIR / "models" / "ensemble_model.pkl"
+
+
+def load_shared_ensemble():
+    with open(MODEL_PATH, "rb") as f:
+        return build_shared_ensemble(pickle.load(f))
+
+
+# Median time (in microseconds) of a call, repeated for about a second at most
+def time_call(call, X):
+    call(X)
+    timings = []
+    deadline = time.perf_counter() + 1
+    while len(timings) < 3 or (time.perf_counter() < deadline and len(timings) < 2000):
+        start = time.perf_counter()
+        call(X)
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Native booster inference vs XGBClassifier.predict_proba")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000, 100_000])
+    parser.add_argument("--parallel-min-rows", type=int, default=2048)
+    parser.add_argument("--max-threads", type=int, default=None)
+    parser.add_argument("--atol", type=float, default=1e-7)
+    args = parser.parse_args()
+    warnings.filterwarnings(action="ignore", category=UserWarning)
+    X = generate_records(max(args.sizes))
+
+    # Parity of the whole ensemble output on the serving examples & the synthetic records
+    model, native_model = load_shared_ensemble(), use_native_xgboost(load_shared_ensemble(), args.parallel_min_rows, args.max_threads)
+    all_ok = True
+    print(f"{'data':<22}{'parity':>8}{'max abs diff':>16}")
+    for name, X_check in [("serving examples", load_serving_examples()), ("synthetic", X.iloc[:10_000])]:
+        max_diff = np.max(np.abs(model.predict_proba(X_check.copy()) - native_model.predict_proba(X_check.copy())))
+        all_ok = all_ok and max_diff <= args.atol
+        print(f"{name:<22}{'ok' if max_diff <= args.atol else 'FAILED':>8}{max_diff:>16.2e}")
+
+    # Latency of the final estimator alone, on the preprocessed input of the XGBoost branch
+    xgb_branch = model.branches_[model.names.index("xgb_pipeline")]
+    X_trunk = model.trunk_.transform(X.copy()) if model.trunk_ is not None else X.copy()
+    X_model = xgb_branch[:-1].transform(X_trunk)
+    estimator = xgb_branch.steps[-1][1]
+    adapter = NativeXGBClassifier(estimator, args.parallel_min_rows, args.max_threads).prepare()
+
+    print(f"\n{'rows':>10}{'XGBClassifier (us)':>20}{'native (us)':>14}{'threads':>9}{'speedup':>9}")
+    for size in args.sizes:
+        X_batch = X_model.iloc[:size]
+        classifier_us = time_call(estimator.predict_proba, X_batch)
+        native_us = time_call(adapter.predict_proba, X_batch)
+        print(f"{size:>10}{classifier_us:>20.1f}{native_us:>14.1f}{adapter.get_n_threads(size):>9}{classifier_us / native_us:>8.2f}x")
+
+    if not all_ok:
+        raise SystemExit("Parity check failed")
+
+
+if __name__ == "__main__":
+    main()
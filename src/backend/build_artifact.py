@@ -0,0 +1,36 @@
+# Export the pickled ensemble into the fast-loading compiled artifact loaded by the API
+# Run from src/backend after retraining: python build_artifact.py
+import pickle
+import argparse
+from config import MODEL_PATH, MODEL_ARTIFACT_DIR, SERVING_EXAMPLES_PATH
+from model_registry import read_serving_examples
+from data_preprocessing.compiler import compile_model, check_parity, get_branches
+from data_preprocessing.artifact import save_artifact
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the fitted ensemble & write it as an artifact directory")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--output", default=MODEL_ARTIFACT_DIR)
+    parser.add_argument("--atol", type=float, default=1e-6)
+    args = parser.parse_args()
+
+    with open(args.model, "rb") as f:
+        model = pickle.load(f)
+    scorer = compile_model(model)
+
+    # Only artifacts matching the pipelines are written
+    is_same, max_diff = check_parity(model, scorer, read_serving_examples(SERVING_EXAMPLES_PATH), atol=args.atol)
+    if not is_same:
+        raise SystemExit(f"Parity check failed (max abs diff {max_diff:.2e}), artifact not written")
+
+    # Native boosters of the tree branches
+    pipelines, _ = get_branches(model)
+    boosters = {branch: pipeline[-1].get_booster() for branch, pipeline in pipelines.items() if hasattr(pipeline[-1], "get_booster")}
+
+    save_artifact(scorer, args.output, source_path=args.model, boosters=boosters)
+    print(f"Artifact written to {args.output} (max abs diff {max_diff:.2e})")
+
+
+if __name__ == "__main__":
+    main()
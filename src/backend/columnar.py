@@ -0,0 +1,173 @@
+import typing
+import numpy as np
+from annotated_types import Gt, Lt
+from data_preprocessing.fast_scorer import DictionaryColumn
+
+# Columnar ingest of bulk scoring requests (Arrow IPC stream/file or Parquet bodies)
+# The InputRecord constraints are checked with one vectorized operation per column instead of per-row pydantic
+# validation, & the valid rows reach the compiled scorer as arrays: numbers as float64 arrays, strings dictionary-
+# encoded (each distinct value is parsed once). pyarrow is imported on the first columnar request only.
+
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_TYPE = "application/vnd.apache.arrow.file"
+PARQUET_TYPES = ("application/vnd.apache.parquet", "application/x-parquet")
+
+# Only the pincode at the end of the address is used (see PINCODE_PATTERN: any character but a newline, then 5 digits),
+# so addresses are cut to their last 6 characters before being dictionary-encoded: a few thousand distinct values remain
+# instead of one per row. A leading whitespace of the cut address becomes "_", as the scorer strips the values it encodes
+# (any whitespace str.strip() removes but a newline, which the pattern doesn't match either: RE2's \s is ASCII only)
+PINCODE_FIELD = "address"
+PINCODE_SUFFIX_LENGTH = 6
+LEADING_SPACE_PATTERN = "^[" + "".join(f"\\x{{{ord(char):x}}}" for char in map(chr, range(0x3001)) if char.isspace() and char != "\n") + "]"
+
+
+# Domain of every field of the schema: ("literal", choices), ("number", lower, upper) or ("text", None)
+def get_field_domains(schema):
+    domains = {}
+    for name, field in schema.model_fields.items():
+        if typing.get_origin(field.annotation) is typing.Literal:
+            domains[name] = ("literal", list(typing.get_args(field.annotation)))
+        elif field.annotation is float:
+            lower = next((constraint.gt for constraint in field.metadata if isinstance(constraint, Gt)), None)
+            upper = next((constraint.lt for constraint in field.metadata if isinstance(constraint, Lt)), None)
+            domains[name] = ("number", lower, upper)
+        else:
+            domains[name] = ("text", None)
+    return domains
+
+
+def is_columnar_type(content_type):
+    return content_type.startswith((ARROW_STREAM_TYPE, ARROW_FILE_TYPE) + PARQUET_TYPES)
+
+
+# Arrow table of a request body
+def read_table(body, content_type):
+    import pyarrow as pa
+    if content_type.startswith(ARROW_STREAM_TYPE):
+        return pa.ipc.open_stream(pa.BufferReader(body)).read_all()
+    if content_type.startswith(ARROW_FILE_TYPE):
+        return pa.ipc.open_file(pa.BufferReader(body)).read_all()
+    if content_type.startswith(PARQUET_TYPES):
+        import pyarrow.parquet as pq
+        return pq.read_table(pa.BufferReader(body))
+    raise ValueError(f"Unsupported content type {content_type!r}")
+
+
+# Columns of the schema fields, numbers as float64 & strings as plain strings (a ValueError for missing or mistyped ones)
+def check_schema(table, domains):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    missing = [name for name in domains if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    columns = {}
+    for name, domain in domains.items():
+        column = table.column(name)
+        column_type = column.type.value_type if pa.types.is_dictionary(column.type) else column.type
+        if domain[0] == "number":
+            if not (pa.types.is_integer(column_type) or pa.types.is_floating(column_type) or pa.types.is_null(column_type)):
+                raise ValueError(f"Column {name} should be numeric, not {column.type}")
+            columns[name] = pc.cast(column, pa.float64()).combine_chunks()
+        else:
+            if not (pa.types.is_string(column_type) or pa.types.is_large_string(column_type) or pa.types.is_null(column_type)):
+                raise ValueError(f"Column {name} should be a string column, not {column.type}")
+            columns[name] = pc.cast(column, pa.string()).combine_chunks()
+    return columns
+
+
+# Expected values of a Literal field, worded like pydantic
+def describe_choices(choices):
+    quoted = [repr(choice) for choice in choices]
+    return ", ".join(quoted[:-1]) + f" or {quoted[-1]}" if len(quoted) > 1 else quoted[0]
+
+
+# Rows failing each constraint of the schema, as (field, error type, message, failed rows mask)
+def find_failures(columns, domains):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    failures = []
+    for name, domain in domains.items():
+        column = columns[name]
+        is_null = column.is_null().to_numpy(zero_copy_only=False)
+        if domain[0] == "number":
+            failures.append((name, "float_type", "Input should be a valid number", is_null))
+            values = column.to_numpy(zero_copy_only=False) # missing values as NaN
+            # One bound error per value, as pydantic: the upper bound is checked first (NaN fails both)
+            too_high = ~is_null & ~(values < domain[2]) if domain[2] is not None else np.zeros(len(values), dtype=bool)
+            if domain[1] is not None:
+                failures.append((name, "greater_than", f"Input should be greater than {domain[1]}", ~is_null & ~too_high & ~(values > domain[1])))
+            if domain[2] is not None:
+                failures.append((name, "less_than", f"Input should be less than {domain[2]}", too_high))
+            continue
+
+        if domain[0] == "literal": # a missing value is not one of the choices either
+            is_valid = pc.is_in(column, value_set=pa.array(domain[1])).fill_null(False).to_numpy(zero_copy_only=False)
+            failures.append((name, "literal_error", f"Input should be {describe_choices(domain[1])}", ~is_valid))
+        else:
+            failures.append((name, "string_type", "Input should be a valid string", is_null))
+    return failures
+
+
+# Valid rows of a table (checked against the field domains), their positions & the errors of the invalid rows
+# (in the format of the pydantic errors of /predict_batch)
+def validate_table(table, domains):
+    import pyarrow as pa
+
+    columns = check_schema(table, domains)
+    failures = find_failures(columns, domains)
+    is_invalid = np.logical_or.reduce([failed for _, _, _, failed in failures]) if failures else np.zeros(table.num_rows, dtype=bool)
+
+    errors = {}
+    for name, error_type, msg, failed in failures:
+        for row in np.flatnonzero(failed).tolist():
+            errors.setdefault(row, []).append({"type": error_type, "loc": [name], "msg": msg})
+
+    valid_table = pa.table(columns).filter(pa.array(~is_invalid))
+    return valid_table, np.flatnonzero(~is_invalid), errors
+
+
+# Scorer input of (validated) rows: float64 arrays & dictionary-encoded string columns
+def to_columns(table, domains):
+    import pyarrow.compute as pc
+
+    columns = {}
+    for name, domain in domains.items():
+        column = table.column(name).combine_chunks()
+        if domain[0] == "number":
+            columns[name] = column.to_numpy(zero_copy_only=False)
+            continue
+        if name == PINCODE_FIELD:
+            column = pc.utf8_slice_codeunits(pc.utf8_trim_whitespace(column), -PINCODE_SUFFIX_LENGTH)
+            column = pc.replace_substring_regex(column, pattern=LEADING_SPACE_PATTERN, replacement="_")
+        encoded = pc.dictionary_encode(column)
+        columns[name] = DictionaryColumn(encoded.dictionary.to_pylist(), encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False))
+    return columns
+
+
+# Arrow IPC stream of the results (one row per input row, in input order): probability & prediction of the scored rows,
+# error of the others
+def build_response(n_rows, rows, probs, errors, threshold):
+    import pyarrow as pa
+
+    all_probs = np.full(n_rows, np.nan)
+    all_probs[rows] = probs
+    is_scored = np.zeros(n_rows, dtype=bool)
+    is_scored[rows] = True
+    labels = np.where(all_probs >= threshold, "Defaulter", "Not a defaulter")
+    messages = [None] * n_rows
+    for row, row_errors in errors.items():
+        messages[row] = "; ".join(f"{'.'.join(map(str, error['loc'])) or 'record'}: {error['msg']}" for error in row_errors)
+
+    table = pa.table({
+        "row": pa.array(np.arange(n_rows, dtype=np.int64)),
+        "probability": pa.array(all_probs, mask=~is_scored),
+        "prediction": pa.array(labels, mask=~is_scored),
+        "error": pa.array(messages, type=pa.string()),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
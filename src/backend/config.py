@@ -0,0 +1,83 @@
+import os
+
+# Serving configuration (overridable through environment variables)
+
+# Fitted ensemble, its fast-loading compiled artifact & the serving examples used for checks & warm-up
+MODEL_PATH = os.getenv("LOANTAP_MODEL_PATH", "models/ensemble_model.pkl")
+MODEL_ARTIFACT_DIR = os.getenv("LOANTAP_MODEL_ARTIFACT_DIR", "models/ensemble_artifact")
+SERVING_EXAMPLES_PATH = os.getenv("LOANTAP_SERVING_EXAMPLES_PATH", "models/serving_input_example.json")
+
+# Metadata of the fitted ensemble, with the probability threshold above which an applicant is classified as Defaulter
+# (tuned on out-of-fold probabilities, see data_preprocessing/tuning.py)
+MODEL_METADATA_PATH = os.getenv("LOANTAP_MODEL_METADATA_PATH", "models/model_metadata.json")
+
+# Threshold used when the metadata is missing or belongs to another model
+PREDICTION_THRESHOLD = float(os.getenv("LOANTAP_PREDICTION_THRESHOLD", "0.6088"))
+
+# Number of records scored per predict_proba call in batch scoring
+BATCH_CHUNK_SIZE = int(os.getenv("LOANTAP_BATCH_CHUNK_SIZE", "1000"))
+
+# Custom transformers modify the per-request frames in-place instead of copying them
+COPY_FREE_TRANSFORMS = os.getenv("LOANTAP_COPY_FREE_TRANSFORMS", "1") == "1"
+
+# One-hot encoded columns are kept sparse through the preprocessing steps
+SPARSE_ONEHOT = os.getenv("LOANTAP_SPARSE_ONEHOT", "0") == "1"
+
+# Requests are scored by the pipelines compiled into NumPy array operations (falls back to the pipelines on parity failure)
+FAST_PATH_SCORER = os.getenv("LOANTAP_FAST_PATH_SCORER", "1") == "1"
+
+# The XGBoost branch of the pipelines predicts with its booster directly, single-threaded below XGB_PARALLEL_MIN_ROWS rows
+# & with up to XGB_MAX_THREADS threads above (0 splits the CPUs between the scoring workers)
+XGB_NATIVE_PREDICT = os.getenv("LOANTAP_XGB_NATIVE_PREDICT", "1") == "1"
+XGB_PARALLEL_MIN_ROWS = int(os.getenv("LOANTAP_XGB_PARALLEL_MIN_ROWS", "2048"))
+XGB_MAX_THREADS = int(os.getenv("LOANTAP_XGB_MAX_THREADS", "0"))
+
+# Concurrent /predict requests are scored together, waiting up to BATCH_MAX_WAIT_MS for up to BATCH_MAX_SIZE records
+MICRO_BATCHING = os.getenv("LOANTAP_MICRO_BATCHING", "1") == "1"
+BATCH_MAX_WAIT_MS = float(os.getenv("LOANTAP_BATCH_MAX_WAIT_MS", "5"))
+BATCH_MAX_SIZE = int(os.getenv("LOANTAP_BATCH_MAX_SIZE", "64"))
+
+# Number of scoring worker processes forked after loading the model (0 scores in the API process)
+SERVING_WORKERS = int(os.getenv("LOANTAP_SERVING_WORKERS", "0"))
+
+# Start method of the worker processes of the models loaded while the API serves (hot swaps, rollbacks & shadow models),
+# which are not forked from the running API process (forkserver or spawn)
+LATE_WORKER_START_METHOD = os.getenv("LOANTAP_LATE_WORKER_START_METHOD", "forkserver")
+
+# Load the compiled scorer from its artifact when it is up to date with the pickled ensemble
+USE_MODEL_ARTIFACT = os.getenv("LOANTAP_USE_MODEL_ARTIFACT", "1") == "1"
+
+# Cached predictions of /predict (0 entries disables the cache)
+PREDICTION_CACHE_SIZE = int(os.getenv("LOANTAP_PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL_S = float(os.getenv("LOANTAP_PREDICTION_CACHE_TTL_S", "600"))
+
+# Per-stage profiling of the inference models, off by default as it times every stage of every request
+# (allocation tracing with tracemalloc slows scoring down noticeably)
+PROFILE_STAGES = os.getenv("LOANTAP_PROFILE_STAGES", "0") == "1"
+PROFILE_ALLOCATIONS = os.getenv("LOANTAP_PROFILE_ALLOCATIONS", "0") == "1"
+
+# Hot swaps of the serving model (see model_manager.py): largest difference allowed between the scoring model & the
+# fitted model it was prepared from on the serving examples, & delay before the worker pool of a replaced model is shut
+# down (its in-flight requests finish first)
+MODEL_PARITY_ATOL = float(os.getenv("LOANTAP_MODEL_PARITY_ATOL", "1e-6"))
+MODEL_SWAP_GRACE_S = float(os.getenv("LOANTAP_MODEL_SWAP_GRACE_S", "30"))
+
+# Token of the admin endpoints, sent in the X-Admin-Token header (admin endpoints are disabled without one)
+ADMIN_TOKEN = os.getenv("LOANTAP_ADMIN_TOKEN", "")
+
+# Reason codes (explain=true): the top-k raw fields pushing a record towards default, with XGBoost's approximate (Saabas)
+# contributions by default or its exact TreeSHAP ones (~100x slower)
+EXPLAIN_TOP_K = int(os.getenv("LOANTAP_EXPLAIN_TOP_K", "3"))
+EXPLAIN_EXACT_CONTRIBS = os.getenv("LOANTAP_EXPLAIN_EXACT_CONTRIBS", "0") == "1"
+
+# Shadow scoring (see shadow.py): comma-separated challenger models scored on the live traffic off the hot path
+# (names or ids of models logged in the MLflow tracking store, or paths of pickles), their scoring processes (run at
+# a lower CPU priority), the records allowed to wait for them (newer ones are shed), their batches (waiting up to
+# SHADOW_MAX_WAIT_MS for SHADOW_BATCH_SIZE records) & the sqlite log of their results
+SHADOW_MODELS = [spec.strip() for spec in os.getenv("LOANTAP_SHADOW_MODELS", "").split(",") if spec.strip()]
+SHADOW_WORKERS = int(os.getenv("LOANTAP_SHADOW_WORKERS", "1"))
+SHADOW_NICE = int(os.getenv("LOANTAP_SHADOW_NICE", "10"))
+SHADOW_MAX_PENDING = int(os.getenv("LOANTAP_SHADOW_MAX_PENDING", "10000"))
+SHADOW_BATCH_SIZE = int(os.getenv("LOANTAP_SHADOW_BATCH_SIZE", "256"))
+SHADOW_MAX_WAIT_MS = float(os.getenv("LOANTAP_SHADOW_MAX_WAIT_MS", "200"))
+SHADOW_LOG_PATH = os.getenv("LOANTAP_SHADOW_LOG_PATH", "shadow_log.sqlite")
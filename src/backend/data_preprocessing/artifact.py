@@ -0,0 +1,77 @@
+import json
+import hashlib
+import numpy as np
+from pathlib import Path
+from data_preprocessing.fast_scorer import CompiledScorer
+
+# Fast-loading artifact of a compiled scorer (only needs NumPy to load)
+# <artifact>/manifest.json   : format version, hash of the source model, scorer meta & index of the arrays
+# <artifact>/arrays/*.npy    : one file per array, memory-mapped when loading
+# <artifact>/<branch>.ubj    : native XGBoost booster of the tree branches (for tooling, not needed to score)
+
+ARTIFACT_FORMAT_VERSION = 1
+
+
+# SHA-256 of a file (identifies the source model of an artifact)
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Write a compiled scorer (& optionally the boosters of its tree branches) to an artifact directory
+def save_artifact(scorer, path, source_path=None, boosters=None):
+    path = Path(path)
+    (path / "arrays").mkdir(parents=True, exist_ok=True)
+
+    arrays_index = {}
+    for name, array in scorer.arrays.items():
+        file_name = f"arrays/{name}.npy"
+        np.save(path / file_name, np.ascontiguousarray(array))
+        arrays_index[name] = {"file": file_name, "dtype": str(array.dtype), "shape": list(array.shape)}
+
+    boosters_index = {}
+    for branch, booster in (boosters or {}).items():
+        booster.save_model(str(path / f"{branch}.ubj"))
+        boosters_index[branch] = f"{branch}.ubj"
+
+    manifest = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "source_sha256": file_sha256(source_path) if source_path is not None else None,
+        "meta": scorer.meta,
+        "arrays": arrays_index,
+        "boosters": boosters_index,
+    }
+    with open(path / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def read_manifest(path):
+    with open(Path(path) / "manifest.json") as f:
+        return json.load(f)
+
+
+# Check if an artifact exists & was exported from the given source model
+def is_artifact_current(path, source_path):
+    try:
+        manifest = read_manifest(path)
+    except FileNotFoundError:
+        return False
+    return manifest["format_version"] == ARTIFACT_FORMAT_VERSION and manifest["source_sha256"] == file_sha256(source_path)
+
+
+# Load the compiled scorer of an artifact
+def load_artifact(path, mmap=True):
+    path = Path(path)
+    manifest = read_manifest(path)
+    if manifest["format_version"] != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version {manifest['format_version']}")
+
+    # Memory-mapped arrays are viewed as plain arrays (the mapping stays alive through the view)
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        array = np.load(path / entry["file"], mmap_mode="r" if mmap else None)
+        arrays[name] = array.view(np.ndarray) if mmap else array
+    return CompiledScorer(manifest["meta"], arrays)
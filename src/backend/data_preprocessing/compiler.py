@@ -0,0 +1,284 @@
+import json
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from data_preprocessing.transformers import CATEGORY_MERGES, DataCleaner, Imputer, OutlierHandler, FeatureEngineer, CatEncoder, Scaler, FeatureDropper, DtypeConverter
+from data_preprocessing.fast_scorer import CompiledScorer, ENGINEERED_FEATURES, MISSING_CODE
+
+# Exporter lowering fitted pipelines (see build_pipeline) & their models into a CompiledScorer plan
+
+# Fixed raw feature layout of the loan records
+NUMERIC_FIELDS = ["loan_amnt", "int_rate", "installment", "annual_inc", "dti", "open_acc", "pub_rec", "revol_bal", "revol_util", "total_acc", "mort_acc", "pub_rec_bankruptcies"]
+CATEGORICAL_FIELDS = ["term", "grade", "sub_grade", "emp_length", "home_ownership", "verification_status", "purpose", "initial_list_status", "application_type", "address"]
+DATE_FIELDS = ["issue_d", "earliest_cr_line"]
+PINCODE_FIELD = "address"
+
+# Ordinal maps of the CatEncoder
+ORDINAL_MAPS = {"term": "term_map", "grade": "grade_map", "sub_grade": "sub_grade_map", "emp_length": "emp_length_map"}
+
+# Canonical order of the pipeline steps that can be compiled
+STEP_ORDER = [DataCleaner, Imputer, OutlierHandler, FeatureEngineer, CatEncoder, Scaler, FeatureDropper, DtypeConverter]
+
+
+# Branch pipelines of a fitted model (EnsembleModel, SharedTrunkEnsemble or a single pipeline)
+def get_branches(model):
+    if hasattr(model, "pipelines"):
+        names = model.names or [f"branch_{idx}" for idx in range(len(model.pipelines))]
+        return dict(zip(names, model.pipelines)), model.weights
+    if hasattr(model, "lr_pipeline"):
+        return {"lr_pipeline": model.lr_pipeline, "xgb_pipeline": model.xgb_pipeline}, model.weights
+    return {"pipeline": model}, None
+
+
+# Categories seen by any encoder of the pipelines, per categorical field
+def collect_vocabularies(pipelines):
+    vocabularies = {field: set() for field in CATEGORICAL_FIELDS}
+    for field, merges in CATEGORY_MERGES.items():
+        vocabularies[field].update(merges.values())
+
+    for pipeline in pipelines:
+        for _, step in pipeline.steps:
+            if isinstance(step, Imputer) and step.cat_features:
+                update_vocabularies(vocabularies, step.cat_features, [[value] for value in step.cat_imputer_.statistics_])
+            if isinstance(step, CatEncoder):
+                if step.ohe_features:
+                    update_vocabularies(vocabularies, step.ohe_features, step.ohe_encoder_.categories_)
+                if step.supervised_features and step.get_target_encodings() is not None:
+                    for field, encodings in step.get_target_encodings().items():
+                        update_vocabularies(vocabularies, [field], [encodings.index])
+                elif step.supervised_features:
+                    for col_mapping in step.sup_encoder_.ordinal_encoder.mapping:
+                        update_vocabularies(vocabularies, [col_mapping["col"]], [col_mapping["mapping"].index])
+                for field, map_name in ORDINAL_MAPS.items():
+                    vocabularies[field].update(getattr(step, map_name))
+
+    return {field: sorted(categories) for field, categories in vocabularies.items()}
+
+
+# Add the (string) categories of the fields to the vocabularies
+def update_vocabularies(vocabularies, fields, categories):
+    for field, field_categories in zip(fields, categories):
+        if field not in vocabularies:
+            raise ValueError(f"Feature {field} is not a categorical feature")
+        vocabularies[field].update(category for category in field_categories if isinstance(category, str))
+
+
+# Table of encoded values indexed by categorical code + 2 (missing, unknown, then the vocabulary)
+def build_table(vocabulary, encode, missing_value, unknown_value):
+    return np.array([missing_value, unknown_value] + [encode(category) for category in vocabulary], dtype=np.float64)
+
+
+# Lower one fitted pipeline into arrays
+def compile_branch(pipeline, vocabularies):
+    n_num = len(NUMERIC_FIELDS)
+    num_fill = np.full(n_num, np.nan)
+    code_fill = np.full(len(CATEGORICAL_FIELDS), MISSING_CODE, dtype=np.int64)
+    cap_upper = np.full(n_num, np.inf)
+    tables, table_fields = [], []
+    scaling = {}
+
+    # Source of every available feature: ("num", idx), ("eng", idx), ("table", idx), ("raw", field) or ("date", field)
+    sources = {field: ("num", idx) for idx, field in enumerate(NUMERIC_FIELDS)}
+    sources.update({field: ("raw", field) for field in CATEGORICAL_FIELDS})
+    sources.update({field: ("date", field) for field in DATE_FIELDS})
+
+    def add_table(field, table):
+        tables.append(table)
+        table_fields.append(CATEGORICAL_FIELDS.index(field))
+        return ("table", len(tables) - 1)
+
+    def code_of(field, category):
+        return vocabularies[field].index(category)
+
+    *steps, (_, model) = pipeline.steps
+    last_rank = -1
+    for name, step in steps:
+        if step is None or step == "passthrough" or hasattr(step, "fit_resample"):
+            continue # samplers are not applied at prediction time
+        rank = next((rank for rank, step_type in enumerate(STEP_ORDER) if type(step) is step_type), None)
+        if rank is None or rank < last_rank:
+            raise ValueError(f"Step {name} ({type(step).__name__}) cannot be compiled")
+        last_rank = rank
+
+        if isinstance(step, Imputer):
+            if step.use_knn_imputation:
+                raise ValueError("KNN imputation cannot be compiled")
+            for field, value in zip(step.num_features or [], step.num_imputer_.statistics_ if step.num_features else []):
+                num_fill[NUMERIC_FIELDS.index(field)] = value
+            for field, value in zip(step.cat_features or [], step.cat_imputer_.statistics_ if step.cat_features else []):
+                code_fill[CATEGORICAL_FIELDS.index(field)] = code_of(field, value)
+
+        elif isinstance(step, OutlierHandler):
+            for field, upper_bound in step.bounds_.items():
+                cap_upper[NUMERIC_FIELDS.index(field)] = upper_bound
+
+        elif isinstance(step, FeatureEngineer):
+            sources.update({feat: ("eng", idx) for idx, feat in enumerate(ENGINEERED_FEATURES)})
+
+        elif isinstance(step, CatEncoder):
+            # Target encoding (unknown & missing categories get the encoder's prior values)
+            # Encodings of a chunked fit give missing values their own encoding when seen in the fit
+            if step.supervised_features and step.get_target_encodings() is not None:
+                for field, encodings in step.get_target_encodings().items():
+                    encode = lambda category, encodings=encodings: encodings.get(category, step.target_prior_)
+                    missing_value = encodings[encodings.index.isna()].iloc[0] if encodings.index.hasnans else step.target_prior_
+                    sources[field] = add_table(field, build_table(vocabularies[field], encode, missing_value, step.target_prior_))
+            elif step.supervised_features:
+                encoder = step.sup_encoder_
+                for col_mapping in encoder.ordinal_encoder.mapping:
+                    field = col_mapping["col"]
+                    ordinal_codes, target_values = col_mapping["mapping"], encoder.mapping[field]
+                    encode = lambda category: target_values[ordinal_codes.get(category, -1)]
+                    sources[field] = add_table(field, build_table(vocabularies[field], encode, target_values[-2], target_values[-1]))
+
+            # One-hot encoding (unknown & missing categories are all zeros)
+            if step.ohe_features:
+                encoder = step.ohe_encoder_
+                if encoder.handle_unknown != "ignore" or getattr(encoder, "infrequent_categories_", None):
+                    raise ValueError("One-hot encoder should ignore unknown categories & have no infrequent categories")
+                ohe_names = iter(encoder.get_feature_names_out())
+                for field, categories, drop_idx in zip(step.ohe_features, encoder.categories_, encoder.drop_idx_ if encoder.drop_idx_ is not None else [None] * len(step.ohe_features)):
+                    for idx, category in enumerate(categories):
+                        if idx == drop_idx:
+                            continue
+                        table = np.zeros(len(vocabularies[field]) + 2)
+                        table[code_of(field, category) + 2 if isinstance(category, str) else 0] = 1
+                        sources[next(ohe_names)] = add_table(field, table)
+                    sources.pop(field)
+
+            # Ordinal encoding (categories outside the maps become NaN)
+            for field, map_name in ORDINAL_MAPS.items():
+                if sources.get(field) != ("raw", field):
+                    raise ValueError(f"Feature {field} cannot be both ordinal & target/one-hot encoded")
+                ordinal_map = getattr(step, map_name)
+                encode = lambda category: ordinal_map.get(category, np.nan)
+                sources[field] = add_table(field, build_table(vocabularies[field], encode, np.nan, np.nan))
+
+        elif isinstance(step, Scaler):
+            if step.features:
+                scaler = step.scaler_
+                center = scaler.center_ if scaler.center_ is not None else np.zeros(len(step.features))
+                scale = scaler.scale_ if scaler.scale_ is not None else np.ones(len(step.features))
+                scaling.update({feat: (c, s) for feat, c, s in zip(step.features, center, scale)})
+
+        elif isinstance(step, FeatureDropper):
+            for feat in step.features:
+                sources.pop(feat, None)
+
+    # Layout of the final estimator's features over the source block [numerical | engineered | tables]
+    layout = []
+    offsets = {"num": 0, "eng": n_num, "table": n_num + len(ENGINEERED_FEATURES)}
+    for feat in model.feature_names_in_:
+        kind, idx = sources.get(feat, ("missing", feat))
+        if kind not in offsets:
+            raise ValueError(f"Feature {feat} cannot be compiled ({kind})")
+        layout.append(offsets[kind] + idx)
+
+    max_vocab = max(len(vocab) for vocab in vocabularies.values()) + 2
+    arrays = {
+        "num_fill": num_fill,
+        "code_fill": code_fill,
+        "cap_upper": cap_upper,
+        "tables": np.array([np.pad(table, (0, max_vocab - len(table))) for table in tables]).reshape(len(tables), max_vocab),
+        "table_fields": np.array(table_fields, dtype=np.int64),
+        "layout": np.array(layout, dtype=np.int64),
+        "center": np.array([scaling.get(feat, (0.0, 1.0))[0] for feat in model.feature_names_in_]),
+        "scale": np.array([scaling.get(feat, (0.0, 1.0))[1] for feat in model.feature_names_in_]),
+    }
+    model_arrays, model_meta = compile_estimator(model)
+    arrays.update(model_arrays)
+    return arrays, model_meta
+
+
+# Lower the final estimator into arrays
+def compile_estimator(model):
+    if isinstance(model, LogisticRegression):
+        if model.coef_.shape[0] != 1:
+            raise ValueError("Only binary logistic regression can be compiled")
+        return {"coef": model.coef_[0].astype(np.float64), "intercept": model.intercept_.astype(np.float64)}, {"model": "linear"}
+
+    if hasattr(model, "get_booster"):
+        return compile_xgboost(model)
+
+    raise ValueError(f"Estimator {type(model).__name__} cannot be compiled")
+
+
+# Lower a fitted XGBClassifier into padded node arrays (one row per tree)
+def compile_xgboost(model):
+    booster = model.get_booster()
+    model_json = json.loads(booster.save_raw("json"))
+    learner = model_json["learner"]
+    if learner["objective"]["name"] != "binary:logistic":
+        raise ValueError("Only binary:logistic XGBoost models can be compiled")
+
+    # Trees used by predict_proba (up to the best iteration with early stopping)
+    trees = learner["gradient_booster"]["model"]["trees"]
+    best_iteration = booster.attr("best_iteration")
+    n_trees = int(best_iteration) + 1 if best_iteration is not None else len(trees)
+    trees = trees[:n_trees]
+    max_nodes = max(len(tree["left_children"]) for tree in trees)
+
+    arrays = {
+        "feature": np.zeros((n_trees, max_nodes), dtype=np.int32),
+        "threshold": np.zeros((n_trees, max_nodes), dtype=np.float32),
+        "left": np.zeros((n_trees, max_nodes), dtype=np.int32),
+        "right": np.zeros((n_trees, max_nodes), dtype=np.int32),
+        "default_left": np.zeros((n_trees, max_nodes), dtype=bool),
+        "leaf_value": np.zeros((n_trees, max_nodes), dtype=np.float32),
+    }
+    max_depth = 0
+    for t, tree in enumerate(trees):
+        if any(tree["split_type"]):
+            raise ValueError("Categorical splits cannot be compiled")
+        left, right = np.array(tree["left_children"]), np.array(tree["right_children"])
+        is_leaf = left == -1
+        nodes = np.arange(len(left))
+
+        # Leaves point to themselves, so extra levels of the walk keep the rows on their leaf
+        arrays["feature"][t, :len(left)] = np.where(is_leaf, 0, tree["split_indices"])
+        arrays["threshold"][t, :len(left)] = tree["split_conditions"]
+        arrays["left"][t, :len(left)] = np.where(is_leaf, nodes, left)
+        arrays["right"][t, :len(left)] = np.where(is_leaf, nodes, right)
+        arrays["default_left"][t, :len(left)] = np.array(tree["default_left"], dtype=bool)
+        arrays["leaf_value"][t, :len(left)] = np.where(is_leaf, tree["split_conditions"], 0)
+
+        # Depth of the tree
+        depth = np.zeros(len(left), dtype=np.int64)
+        for node in nodes:
+            if not is_leaf[node]:
+                depth[left[node]] = depth[right[node]] = depth[node] + 1
+        max_depth = max(max_depth, int(depth.max()))
+
+    base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+    arrays["base_margin"] = np.array([np.log(base_score / (1 - base_score))], dtype=np.float32)
+    return arrays, {"model": "trees", "max_depth": max_depth}
+
+
+# Lower a fitted model (EnsembleModel, SharedTrunkEnsemble or a single pipeline) into a CompiledScorer
+def compile_model(model):
+    pipelines, weights = get_branches(model)
+    vocabularies = collect_vocabularies(pipelines.values())
+
+    meta = {
+        "numeric_fields": NUMERIC_FIELDS,
+        "categorical_fields": CATEGORICAL_FIELDS,
+        "date_fields": DATE_FIELDS,
+        "pincode_field": PINCODE_FIELD,
+        "category_merges": CATEGORY_MERGES,
+        "vocabularies": vocabularies,
+        "weights": list(weights) if weights is not None else [1.0],
+        "classes": np.asarray(model.classes_).tolist(),
+        "branches": {},
+    }
+    arrays = {}
+    for branch, pipeline in pipelines.items():
+        branch_arrays, meta["branches"][branch] = compile_branch(pipeline, vocabularies)
+        arrays.update({f"{branch}.{name}": array for name, array in branch_arrays.items()})
+
+    return CompiledScorer(meta, arrays)
+
+
+# Maximum absolute difference between the probabilities of a model & its compiled scorer
+# The model gets its own copy of the records, as copy-free pipelines modify their input
+def check_parity(model, scorer, X, atol=1e-6):
+    max_diff = float(np.max(np.abs(model.predict_proba(X.copy()) - scorer.predict_proba(X))))
+    return max_diff <= atol, max_diff
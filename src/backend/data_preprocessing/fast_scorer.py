@@ -0,0 +1,210 @@
+import numpy as np
+from data_preprocessing.parsing import date_parser, pincode_parser
+
+# Pure-NumPy scorer for pipelines & ensembles compiled by data_preprocessing.compiler
+# Scoring runs NumPy array operations only, skipping pandas/sklearn entirely
+
+# Categorical codes for missing & unknown values (tables are indexed with code + 2)
+MISSING_CODE = -2
+UNKNOWN_CODE = -1
+
+# Features created by the FeatureEngineer, in order
+ENGINEERED_FEATURES = ["emi_ratio", "credit_age_years", "closed_acc", "negative_rec", "credit_util_ratio", "mortgage_ratio"]
+
+# Number of rows evaluated at once by the tree ensembles (bounds the (rows x trees) work arrays)
+TREE_BLOCK_SIZE = 4096
+
+
+# Check if a raw value is missing (None or NaN)
+def is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+# Convert a date string to days since 0001-01-01 (memoized like the DataCleaner parsing)
+def parse_date_days(value):
+    if is_missing(value):
+        return np.nan
+    return date_parser.get(str(value).strip()).toordinal()
+
+
+# Column of repeated values as its distinct values & the position of every row's value among them (-1 if missing),
+# e.g. a dictionary-encoded Arrow column. The scorer parses & encodes each distinct value once, then indexes the result
+class DictionaryColumn:
+    def __init__(self, values, indices):
+        self.values = list(values)
+        self.indices = np.asarray(indices, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.indices)
+
+    # Row values (missing ones as None), for consumers of plain columns (e.g. pandas)
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self.values + [None], dtype=object)[self.indices]
+
+    def __iter__(self):
+        return iter(self.__array__())
+
+    # Result of a function of each distinct value, broadcast to the rows (missing rows get missing_value)
+    def map_values(self, func, missing_value, dtype):
+        return np.array([func(value) for value in self.values] + [missing_value], dtype=dtype)[self.indices]
+
+
+# Fetch the raw columns from a record dict, a list of records, a columnar dict, a structured array or a dataframe
+def get_columns(X, fields):
+    if isinstance(X, dict):
+        return {field: X[field] if isinstance(X[field], (list, tuple, np.ndarray, DictionaryColumn)) else [X[field]] for field in fields}
+    if isinstance(X, (list, tuple)):
+        return {field: [record[field] for record in X] for field in fields}
+    return {field: np.asarray(X[field]) for field in fields}
+
+
+# Scorer running a compiled plan of NumPy array operations over a fixed feature layout
+class CompiledScorer:
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.arrays = arrays
+        self.classes_ = np.asarray(meta["classes"])
+
+        # Lookup of cleaned categorical values to their codes
+        self.code_maps_ = {}
+        for field in meta["categorical_fields"]:
+            code_map = {category: code for code, category in enumerate(meta["vocabularies"][field])}
+            for raw_value, merged_value in meta["category_merges"].get(field, {}).items():
+                code_map[raw_value] = code_map.get(merged_value, UNKNOWN_CODE)
+            self.code_maps_[field] = code_map
+
+        # Arrays of every branch, with the tree nodes flattened across trees
+        self.branch_arrays_ = {}
+        for branch, branch_meta in meta["branches"].items():
+            prefix = f"{branch}."
+            branch_arrays = {name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)}
+            if branch_meta["model"] == "trees":
+                n_trees, max_nodes = branch_arrays["feature"].shape
+                offsets = (np.arange(n_trees, dtype=np.int64) * max_nodes)[:, None]
+                # Nodes are addressed by 2 x their flattened index, so the child of node i is at 2i + go_right
+                for name in ("feature", "threshold", "default_left", "leaf_value"):
+                    branch_arrays[name] = np.repeat(branch_arrays[name].ravel(), 2)
+                branch_arrays["roots"] = 2 * offsets[:, 0]
+                branch_arrays["children"] = 2 * np.stack([branch_arrays["left"] + offsets, branch_arrays["right"] + offsets], axis=-1).ravel()
+            self.branch_arrays_[branch] = branch_arrays
+
+    def _encode(self, field, values):
+        if isinstance(values, DictionaryColumn):
+            return np.append(self._encode(field, values.values), MISSING_CODE)[values.indices]
+        code_map = self.code_maps_[field]
+        is_pincode = field == self.meta["pincode_field"]
+        codes = np.empty(len(values), dtype=np.int64)
+        for idx, value in enumerate(values):
+            if is_missing(value):
+                codes[idx] = MISSING_CODE
+                continue
+            value = str(value).strip()
+            if is_pincode:
+                value = pincode_parser.get(value)
+                if is_missing(value):
+                    codes[idx] = MISSING_CODE
+                    continue
+            codes[idx] = code_map.get(value, UNKNOWN_CODE)
+        return codes
+
+    def decode(self, X):
+        # Numerical block, categorical codes & credit-line age (in days) of the records
+        meta = self.meta
+        columns = get_columns(X, meta["numeric_fields"] + meta["categorical_fields"] + meta["date_fields"])
+        num = np.array([columns[field] for field in meta["numeric_fields"]], dtype=np.float64).T
+        codes = np.array([self._encode(field, columns[field]) for field in meta["categorical_fields"]]).T
+        issue_d, earliest_cr_line = (
+            columns[field].map_values(parse_date_days, np.nan, np.float64) if isinstance(columns[field], DictionaryColumn)
+            else [parse_date_days(value) for value in columns[field]]
+            for field in meta["date_fields"]
+        )
+        age_days = np.array(issue_d, dtype=np.float64) - np.array(earliest_cr_line, dtype=np.float64)
+        return num, codes, age_days
+
+    def _engineer(self, num, age_days):
+        col = {field: num[:, idx] for idx, field in enumerate(self.meta["numeric_fields"])}
+        eng = np.empty((len(num), len(ENGINEERED_FEATURES)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            eng[:, 0] = col["installment"] / (col["annual_inc"] / 12) # emi_ratio
+            eng[:, 1] = np.round(age_days / 365, 1) # credit_age_years
+            eng[:, 2] = col["total_acc"] - col["open_acc"] # closed_acc
+            eng[:, 3] = (col["pub_rec"] > 0) | (col["pub_rec_bankruptcies"] > 0) # negative_rec
+            eng[:, 4] = col["revol_bal"] / col["annual_inc"] # credit_util_ratio
+            eng[:, 5] = col["mort_acc"] / col["total_acc"] # mortgage_ratio
+        # Ratios are rounded to 2 decimals (in one go)
+        eng[:, [0, 4, 5]] = eng[:, [0, 4, 5]].round(2)
+        return eng
+
+    def branch_features(self, branch, num, codes, age_days):
+        # Model input of a branch, in the layout of its final estimator
+        arrays = self.branch_arrays_[branch]
+
+        # Imputation & outlier capping (NaN stays NaN as in the pipelines)
+        num = np.where(np.isnan(num), arrays["num_fill"], num)
+        num = np.minimum(num, arrays["cap_upper"])
+        codes = np.where(codes == MISSING_CODE, arrays["code_fill"], codes)
+
+        # Engineered & categorical-encoded features
+        eng = self._engineer(num, age_days)
+        n_tables = len(arrays["table_fields"])
+        table_values = arrays["tables"][np.arange(n_tables), codes[:, arrays["table_fields"]] + 2]
+
+        # Final layout & scaling
+        X = np.hstack([num, eng, table_values])[:, arrays["layout"]]
+        return (X - arrays["center"]) / arrays["scale"]
+
+    def _linear_proba(self, branch, X):
+        arrays = self.branch_arrays_[branch]
+
+        # Linear models reject missing values, as sklearn does
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity")
+        margin = X @ arrays["coef"] + arrays["intercept"][0]
+        p = 1 / (1 + np.exp(-margin))
+        return np.column_stack([1 - p, p])
+
+    def _trees_proba(self, branch, X):
+        arrays = self.branch_arrays_[branch]
+        X = X.astype(np.float32)
+        margin = np.empty(len(X), dtype=np.float32)
+
+        # Walk all the trees level by level for a block of rows (nodes are indices into the flattened trees)
+        for start in range(0, len(X), TREE_BLOCK_SIZE):
+            X_block = X[start:start + TREE_BLOCK_SIZE]
+            X_flat = X_block.ravel()
+            row_offsets = (np.arange(len(X_block)) * X_block.shape[1])[:, None]
+            has_missing = np.isnan(X_flat).any()
+            node = np.broadcast_to(arrays["roots"], (len(X_block), len(arrays["roots"])))
+            for _ in range(self.meta["branches"][branch]["max_depth"]):
+                x = X_flat[row_offsets + arrays["feature"][node]]
+                go_right = x >= arrays["threshold"][node]
+                if has_missing:
+                    # Missing values follow the default direction of the node
+                    go_right = ~((x < arrays["threshold"][node]) | (np.isnan(x) & arrays["default_left"][node]))
+                node = arrays["children"][node + go_right]
+            margin[start:start + TREE_BLOCK_SIZE] = arrays["leaf_value"][node].sum(axis=1, dtype=np.float32)
+
+        p = 1 / (1 + np.exp(-(margin + arrays["base_margin"][0])))
+        return np.column_stack([1 - p, p])
+
+    def estimator_proba(self, branch, X):
+        if self.meta["branches"][branch]["model"] == "linear":
+            return self._linear_proba(branch, X)
+        return self._trees_proba(branch, X)
+
+    def branch_proba(self, branch, num, codes, age_days):
+        return self.estimator_proba(branch, self.branch_features(branch, num, codes, age_days))
+
+    def predict_proba(self, X):
+        num, codes, age_days = self.decode(X)
+
+        # Aggregating prediction probabilities of the branches with weights
+        p_agg = 0
+        for branch, weight in zip(self.meta["branches"], self.meta["weights"]):
+            p_agg = p_agg + weight * self.branch_proba(branch, num, codes, age_days)
+        return p_agg / sum(self.meta["weights"])
+
+    def predict(self, X):
+        # Default threshold is 0.5
+        probas = self.predict_proba(X)
+        return np.argmax(probas, axis=-1)
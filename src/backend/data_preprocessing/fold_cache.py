@@ -0,0 +1,100 @@
+import os
+import pickle
+import hashlib
+import inspect
+import tempfile
+import numpy as np
+import pandas as pd
+import joblib
+from pathlib import Path
+from sklearn.base import BaseEstimator
+
+# On-disk cache of fitted preprocessing steps & their transformed outputs, for hyperparameter searches
+# Used as the memory of a pipeline (see build_pipeline): each step is fitted once per distinct (step, input data) & its
+# fitted copy with the transformed fold matrix is reloaded for every other candidate, also across sessions
+# Frames are keyed on pandas' vectorized row hashes, as joblib's hashing of object columns is slower than refitting
+
+
+# Content hash of a fitting argument (frames & arrays by their data, estimators by their parameters & code)
+def hash_value(value, digest):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        columns = value.columns if isinstance(value, pd.DataFrame) else [value.name]
+        dtypes = value.dtypes if isinstance(value, pd.DataFrame) else [value.dtype]
+        digest.update(repr([(str(col), str(dtype)) for col, dtype in zip(columns, dtypes)]).encode())
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        digest.update(repr((value.shape, str(value.dtype))).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, BaseEstimator):
+        # Editing the code of an estimator (or of a nested one, e.g. the steps of a pipeline) invalidates its entries
+        digest.update(joblib.hash(value).encode())
+        nested = [param for param in value.get_params(deep=True).values() if isinstance(param, BaseEstimator)]
+        for estimator in [value] + nested:
+            digest.update(get_class_source(type(estimator)).encode())
+    else:
+        digest.update(joblib.hash(value).encode())
+
+
+def get_class_source(cls):
+    try:
+        return inspect.getsource(cls)
+    except (OSError, TypeError):
+        return cls.__qualname__
+
+
+# Cache with the interface of joblib.Memory used by pipelines (cache(func) returns a memoized func)
+# It only holds its location, as pipelines clone their memory & send it to the parallel search workers
+class PreprocessingCache:
+    def __init__(self, location):
+        self.location = Path(location)
+
+    def make_key(self, func, args, kwargs, output_keys):
+        digest = hashlib.blake2b(f"{func.__module__}.{func.__qualname__}".encode(), digest_size=16)
+        for name, value in [(None, value) for value in args] + sorted(kwargs.items()):
+            if name is not None:
+                digest.update(name.encode())
+            # The input of a step is the output of the previous (cached) step: its key stands for its content
+            output_key = output_keys.get(id(value))
+            if output_key is not None and output_key[0] is value:
+                digest.update(output_key[1].encode())
+            else:
+                hash_value(value, digest)
+        return digest.hexdigest()
+
+    def cache(self, func):
+        # Key of the last output of this memoized func (a pipeline memoizes once per fit), by object id
+        # Only the last one is kept, so the intermediate frames of the fit are freed as usual
+        output_keys = {}
+
+        def cached(*args, **kwargs):
+            key = self.make_key(func, args, kwargs, output_keys)
+            path = self.location / f"{key}.pkl"
+            result = None
+            if path.exists():
+                try:
+                    with open(path, "rb") as f:
+                        result = pickle.load(f)
+                except (OSError, EOFError, pickle.UnpicklingError):
+                    pass # unreadable entry, refitted & overwritten below
+
+            if result is None:
+                result = func(*args, **kwargs)
+                # Written to a temporary file first, so parallel search workers never read a partial entry
+                self.location.mkdir(parents=True, exist_ok=True)
+                with tempfile.NamedTemporaryFile(dir=self.location, suffix=".tmp", delete=False) as f:
+                    pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(f.name, path)
+
+            output_keys.clear()
+            output_keys[id(result[0])] = (result[0], key)
+            return result
+
+        return cached
+
+    def stats(self):
+        entries = list(self.location.glob("*.pkl"))
+        return {"entries": len(entries), "size_bytes": sum(path.stat().st_size for path in entries)}
+
+    def clear(self):
+        for path in self.location.glob("*.pkl"):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,98 @@
+import re
+import threading
+import numpy as np
+from datetime import datetime
+from collections import OrderedDict
+
+# Memoized parsing of the date & address features
+# These columns have few distinct values (month-year strings, a few thousand pincodes),
+# so every distinct value is parsed once & later lookups hit the cache
+# pandas is only imported when needed, so the compiled scorer can parse records without it
+
+# Month-year format of the date features (e.g. Jan-2015)
+DATE_FORMAT = "%b-%Y"
+
+# Pincode at the end of the address
+PINCODE_PATTERN = re.compile(r'.(\d{5})$')
+
+
+# Parse a date string with the known format, falling back to mixed-format inference
+def parse_date(value):
+    try:
+        return datetime.strptime(value, DATE_FORMAT)
+    except (ValueError, TypeError):
+        import pandas as pd
+        return pd.to_datetime(value, format="mixed")
+
+
+# Extract the pincode of an address (NaN if there is none)
+def extract_pincode(value):
+    if not isinstance(value, str):
+        return np.nan
+    match = PINCODE_PATTERN.search(value)
+    return match.group(1) if match else np.nan
+
+
+# Bounded LRU cache of a parsing function, with hit/miss counters
+class CachedParser:
+    def __init__(self, parse, maxsize=4096):
+        self.parse = parse
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, value):
+        with self._lock:
+            if value in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(value)
+                return self._cache[value]
+            self.misses += 1
+
+        # Parsing happens outside the lock (a concurrent miss on the same value parses it twice)
+        parsed = self.parse(value)
+        with self._lock:
+            self._cache[value] = parsed
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False) # evict the least recently used value
+        return parsed
+
+    def __call__(self, series):
+        # Each distinct value is looked up once & mapped back onto the series (missing values stay missing)
+        lookup = {value: self.get(value) for value in series.dropna().unique()}
+        return series.map(lookup)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "maxsize": self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Parsers shared by the DataCleaner & the compiled scorer
+date_parser = CachedParser(parse_date, maxsize=4096)
+pincode_parser = CachedParser(extract_pincode, maxsize=16384)
+
+
+# Convert a series of date strings to datetime
+def parse_dates(series):
+    import pandas as pd
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(date_parser(series))
+
+
+# Extract the pincodes of a series of addresses
+def extract_pincodes(series):
+    return pincode_parser(series).astype(object)
+
+
+# Hit/miss counters of the parsing caches
+def get_parsing_stats():
+    return {"dates": date_parser.stats(), "pincodes": pincode_parser.stats()}
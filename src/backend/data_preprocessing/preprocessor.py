@@ -1,6 +1,12 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
 from imblearn.pipeline import Pipeline
 from imblearn.over_sampling import SMOTE
-from data_preprocessing.transformers import DataCleaner, Imputer, OutlierHandler, FeatureEngineer, FeatureDropper, CatEncoder, Scaler, DtypeConverter
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from data_preprocessing.fold_cache import PreprocessingCache
+from data_preprocessing.transformers import BaseTransformer, DataCleaner, Imputer, OutlierHandler, FeatureEngineer, FeatureDropper, CatEncoder, Scaler, DtypeConverter
 
 # Build pipeline
 def build_pipeline(
@@ -16,7 +22,10 @@ def build_pipeline(
         use_scaling=True,
         use_smote=False, 
         features_to_drop=None,
-        convert_cat_dtype=False
+        convert_cat_dtype=False,
+        copy=True,
+        sparse_ohe=False,
+        cache=None
     ):
     # Feature types
     scaling_features = numerical_features + engineered_features + ordinal_features # including ordinal-encoded except 
@@ -25,31 +34,33 @@ def build_pipeline(
     if use_imputation:
         imputer = Imputer(use_knn_imputation=False, 
                           num_features=numerical_features,
-                          cat_features=categorical_features)
+                          cat_features=categorical_features,
+                          copy=copy)
     else:
         imputer = "passthrough"
 
     #-----Outlier handling-----
     if use_outlier_capping:
-        outlier_capper = OutlierHandler(features=numerical_features)
+        outlier_capper = OutlierHandler(features=numerical_features, copy=copy)
     else:
         outlier_capper = "passthrough"
 
     #-----Categorical encoding-----
     if use_encoding:
-        cat_encoder = CatEncoder(ohe_features=onehot_features, supervised_features=supervised_features)
+        cat_encoder = CatEncoder(ohe_features=onehot_features, supervised_features=supervised_features,
+                                 sparse_output=sparse_ohe, copy=copy)
     else:
         cat_encoder = "passthrough"
     
     #-----Scaling-----
     if use_scaling:
-        scaler = Scaler(features=scaling_features)
+        scaler = Scaler(features=scaling_features, copy=copy)
     else:
         scaler = "passthrough"
         
     #-----Dropping specified features-----
     if features_to_drop:
-        feat_dropper = FeatureDropper(features=features_to_drop)
+        feat_dropper = FeatureDropper(features=features_to_drop, copy=copy)
     else:
         feat_dropper = "passthrough"
 
@@ -62,21 +73,164 @@ def build_pipeline(
     #-----Converting Categorical features' dtype-----
     # Useful for algorithms like Xgboost to handle categorical features
     if convert_cat_dtype:
-        dtype_converter = DtypeConverter()
+        dtype_converter = DtypeConverter(copy=copy)
     else:
         dtype_converter = "passthrough"
 
+    #-----Caching of the fitted steps-----
+    # With a cache (directory or PreprocessingCache), hyperparameter searches over a model appended to the pipeline
+    # fit the preprocessing once per fold & reuse it across candidates & sessions
+    if isinstance(cache, (str, Path)):
+        cache = PreprocessingCache(cache)
+
     # Preprocessing pipeline
     final_pipeline = Pipeline(steps=[
-        ("data_cleaner", DataCleaner()),
+        ("data_cleaner", DataCleaner(copy=copy)),
         ("imputer", imputer),
         ("outlier_capper", outlier_capper),
-        ("feature_engineer", FeatureEngineer()),
+        ("feature_engineer", FeatureEngineer(copy=copy)),
         ("cat_encoder", cat_encoder),
         ("scaler", scaler),
         ("feature_dropper", feat_dropper),
         ("oversampler", oversampler),
         ("dtype_converter", dtype_converter)
-    ])
+    ], memory=cache)
+
+    return final_pipeline
+
+
+# Switch the custom transformers of a (fitted) pipeline to copy-free mode & sparse one-hot output
+# Useful for the serving process, where the input frame is built per request & never reused
+def set_copy_mode(pipeline, copy=False, sparse_ohe=False):
+    for _, step in pipeline.steps:
+        if isinstance(step, BaseTransformer):
+            step.set_params(copy=copy)
+        if isinstance(step, CatEncoder):
+            step.set_params(sparse_output=sparse_ohe)
+    return pipeline
+
+
+# Check if any step of the pipeline modifies its input frame in-place
+def modifies_input(pipeline):
+    return any(isinstance(step, BaseTransformer) and not step.copy for _, step in pipeline.steps)
+
+# Steps without any fitted state, which are interchangeable across pipelines when their parameters match
+STATELESS_STEPS = (DataCleaner, FeatureEngineer, FeatureDropper)
+
+# Check if two pipeline steps produce identical outputs for the same input
+def is_same_step(step_a, step_b):
+    if step_a is step_b:
+        return True
+    if step_a in (None, "passthrough") and step_b in (None, "passthrough"):
+        return True
+    return (isinstance(step_a, STATELESS_STEPS)
+            and type(step_a) is type(step_b)
+            and step_a.get_params() == step_b.get_params())
+
+
+# Fit a copy of a transformer on one chunk (after the already fitted steps before it)
+def partial_fit_chunk(transformer, X, y, head=None):
+    if head is not None:
+        X = head.transform(X)
+    return transformer.partial_fit(X, y)
+
+
+# Fit a transformer with partial_fit on chunks of (X, y), the fitted chunks being merged in order
+# With n_jobs != 1 the chunks are fitted in parallel (each on its own copy of the transformer)
+def fit_in_chunks(transformer, chunks, n_jobs=1, head=None):
+    if n_jobs == 1:
+        fitted = clone(transformer)
+        for X, y in chunks:
+            partial_fit_chunk(fitted, X, y, head)
+        return fitted
+
+    fitted_chunks = Parallel(n_jobs=n_jobs)(
+        delayed(partial_fit_chunk)(clone(transformer), X, y, head) for X, y in chunks
+    )
+    if not fitted_chunks:
+        raise ValueError("No chunk to fit on")
+    fitted = fitted_chunks[0]
+    for fitted_chunk in fitted_chunks[1:]:
+        fitted.merge(fitted_chunk)
+    return fitted
+
+
+# Fit the preprocessing steps of a pipeline (all but its final estimator) on data larger than memory
+# make_chunks returns a new iterable of (X, y) chunks on every call, e.g. frames read with pd.read_csv(chunksize=...),
+# as each fitted step takes one pass over the data, through the steps fitted before it
+# The final estimator is left unfitted, to be trained on the transformed chunks or a sample of them
+def fit_preprocessing_in_chunks(pipeline, make_chunks, n_jobs=1):
+    for idx, (name, step) in enumerate(pipeline.steps[:-1]):
+        if step in (None, "passthrough") or isinstance(step, STATELESS_STEPS):
+            continue
+        if not hasattr(step, "partial_fit"):
+            raise ValueError(f"Step {name} ({type(step).__name__}) has no chunked fit")
+        head = pipeline[:idx] if idx else None
+        pipeline.steps[idx] = (name, fit_in_chunks(step, make_chunks(), n_jobs, head))
+    return pipeline
+
+
+# Ensemble of pipelines sharing their common leading preprocessing steps (the trunk)
+# The trunk runs once per request & its output frame is fanned out to the model-specific steps of each branch
+class SharedTrunkEnsemble(BaseEstimator, ClassifierMixin):
+    def __init__(self, pipelines, weights=None, names=None):
+        self.pipelines = pipelines
+        self.weights = weights
+        self.names = names
+
+    def fit(self, X, y=None):
+        # Fitting every pipeline on the data
+        for pipeline in self.pipelines:
+            pipeline.fit(X, y)
+        return self.split_trunk()
+
+    def split_trunk(self):
+        # Number of leading steps identical across all the pipelines
+        n_shared = 0
+        first_pipeline = self.pipelines[0]
+        for idx, (_, step) in enumerate(first_pipeline.steps[:-1]):
+            if not all(is_same_step(step, pipeline.steps[idx][1]) for pipeline in self.pipelines[1:]):
+                break
+            n_shared = idx + 1
+
+        self.trunk_ = first_pipeline[:n_shared] if n_shared else None
+        self.branches_ = [pipeline[n_shared:] for pipeline in self.pipelines]
+        self.classes_ = self.branches_[0].classes_
+        return self
+
+    def predict_proba(self, X):
+        # Check if the trunk has been split
+        if not hasattr(self, "branches_"):
+            raise RuntimeError("You must run fit() or split_trunk() before predict_proba()")
+
+        # Records (list of dicts) are scored as a dataframe
+        if not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(X)
+
+        # Shared preprocessing is applied only once
+        X_trunk = self.trunk_.transform(X) if self.trunk_ is not None else X
+
+        # Aggregating prediction probabilities of the branches with weights
+        # Branches running in copy-free mode get their own copy of the trunk output, except the last one
+        weights = self.weights if self.weights is not None else [1] * len(self.branches_)
+        p_agg = 0
+        for idx, (w, branch) in enumerate(zip(weights, self.branches_)):
+            is_last = idx == len(self.branches_) - 1
+            X_branch = X_trunk.copy() if modifies_input(branch) and not is_last else X_trunk
+            p_agg = p_agg + w * branch.predict_proba(X_branch)
+        return p_agg / sum(weights)
+
+    def predict(self, X):
+        # Default threshold is 0.5
+        probas = self.predict_proba(X)
+        return np.argmax(probas, axis=-1)
+
 
-    return final_pipeline
\ No newline at end of file
+# Build a shared-trunk ensemble from an already fitted EnsembleModel (see Step-4 notebook)
+def build_shared_ensemble(ensemble_model):
+    shared_ensemble = SharedTrunkEnsemble(
+        pipelines=[ensemble_model.lr_pipeline, ensemble_model.xgb_pipeline],
+        weights=ensemble_model.weights,
+        names=["lr_pipeline", "xgb_pipeline"]
+    )
+    return shared_ensemble.split_trunk()
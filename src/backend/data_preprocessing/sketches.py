@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+# Mergeable streaming summaries behind the chunked fit of the custom transformers (see partial_fit)
+# A summary is built per chunk, chunks can be summarized in parallel & their summaries merged in any grouping
+#
+# Error bounds against the exact (in-memory) fit:
+# - QuantileSketch: relative-error buckets (DDSketch). Every order statistic is returned within a relative error of
+#   relative_accuracy (0.1% by default), so a quantile interpolated between the order statistics x_lo & x_hi (as pandas &
+#   numpy do) is within relative_accuracy * max(|x_lo|, |x_hi|) of the exact one. Values closer to 0 than ZERO_THRESHOLD
+#   count as 0. Caps, medians & quartiles inherit the bound, the IQR is within relative_accuracy * (|q25| + |q75|)
+# - CountTable: exact counts & target sums per category, so target encodings, one-hot categories & modes are exact
+
+RELATIVE_ACCURACY = 0.001
+ZERO_THRESHOLD = 1e-9
+
+
+# Quantile sketch with logarithmic buckets: value x > 0 falls in bucket i when gamma^(i-1) < x <= gamma^i
+# Its memory grows with the log of the range of the values, not with their number (~8k buckets for 1 to 1e7 at 0.1%)
+class QuantileSketch:
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.positive = {} # bucket index -> count
+        self.negative = {} # bucket index of |x| -> count
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, values):
+        # Missing values are skipped (as by pandas' quantile & the median imputer)
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        positive = values[values > ZERO_THRESHOLD]
+        negative = -values[values < -ZERO_THRESHOLD]
+        for buckets, part in [(self.positive, positive), (self.negative, negative)]:
+            indices, counts = np.unique(np.ceil(np.log(part) / self.log_gamma).astype(np.int64), return_counts=True)
+            for idx, count in zip(indices.tolist(), counts.tolist()):
+                buckets[idx] = buckets.get(idx, 0) + count
+        self.zero_count += len(values) - len(positive) - len(negative)
+        self.count += len(values)
+        return self
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged")
+        for buckets, other_buckets in [(self.positive, other.positive), (self.negative, other.negative)]:
+            for idx, count in other_buckets.items():
+                buckets[idx] = buckets.get(idx, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    # Representative values of the buckets in increasing order & their counts
+    def get_buckets(self):
+        negative_idx = np.array(sorted(self.negative, reverse=True), dtype=np.int64)
+        positive_idx = np.array(sorted(self.positive), dtype=np.int64)
+        values = np.concatenate([
+            -self.get_values(negative_idx), [0.0], self.get_values(positive_idx)
+        ])
+        counts = np.concatenate([
+            [self.negative[idx] for idx in negative_idx.tolist()], [self.zero_count],
+            [self.positive[idx] for idx in positive_idx.tolist()]
+        ])
+        return values, counts
+
+    # Value of a bucket within relative_accuracy of all the values it holds
+    def get_values(self, indices):
+        return 2 * self.gamma ** indices.astype(float) / (self.gamma + 1)
+
+    # Quantile with linear interpolation between order statistics (the default of pandas & numpy)
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        values, counts = self.get_buckets()
+        ends = np.cumsum(counts)
+        position = q * (self.count - 1)
+        lower = int(np.floor(position))
+        upper = min(lower + 1, self.count - 1)
+        lower_value, upper_value = values[np.searchsorted(ends, [lower, upper], side="right")]
+        return float(lower_value + (position - lower) * (upper_value - lower_value))
+
+
+# Number of rows & sum of the target per category of a feature, in order of first appearance
+class CountTable:
+    def __init__(self):
+        self.counts = {}
+        self.sums = {}
+        self.missing_count = 0
+        self.missing_sum = 0.0
+
+    def add(self, values, y=None):
+        values = pd.Series(np.asarray(values, dtype=object))
+        y = pd.Series(np.zeros(len(values)) if y is None else np.asarray(y, dtype=float))
+        is_missing = values.isna().to_numpy()
+        stats = y[~is_missing].groupby(values[~is_missing].to_numpy(), sort=False).agg(["count", "sum"])
+        for category, count, total in zip(stats.index, stats["count"].tolist(), stats["sum"].tolist()):
+            self.counts[category] = self.counts.get(category, 0) + count
+            self.sums[category] = self.sums.get(category, 0.0) + total
+        self.missing_count += int(is_missing.sum())
+        self.missing_sum += float(y[is_missing].sum())
+        return self
+
+    def merge(self, other):
+        for category, count in other.counts.items():
+            self.counts[category] = self.counts.get(category, 0) + count
+            self.sums[category] = self.sums.get(category, 0.0) + other.sums[category]
+        self.missing_count += other.missing_count
+        self.missing_sum += other.missing_sum
+        return self
+
+    # Categories in order of first appearance, missing values last (as the ordinal encoder of category_encoders)
+    def get_categories(self, include_missing=True):
+        return list(self.counts) + ([np.nan] if include_missing and self.missing_count else [])
+
+    def get_total(self):
+        return sum(self.counts.values()) + self.missing_count, sum(self.sums.values()) + self.missing_sum
+
+    def get_mean(self, category):
+        if pd.isna(category):
+            return self.missing_sum / self.missing_count
+        return self.sums[category] / self.counts[category]
+
+    def get_count(self, category):
+        return self.missing_count if pd.isna(category) else self.counts[category]
+
+    # Most frequent non-missing category, the smallest one on ties (as the most_frequent imputer)
+    def get_mode(self):
+        if not self.counts:
+            return np.nan
+        max_count = max(self.counts.values())
+        return min(category for category, count in self.counts.items() if count == max_count)
@@ -1,4 +1,8 @@
+import copy
+import inspect
+import numpy as np
 import pandas as pd
+from scipy.special import expit
 from sklearn.impute import KNNImputer, SimpleImputer
 from sklearn.base import BaseEstimator, TransformerMixin
 from category_encoders import TargetEncoder, WOEEncoder
@@ -6,47 +10,95 @@ from sklearn.preprocessing import RobustScaler, OneHotEncoder
 
 from sklearn.exceptions import NotFittedError
 from sklearn.utils.validation import check_is_fitted
+from data_preprocessing.parsing import parse_dates, extract_pincodes
+from data_preprocessing.sketches import QuantileSketch, CountTable
+
+
+# Base class for the custom transformers
+class BaseTransformer(BaseEstimator, TransformerMixin):
+    def __setstate__(self, state):
+        # Parameters added after a transformer was pickled take their default values
+        for name, param in inspect.signature(type(self).__init__).parameters.items():
+            if param.default is not param.empty:
+                state.setdefault(name, param.default)
+        super().__setstate__(state)
+
+    def _validate_copy(self, X):
+        # With copy=False the input frame is modified in-place instead of working on a copy
+        return X.copy() if self.copy else X
+
+    # Merge the sketches of the same transformer fitted on other chunks with partial_fit (see sketches.py)
+    # Chunks fitted in parallel are merged into one transformer, as if all of them were passed to partial_fit
+    def merge(self, other):
+        if not hasattr(other, "sketches_"):
+            raise RuntimeError("Only transformers fitted with partial_fit() can be merged")
+        if not hasattr(self, "sketches_"):
+            self.sketches_ = copy.deepcopy(other.sketches_)
+        else:
+            for name, sketch in other.sketches_.items():
+                if name in self.sketches_:
+                    self.sketches_[name].merge(sketch)
+                else: # sketch of a feature seen only in the other chunks
+                    self.sketches_[name] = copy.deepcopy(sketch)
+        return self._fit_sketches()
+
+
+# Integer codes of the values of a series in a fitted categorical dtype (-1 for unknown & missing values)
+def category_codes(series, dtype):
+    return dtype.categories.get_indexer(series.to_numpy())
+
+
+# Categories merged by the DataCleaner to reduce cardinality
+CATEGORY_MERGES = {
+    "home_ownership": {"ANY": "OTHER", "NONE": "OTHER"}, # Merging ANY & NONE into OTHER
+    "verification_status": {"Source Verified": "Verified"}, # Merging Source Verified into Verified
+    "application_type": {"JOINT": "NON_INDIVIDUAL", "DIRECT_PAY": "NON_INDIVIDUAL"},
+}
+
 
 # Custom Data-cleaner transformer
-class DataCleaner(BaseEstimator, TransformerMixin):
-    def __init__(self):
-        pass
+class DataCleaner(BaseTransformer):
+    def __init__(self, copy=True):
+        self.copy = copy
 
     def fit(self, X, y=None):
         return self # nothing to fit, return self
+
+    def __sklearn_is_fitted__(self):
+        return True # stateless, always fitted
     
     def transform(self, X):
         # Ensure X is a dataframe to access columns
         if not isinstance(X, pd.DataFrame):
             raise ValueError("X should be a pandas Dataframe object")
         
-        X = X.copy()
+        X = self._validate_copy(X)
 
         # For object-dtype columns, strip any whitespaces in their values
         for feat in X.columns:
             if X[feat].dtype=="object":
                 X[feat] = X[feat].str.strip()
 
-        # Converting issue_d & earliest_cr_line to datetime type
+        # Converting issue_d & earliest_cr_line to datetime type (each distinct date is parsed once)
         for feat in ["issue_d", "earliest_cr_line"]:    
-            X[feat] = pd.to_datetime(X[feat], format="mixed")
+            X[feat] = parse_dates(X[feat])
 
-        # Extract pincode from address feature
-        X["address"] = X["address"].str.extract(r'.(\d{5})$')
+        # Extract pincode from address feature (each distinct address is parsed once)
+        X["address"] = extract_pincodes(X["address"])
 
         # Merge categories to reduce cardinality
-        X["home_ownership"] = X["home_ownership"].replace(["ANY", "NONE"], "OTHER") # Merging ANY & NONE into OTHER
-        X["verification_status"] = X["verification_status"].replace("Source Verified", "Verified") # Merging Source Verified into Verified
-        X["application_type"] = X["application_type"].replace(["JOINT", "DIRECT_PAY"], "NON_INDIVIDUAL")
+        for feat, merges in CATEGORY_MERGES.items():
+            X[feat] = X[feat].replace(merges)
         
         return X
 
 # Custom Imputer transformer
-class Imputer(BaseEstimator, TransformerMixin):
-    def __init__(self, use_knn_imputation=False, num_features=None, cat_features=None):
+class Imputer(BaseTransformer):
+    def __init__(self, use_knn_imputation=False, num_features=None, cat_features=None, copy=True):
         self.use_knn_imputation = use_knn_imputation
         self.num_features = num_features
         self.cat_features = cat_features
+        self.copy = copy
         
     def fit(self, X, y=None):
         # Ensure X is a dataframe to access columns
@@ -68,6 +120,34 @@ class Imputer(BaseEstimator, TransformerMixin):
 
         return self
 
+    # Chunked fit: medians from quantile sketches (within their relative accuracy), exact modes from count tables
+    def partial_fit(self, X, y=None):
+        # Ensure X is a dataframe to access columns
+        if not isinstance(X, pd.DataFrame):
+            raise ValueError("X should be a pandas Dataframe object")
+        if self.use_knn_imputation:
+            raise ValueError("KNN imputation needs all the data, it has no chunked fit")
+
+        if not hasattr(self, "sketches_"):
+            self.sketches_ = {feat: QuantileSketch() for feat in self.num_features or []}
+            self.sketches_.update({feat: CountTable() for feat in self.cat_features or []})
+        for feat, sketch in self.sketches_.items():
+            sketch.add(X[feat])
+
+        return self._fit_sketches()
+
+    # Imputers fitted on a single row holding the statistics of the sketches
+    def _fit_sketches(self):
+        self.num_imputer_ = SimpleImputer(strategy="median")
+        self.cat_imputer_ = SimpleImputer(strategy="most_frequent")
+        if self.num_features:
+            medians = [self.sketches_[feat].quantile(0.5) for feat in self.num_features]
+            self.num_imputer_.fit(pd.DataFrame([medians], columns=self.num_features))
+        if self.cat_features:
+            modes = [self.sketches_[feat].get_mode() for feat in self.cat_features]
+            self.cat_imputer_.fit(pd.DataFrame([modes], columns=self.cat_features, dtype=object))
+        return self
+
     def transform(self, X):
         # Check if the imputers have been fitted
         try:
@@ -76,7 +156,7 @@ class Imputer(BaseEstimator, TransformerMixin):
         except NotFittedError:
             raise RuntimeError("You must run fit() before transform()")
 
-        X = X.copy()
+        X = self._validate_copy(X)
         # Tranform numerical features
         if self.num_features:
             imputed_nums = self.num_imputer_.transform(X[self.num_features])
@@ -91,9 +171,10 @@ class Imputer(BaseEstimator, TransformerMixin):
     
 
 # Custom Outlier handler transformer
-class OutlierHandler(BaseEstimator, TransformerMixin):
-    def __init__(self, features):
+class OutlierHandler(BaseTransformer):
+    def __init__(self, features, copy=True):
         self.features = features
+        self.copy = copy
 
     def fit(self, X, y=None):
         # Ensure X is a dataframe to access columns
@@ -107,13 +188,30 @@ class OutlierHandler(BaseEstimator, TransformerMixin):
             self.bounds_[col] = upper_bound
             
         return self
+
+    # Chunked fit: caps from quantile sketches, within their relative accuracy of the exact quantiles
+    def partial_fit(self, X, y=None):
+        # Ensure X is a dataframe to access columns
+        if not isinstance(X, pd.DataFrame):
+            raise ValueError("X should be a pandas Dataframe object")
+
+        if not hasattr(self, "sketches_"):
+            self.sketches_ = {col: QuantileSketch() for col in self.features}
+        for col in self.features:
+            self.sketches_[col].add(X[col])
+
+        return self._fit_sketches()
+
+    def _fit_sketches(self):
+        self.bounds_ = {col: self.sketches_[col].quantile(0.98) for col in self.features}
+        return self
     
     def transform(self, X):
         # Check if fitted
         if not self.bounds_:
             raise RuntimeError("You must run fit() before transform()")
         
-        X = X.copy()
+        X = self._validate_copy(X)
         # Capping the outliers on the upper-end
         for col in self.features:
             upper_bound = self.bounds_[col]
@@ -122,19 +220,22 @@ class OutlierHandler(BaseEstimator, TransformerMixin):
 
 
 # Custom Feature-engineering transformer
-class FeatureEngineer(BaseEstimator, TransformerMixin):
-    def __init__(self):
-        pass
+class FeatureEngineer(BaseTransformer):
+    def __init__(self, copy=True):
+        self.copy = copy
 
     def fit(self, X, y=None):
         return self # nothing to fit, return self
+
+    def __sklearn_is_fitted__(self):
+        return True # stateless, always fitted
     
     def transform(self, X):
         # Ensure X is a dataframe to access columns
         if not isinstance(X, pd.DataFrame):
             raise ValueError("X should be a pandas Dataframe object")
         
-        X = X.copy()
+        X = self._validate_copy(X)
 
         # EMI to monthly income ratio
         X["emi_ratio"] = (X["installment"] / (X["annual_inc"]/12)).round(2)
@@ -153,10 +254,12 @@ class FeatureEngineer(BaseEstimator, TransformerMixin):
 
 
 # Custom Categorical Encoder transformer
-class CatEncoder(BaseEstimator, TransformerMixin):
-    def __init__(self, ohe_features=None, supervised_features=None):
+class CatEncoder(BaseTransformer):
+    def __init__(self, ohe_features=None, supervised_features=None, sparse_output=False, copy=True):
         self.ohe_features = ohe_features
         self.supervised_features = supervised_features
+        self.sparse_output = sparse_output
+        self.copy = copy
 
         # Ordinal categories mapping
         self.grade_map = {"A": 0, "B": 1, "C": 2, "D": 3, "E": 4, "F": 5, "G": 6}
@@ -164,6 +267,20 @@ class CatEncoder(BaseEstimator, TransformerMixin):
         self.emp_length_map = {"< 1 year": 0, "1 year": 1, "2 years": 2, "3 years": 3, "4 years": 4, "5 years": 5,  "6 years": 6, "7 years": 7, "8 years": 8, "9 years": 9, "10+ years": 10}
         self.term_map = {"36 months": 0, "60 months": 1}
 
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        # Encoders pickled before the fitted dictionary get it from their (fixed) ordinal maps
+        if "ordinal_dtypes_" not in self.__dict__:
+            self.ordinal_dtypes_ = self._build_ordinal_dtypes()
+
+    # Categorical dtype of each ordinal feature, whose codes are the ordinal values
+    def _build_ordinal_dtypes(self):
+        ordinal_maps = {"term": self.term_map, "grade": self.grade_map, "sub_grade": self.sub_grade_map, "emp_length": self.emp_length_map}
+        return {
+            feat: pd.CategoricalDtype(sorted(ordinal_map, key=ordinal_map.get), ordered=True)
+            for feat, ordinal_map in ordinal_maps.items()
+        }
+
     def fit(self, X, y=None):
         # Ensure X is a dataframe to access columns
         if not isinstance(X, pd.DataFrame):
@@ -173,48 +290,123 @@ class CatEncoder(BaseEstimator, TransformerMixin):
         if self.supervised_features:
             self.sup_encoder_ = TargetEncoder(cols=self.supervised_features)
             self.sup_encoder_.fit(X, y)
+            self.target_encodings_ = None # encodings of a chunked fit (see _fit_sketches)
 
         if self.ohe_features:
             self.ohe_encoder_ = OneHotEncoder(drop="first", handle_unknown="ignore")
             self.ohe_encoder_.fit(X[self.ohe_features])
+
+        # Fixed dictionary of the ordinal features
+        self.ordinal_dtypes_ = self._build_ordinal_dtypes()
         
         return self
 
+    # Chunked fit: exact count tables of the categories (with the target sums of the supervised features)
+    def partial_fit(self, X, y=None):
+        # Ensure X is a dataframe to access columns
+        if not isinstance(X, pd.DataFrame):
+            raise ValueError("X should be a pandas Dataframe object")
+        if self.supervised_features and y is None:
+            raise ValueError("The target encoder needs a target for the fitting")
+
+        if not hasattr(self, "sketches_"):
+            self.columns_ = list(X.columns)
+            self.sketches_ = {feat: CountTable() for feat in (self.supervised_features or []) + (self.ohe_features or [])}
+        for feat in self.supervised_features or []:
+            self.sketches_[feat].add(X[feat], y)
+        for feat in self.ohe_features or []:
+            self.sketches_[feat].add(X[feat])
+
+        return self._fit_sketches()
+
+    def merge(self, other):
+        if not hasattr(self, "columns_"):
+            self.columns_ = other.columns_
+        return super().merge(other)
+
+    # Target encodings computed from the count tables with the smoothing of the target encoder (from its parameters),
+    # kept in the encoder's own state rather than set in the fitted internals of category_encoders
+    # The one-hot encoder is fitted on a frame listing every category (padded with the first one)
+    def _fit_sketches(self):
+        if self.supervised_features:
+            n_total, y_total = self.sketches_[self.supervised_features[0]].get_total()
+            self.target_prior_ = y_total / n_total
+            params = TargetEncoder().get_params()
+            self.target_encodings_ = {}
+            for feat in self.supervised_features:
+                table = self.sketches_[feat]
+                categories = table.get_categories() # missing values have their own encoding once seen, as in a whole fit
+                counts = np.array([table.get_count(category) for category in categories], dtype=float)
+                means = np.array([table.get_mean(category) for category in categories], dtype=float)
+                weights = expit((counts - params["min_samples_leaf"]) / params["smoothing"])
+                self.target_encodings_[feat] = pd.Series(self.target_prior_ * (1 - weights) + means * weights,
+                                                         index=pd.Index(categories, dtype=object))
+
+        categories = {feat: self.sketches_[feat].get_categories() for feat in self.ohe_features or []}
+        n_rows = max([len(feat_categories) for feat_categories in categories.values()] + [1])
+        X = pd.DataFrame(np.nan, index=range(n_rows), columns=self.columns_, dtype=object)
+        for feat, feat_categories in categories.items():
+            X[feat] = feat_categories + feat_categories[:1] * (n_rows - len(feat_categories))
+
+        if self.ohe_features:
+            self.ohe_encoder_ = OneHotEncoder(drop="first", handle_unknown="ignore")
+            self.ohe_encoder_.fit(X[self.ohe_features])
+
+        self.ordinal_dtypes_ = self._build_ordinal_dtypes()
+        return self
+
+    # Target encodings per category of a chunked fit (None for a whole fit, done by the target encoder)
+    def get_target_encodings(self):
+        return getattr(self, "target_encodings_", None)
+
     def transform(self, X):
         # Check if the encoder has fitted
-        if self.supervised_features and not hasattr(self, "sup_encoder_"):
+        if self.supervised_features and not hasattr(self, "sup_encoder_") and self.get_target_encodings() is None:
             raise NotFittedError("Target encoder is not fitted")
         if self.ohe_features and not hasattr(self, "ohe_encoder_"):
             raise NotFittedError("One-hot encoder is not fitted")
         
-        X = X.copy()
+        X = self._validate_copy(X)
 
         # Supervised categorical encoding (WOE or Target)
-        if self.supervised_features:
+        # Encodings of a chunked fit are looked up per category (unknown categories get the prior)
+        target_encodings = self.get_target_encodings()
+        if self.supervised_features and target_encodings is not None:
+            for feat, encodings in target_encodings.items():
+                values = X[feat].to_numpy(dtype=object)
+                codes = encodings.index.get_indexer(values)
+                codes[pd.isna(values)] = encodings.index.get_indexer([np.nan])[0] # missing values as None or NaN
+                X[feat] = np.append(encodings.to_numpy(), self.target_prior_)[codes]
+        elif self.supervised_features:
             X = self.sup_encoder_.transform(X)
 
         # One-hot encoding
         if self.ohe_features:
             ohe_feature_names = self.ohe_encoder_.get_feature_names_out()
-            X_ohe = pd.DataFrame(data=self.ohe_encoder_.transform(X[self.ohe_features]).toarray(), 
-                                 columns=ohe_feature_names,
-                                 index=X.index)
+            X_ohe_sparse = self.ohe_encoder_.transform(X[self.ohe_features])
+            if self.sparse_output:
+                # Keep the one-hot columns sparse instead of densifying them
+                X_ohe = pd.DataFrame.sparse.from_spmatrix(X_ohe_sparse, columns=ohe_feature_names, index=X.index)
+            else:
+                X_ohe = pd.DataFrame(data=X_ohe_sparse.toarray(), 
+                                     columns=ohe_feature_names,
+                                     index=X.index)
             X = X.drop(columns=self.ohe_features, errors="ignore") # drop the original ohe_features
             X = pd.concat([X, X_ohe], axis=1) # concat transformed ohe_features to dataset
         
-        # Ordinal encoding
-        X["term"] = X["term"].map(self.term_map)
-        X["grade"] = X["grade"].map(self.grade_map)
-        X["sub_grade"] = X["sub_grade"].map(self.sub_grade_map)
-        X["emp_length"] = X["emp_length"].map(self.emp_length_map)
+        # Ordinal encoding, as vectorized code lookups (unknown & missing categories become NaN)
+        for feat, dtype in self.ordinal_dtypes_.items():
+            codes = category_codes(X[feat], dtype)
+            X[feat] = codes if (codes >= 0).all() else np.where(codes >= 0, codes, np.nan)
         
         return X
     
 
 # Custom Scaler transformer
-class Scaler(BaseEstimator, TransformerMixin):
-    def __init__(self, features=None):
+class Scaler(BaseTransformer):
+    def __init__(self, features=None, copy=True):
         self.features = features
+        self.copy = copy
 
     def fit(self, X, y=None):
         # Ensure X is a dataframe to access columns
@@ -229,6 +421,28 @@ class Scaler(BaseEstimator, TransformerMixin):
             self.scaler_.fit(X[self.features])
 
         return self
+
+    # Chunked fit: medians & quartiles from quantile sketches, within their relative accuracy of the exact ones
+    def partial_fit(self, X, y=None):
+        # Ensure X is a dataframe to access columns
+        if not isinstance(X, pd.DataFrame):
+            raise ValueError("X should be a pandas Dataframe object")
+
+        if not hasattr(self, "sketches_"):
+            self.sketches_ = {feat: QuantileSketch() for feat in self.features or []}
+        for feat, sketch in self.sketches_.items():
+            sketch.add(X[feat])
+
+        return self._fit_sketches()
+
+    # Scaler fitted on 5 rows [q25, q25, median, q75, q75], whose interpolated quartiles are the sketched ones
+    def _fit_sketches(self):
+        self.scaler_ = RobustScaler()
+        if self.features:
+            quantiles = {q: [self.sketches_[feat].quantile(q) for feat in self.features] for q in [0.25, 0.5, 0.75]}
+            rows = [quantiles[0.25], quantiles[0.25], quantiles[0.5], quantiles[0.75], quantiles[0.75]]
+            self.scaler_.fit(pd.DataFrame(rows, columns=self.features))
+        return self
     
     def transform(self, X):
         # Check if the scaler has fitted
@@ -237,7 +451,7 @@ class Scaler(BaseEstimator, TransformerMixin):
         except NotFittedError:
             raise RuntimeError("You must run fit() before transform()")
         
-        X = X.copy()
+        X = self._validate_copy(X)
 
         # Scale the numerical features
         if self.features:
@@ -248,32 +462,64 @@ class Scaler(BaseEstimator, TransformerMixin):
     
 
 # Custom Feature dropper transformer
-class FeatureDropper(BaseEstimator, TransformerMixin):
-    def __init__(self, features):
+class FeatureDropper(BaseTransformer):
+    def __init__(self, features, copy=True):
         self.features = features
+        self.copy = copy
 
     def fit(self, X, y=None):
         return self # Nothing to fit, return self
+
+    def __sklearn_is_fitted__(self):
+        return True # stateless, always fitted
     
     def transform(self, X):
-        X = X.copy()
+        # Dropping returns a new frame, so the input is never modified
         return X.drop(columns=self.features, errors="ignore")
     
 
 # Custom Dtype converter transformer
-class DtypeConverter(BaseEstimator, TransformerMixin):
-    def __init__(self):
-        pass
+class DtypeConverter(BaseTransformer):
+    def __init__(self, copy=True):
+        self.copy = copy
 
     def fit(self, X, y=None):
-        return self # nothing to fit, return self
+        # Categories of the categorical features seen in training, so every batch (even a single record)
+        # gets the same categorical codes as the training data
+        cat_feat = [feat for feat in X.columns if X[feat].dtype=="object"]
+        self.dtypes_ = {feat: X[feat].astype("category").dtype for feat in cat_feat}
+        return self
+
+    # Chunked fit: exact count tables of the categories of the categorical features (of any chunk)
+    def partial_fit(self, X, y=None):
+        if not hasattr(self, "sketches_"):
+            self.sketches_ = {}
+        for feat in X.columns:
+            if X[feat].dtype == "object":
+                self.sketches_.setdefault(feat, CountTable()).add(X[feat])
+        return self._fit_sketches()
+
+    # Categorical dtypes inferred from the categories alone, so they are sorted as in a whole fit
+    def _fit_sketches(self):
+        self.dtypes_ = {feat: pd.Series(table.get_categories(include_missing=False), dtype=object).astype("category").dtype
+                        for feat, table in self.sketches_.items()}
+        return self
+
+    def __sklearn_is_fitted__(self):
+        return True # usable unfitted (e.g. pickled before fitting was added), categories are then inferred per call
     
     def transform(self, X):
-        X = X.copy()
+        X = self._validate_copy(X)
 
         # Convert dtype of categorical features from 'object' to 'category'
+        # Fitted features are encoded with their training categories (unknown categories become missing)
+        fitted_dtypes = getattr(self, "dtypes_", {})
         cat_feat = [feat for feat in X.columns if X[feat].dtype=="object"]
-        if cat_feat:
-            X[cat_feat] = X[cat_feat].astype("category")
+        for feat in cat_feat:
+            if feat in fitted_dtypes:
+                X[feat] = pd.Categorical.from_codes(category_codes(X[feat], fitted_dtypes[feat]), dtype=fitted_dtypes[feat])
+        inferred_feat = [feat for feat in cat_feat if feat not in fitted_dtypes]
+        if inferred_feat:
+            X[inferred_feat] = X[inferred_feat].astype("category")
         
         return X
\ No newline at end of file
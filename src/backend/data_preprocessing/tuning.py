@@ -0,0 +1,130 @@
+import os
+import json
+import hashlib
+import tempfile
+import itertools
+import numpy as np
+from pathlib import Path
+from data_preprocessing.fold_cache import hash_value
+from data_preprocessing.artifact import file_sha256
+
+# Decision threshold & soft-voting weights tuned on persisted out-of-fold probabilities
+# The base models are cross-validated once per (data, model, CV splitter): threshold, weight & PR-curve sweeps
+# then run on the stored arrays without retraining anything
+
+
+# Store of the out-of-fold probabilities (class=1) of the base models, one .npy file per entry
+# The CV splitter must be deterministic (shuffle with a fixed random_state) for its entries to be reused
+class OOFStore:
+    def __init__(self, location):
+        self.location = Path(location)
+
+    def make_key(self, model, X, y, cv):
+        digest = hashlib.blake2b(digest_size=16)
+        for value in (model, X, y, cv):
+            hash_value(value, digest)
+        return digest.hexdigest()
+
+    def get_probs(self, model, X, y, cv, n_jobs=-1):
+        path = self.location / f"{self.make_key(model, X, y, cv)}.npy"
+        if path.exists():
+            return np.load(path)
+
+        from sklearn.model_selection import cross_val_predict
+        probs = cross_val_predict(model, X, y, cv=cv, method="predict_proba", n_jobs=n_jobs)[:, 1]
+
+        # Written to a temporary file first, so a concurrent reader never loads a partial entry
+        self.location.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.location, suffix=".tmp", delete=False) as f:
+            np.save(f, probs)
+        os.replace(f.name, path)
+        return probs
+
+    def clear(self):
+        for path in self.location.glob("*.npy"):
+            path.unlink(missing_ok=True)
+
+
+# Ratio of arrays, with zero_division where the denominator is 0 (as the zero_division of sklearn's metrics)
+def safe_divide(numerator, denominator, zero_division=0.0):
+    numerator, denominator = np.asarray(numerator, dtype=float), np.asarray(denominator, dtype=float)
+    ratio = np.full(np.broadcast(numerator, denominator).shape, zero_division, dtype=float)
+    return np.divide(numerator, denominator, out=ratio, where=denominator != 0)
+
+
+# Precision, recall & F1 at every distinct threshold (in decreasing order, records >= threshold are positive)
+# Undefined metrics (no positive record, or no record predicted positive) are set to zero_division
+def threshold_curve(y, probs, zero_division=0.0):
+    y, probs = np.asarray(y), np.asarray(probs)
+    if len(probs) == 0:
+        return {name: np.empty(0) for name in ["thresholds", "precision", "recall", "f1"]}
+    order = np.argsort(probs)[::-1] # ties are grouped below, so the sort needs not be stable
+    sorted_probs = probs[order]
+
+    # Last position of every run of equal probabilities
+    ends = np.r_[np.flatnonzero(np.diff(sorted_probs)), len(probs) - 1]
+    true_positives = np.cumsum(y[order])[ends]
+    n_predicted = ends + 1
+    n_positives = true_positives[-1]
+    return {
+        "thresholds": sorted_probs[ends],
+        "precision": safe_divide(true_positives, n_predicted, zero_division),
+        "recall": safe_divide(true_positives, n_positives, zero_division),
+        "f1": safe_divide(2 * true_positives, n_predicted + n_positives, zero_division),
+    }
+
+
+# Area under the PR curve as a step function (same definition as sklearn's average_precision_score)
+def average_precision(curve):
+    return float(np.sum(np.diff(curve["recall"], prepend=0) * curve["precision"]))
+
+
+# Threshold with the best F1 & its metrics
+def best_threshold(y, probs, zero_division=0.0):
+    curve = threshold_curve(y, probs, zero_division)
+    if not len(curve["thresholds"]):
+        raise ValueError("No probabilities to tune the threshold on")
+    idx = int(np.argmax(curve["f1"]))
+    return {
+        "threshold": float(curve["thresholds"][idx]),
+        "f1": float(curve["f1"][idx]),
+        "precision": float(curve["precision"][idx]),
+        "recall": float(curve["recall"][idx]),
+        "average_precision": average_precision(curve),
+    }
+
+
+# Weights of the base models on a grid of the simplex (e.g. (0, 1), (0.05, 0.95), ... for 2 models)
+def weight_grid(n_models, steps=21):
+    grid = []
+    for weights in itertools.product(range(steps), repeat=n_models - 1):
+        if sum(weights) < steps:
+            grid.append([w / (steps - 1) for w in weights] + [1 - sum(weights) / (steps - 1)])
+    return grid
+
+
+# Best threshold & metrics of the soft-voting ensemble for every weighting of the base models' probabilities
+def sweep_weights(y, probs_by_model, weights=None, zero_division=0.0):
+    probs_matrix = np.vstack(probs_by_model)
+    weights = np.asarray(weights if weights is not None else weight_grid(len(probs_by_model)), dtype=float)
+    blended = (weights @ probs_matrix) / weights.sum(axis=1, keepdims=True)
+
+    results = []
+    for row_weights, probs in zip(weights, blended):
+        results.append({"weights": row_weights.tolist(), **best_threshold(y, probs, zero_division)})
+    return results
+
+
+# Metadata of a fitted model read by the API (decision threshold & how it was tuned), next to the model file
+def save_model_metadata(path, model_path, threshold, metrics=None, weights=None, source=None):
+    metadata = {
+        "model_version": file_sha256(model_path)[:12],
+        "threshold": float(threshold),
+        "threshold_metric": "f1",
+        "metrics": metrics or {},
+        "weights": weights,
+        "source": source,
+    }
+    with open(path, "w") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
@@ -0,0 +1,90 @@
+import os
+import copy
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+# Native inference of the XGBoost branch of the ensemble
+# The booster predicts in-place on a contiguous float32 array (the precision XGBoost predicts with), without the
+# per-call feature validation of XGBClassifier, with as many threads as the batch size is worth:
+# small requests run single-threaded instead of spinning up every core (the classifier was fitted with n_jobs=-1)
+
+
+# Adapter of a fitted XGBClassifier (binary, non-categorical) predicting with its booster
+class NativeXGBClassifier(BaseEstimator, ClassifierMixin):
+    def __init__(self, estimator, parallel_min_rows=2048, max_threads=None):
+        self.estimator = estimator
+        self.parallel_min_rows = parallel_min_rows
+        self.max_threads = max_threads
+
+    def fit(self, X, y=None):
+        self.estimator.fit(X, y)
+        return self.prepare()
+
+    def prepare(self):
+        if self.estimator.enable_categorical or self.estimator.objective != "binary:logistic":
+            raise ValueError("Only binary non-categorical XGBoost classifiers have a native inference path")
+        self.classes_ = self.estimator.classes_
+        self.feature_names_in_ = self.estimator.feature_names_in_
+
+        # One booster per thread count (a booster's thread count is a parameter, not a per-call argument)
+        booster = self.estimator.get_booster()
+        self.boosters_ = {}
+        for n_threads in {1, self.get_max_threads()}:
+            self.boosters_[n_threads] = booster.copy()
+            self.boosters_[n_threads].set_param({"nthread": n_threads})
+
+        # Trees of the best iteration when fitted with early stopping (as XGBClassifier.predict_proba)
+        best_iteration = getattr(self.estimator, "best_iteration", None)
+        self.iteration_range_ = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        return self
+
+    def get_max_threads(self):
+        return self.max_threads or os.cpu_count() or 1
+
+    # Single thread below parallel_min_rows, all the allowed threads above
+    def get_n_threads(self, n_rows):
+        return 1 if n_rows < self.parallel_min_rows else self.get_max_threads()
+
+    def predict_proba(self, X):
+        if not hasattr(self, "boosters_"):
+            raise RuntimeError("You must run fit() or prepare() before predict_proba()")
+
+        # Columns in the booster's feature order (frames may list them in another order)
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_names_in_].to_numpy(dtype=np.float32)
+        data = np.ascontiguousarray(X, dtype=np.float32)
+
+        booster = self.boosters_[self.get_n_threads(len(data))]
+        probs = booster.inplace_predict(
+            data, iteration_range=self.iteration_range_, predict_type="value",
+            missing=self.estimator.missing, validate_features=False
+        )
+        return np.column_stack([1 - probs, probs])
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=-1)]
+
+    # Booster of the wrapped classifier, so the adapter is compiled & explained like the classifier itself
+    def get_booster(self):
+        return self.estimator.get_booster()
+
+
+# Replace the XGBoost final estimators of a shared-trunk ensemble by native adapters
+# The adapters go into copies of the pipelines (sharing their fitted steps), so the fitted model they come from keeps its
+# own estimators (it is still compiled & explained), & the trunk is split again from the copies, so the stage profiling
+# (which wraps the pipeline steps) sees the adapters
+def use_native_xgboost(model, parallel_min_rows=2048, max_threads=None):
+    pipelines = []
+    for pipeline in model.pipelines:
+        name, estimator = pipeline.steps[-1]
+        if hasattr(estimator, "get_booster"):
+            try:
+                adapter = NativeXGBClassifier(estimator, parallel_min_rows, max_threads).prepare()
+                pipeline = copy.copy(pipeline)
+                pipeline.steps = pipeline.steps[:-1] + [(name, adapter)]
+            except ValueError as e:
+                print(f"Native XGBoost inference disabled for {name}: {e}")
+        pipelines.append(pipeline)
+    model.pipelines = pipelines
+    return model.split_trunk()
@@ -0,0 +1,134 @@
+import time
+import tracemalloc
+import numpy as np
+from metrics import histogram, power_of_2_buckets, BYTES_BUCKETS
+
+# Per-stage profiling of the inference models
+# Models are wrapped in an instrumented serving model only when profiling is enabled, so a disabled profiler costs nothing
+
+STAGE_SECONDS = histogram("loantap_stage_duration_seconds", "Wall time of an inference stage", ["model", "stage"])
+STAGE_ROWS_IN = histogram("loantap_stage_rows_in", "Rows entering an inference stage", ["model", "stage"], power_of_2_buckets(2 ** 20))
+STAGE_ROWS_OUT = histogram("loantap_stage_rows_out", "Rows leaving an inference stage", ["model", "stage"], power_of_2_buckets(2 ** 20))
+STAGE_OUTPUT_BYTES = histogram("loantap_stage_output_bytes", "Size of the output of an inference stage", ["model", "stage"], BYTES_BUCKETS)
+STAGE_ALLOCATED_BYTES = histogram(
+    "loantap_stage_allocated_bytes", "Peak memory allocated by an inference stage (with allocation tracing only)", ["model", "stage"], BYTES_BUCKETS
+)
+MODEL_SECONDS = histogram("loantap_model_predict_seconds", "Wall time of a predict_proba call", ["model"])
+
+
+# Number of rows of a stage input/output (records, dataframes, arrays or tuples of arrays)
+def count_rows(X):
+    if isinstance(X, dict):
+        value = next(iter(X.values()), None)
+        return len(value) if isinstance(value, (list, tuple)) or hasattr(value, "shape") else 1
+    if isinstance(X, tuple):
+        return count_rows(X[0])
+    return len(X) if hasattr(X, "__len__") else 0
+
+
+# Shallow size in bytes of a stage output
+def output_bytes(X):
+    if isinstance(X, tuple):
+        return sum(output_bytes(x) for x in X)
+    if hasattr(X, "memory_usage"):
+        return int(X.memory_usage(index=False, deep=False).sum())
+    return getattr(X, "nbytes", 0)
+
+
+# Run a stage & record its metrics
+def observe_stage(model, stage, call, X, trace_allocations=False):
+    # Peak allocations are process-wide, so they are only exact without concurrent requests
+    if trace_allocations:
+        tracemalloc.reset_peak()
+        allocated_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    output = call()
+    STAGE_SECONDS.labels(model, stage).observe(time.perf_counter() - start)
+    if trace_allocations:
+        STAGE_ALLOCATED_BYTES.labels(model, stage).observe(max(tracemalloc.get_traced_memory()[1] - allocated_before, 0))
+    STAGE_ROWS_IN.labels(model, stage).observe(count_rows(X))
+    STAGE_ROWS_OUT.labels(model, stage).observe(count_rows(output))
+    STAGE_OUTPUT_BYTES.labels(model, stage).observe(output_bytes(output))
+    return output
+
+
+# Serving model recording the wall time of its predict_proba calls & the metrics of their stages
+# The fitted model is wrapped, never modified: it stays picklable (worker pools started after the API, see
+# worker_pool.py, are sent a pickle of it) & usable without the metrics by whatever else shares it
+class InstrumentedModel:
+    def __init__(self, model, name="ensemble", trace_allocations=False):
+        self.model = model
+        self.name = name
+        self.trace_allocations = trace_allocations
+        self._model_seconds = MODEL_SECONDS.labels(name)
+
+    # Other attributes (classes_, ...) are the wrapped model's
+    def __getattr__(self, name):
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def observe(self, model, stage, call, X):
+        return observe_stage(model, stage, call, X, self.trace_allocations)
+
+    def predict_proba(self, X):
+        start = time.perf_counter()
+        output = self._predict_proba(X)
+        self._model_seconds.observe(time.perf_counter() - start)
+        return output
+
+    def _predict_proba(self, X):
+        return self.model.predict_proba(X)
+
+    def predict(self, X):
+        # Default threshold is 0.5
+        return np.argmax(self.predict_proba(X), axis=-1)
+
+
+# Stages of a compiled scorer (decoding once, then the features & estimator of every branch, labelled by branch),
+# run as in CompiledScorer.predict_proba
+class InstrumentedScorer(InstrumentedModel):
+    def _predict_proba(self, X):
+        scorer = self.model
+        num, codes, age_days = self.observe(self.name, "decode", lambda: scorer.decode(X), X)
+        p_agg = 0
+        for branch, weight in zip(scorer.meta["branches"], scorer.meta["weights"]):
+            X_branch = self.observe(branch, "features", lambda: scorer.branch_features(branch, num, codes, age_days), num)
+            p_agg = p_agg + weight * self.observe(branch, "estimator", lambda: scorer.estimator_proba(branch, X_branch), X_branch)
+        return p_agg / sum(scorer.meta["weights"])
+
+
+# Transform of every step & predict_proba of the final estimator of the pipelines of a shared-trunk ensemble, run as
+# in SharedTrunkEnsemble.predict_proba (the steps of the shared trunk under the name of the first pipeline)
+class InstrumentedEnsemble(InstrumentedModel):
+    def _transform(self, steps, name, X):
+        for step_name, step in steps:
+            if hasattr(step, "transform"): # skips passthrough steps & samplers (not applied when predicting)
+                X = self.observe(name, step_name, lambda: step.transform(X), X)
+        return X
+
+    def _predict_proba(self, X):
+        import pandas as pd
+        from data_preprocessing.preprocessor import modifies_input
+        ensemble = self.model
+        if not hasattr(ensemble, "branches_"):
+            raise RuntimeError("You must run fit() or split_trunk() before predict_proba()")
+        if not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(X)
+
+        names = ensemble.names or [f"branch_{idx}" for idx in range(len(ensemble.branches_))]
+        X_trunk = self._transform(ensemble.trunk_.steps, names[0], X) if ensemble.trunk_ is not None else X
+        weights = ensemble.weights if ensemble.weights is not None else [1] * len(ensemble.branches_)
+        p_agg = 0
+        for idx, (w, name, branch) in enumerate(zip(weights, names, ensemble.branches_)):
+            is_last = idx == len(ensemble.branches_) - 1
+            X_branch = X_trunk.copy() if modifies_input(branch) and not is_last else X_trunk
+            X_branch = self._transform(branch.steps[:-1], name, X_branch)
+            step_name, estimator = branch.steps[-1]
+            p_agg = p_agg + w * self.observe(name, step_name, lambda: estimator.predict_proba(X_branch), X_branch)
+        return p_agg / sum(weights)
+
+
+# Model wrapped by an instrumented serving model (the model itself otherwise)
+def unwrap_model(model):
+    return model.model if isinstance(model, InstrumentedModel) else model
@@ -1,20 +1,113 @@
-import pickle
-from fastapi import FastAPI
-from routers import predict
+import time
+import asyncio
+import threading
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from routers import predict, monitoring, admin
+from batching import MicroBatcher
+from model_manager import ModelManager, load_startup_model
+from prediction_cache import PredictionCache
+from shadow import ShadowScorer, ShadowLog, load_shadow_models
+from metrics import counter, histogram, register_histogram, register_callback
+from data_preprocessing.parsing import get_parsing_stats
+from model_loader import read_serving_records, warm_up
+from config import MICRO_BATCHING, BATCH_MAX_WAIT_MS, BATCH_MAX_SIZE, SERVING_WORKERS, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_S
+from config import SHADOW_MODELS, SHADOW_LOG_PATH
 from contextlib import asynccontextmanager
 
+
+# Request metrics of the API
+REQUESTS = counter("loantap_http_requests_total", "Number of HTTP requests", ["method", "path", "status"])
+REQUEST_SECONDS = histogram("loantap_http_request_duration_seconds", "Latency of the HTTP requests", ["method", "path"])
+
+
+# Metrics read from the serving components when /metrics is scraped
+def register_app_metrics(app):
+    register_callback("loantap_model_ready", "1 once the model is loaded & warm", "gauge", [], lambda: {(): int(app.state.ready)})
+    register_callback(
+        "loantap_model_info", "Version & source of the served model", "gauge", ["version", "source"],
+        lambda: {(app.state.model_version, app.state.model_source): 1}
+    )
+    register_callback(
+        "loantap_parsing_cache_lookups_total", "Lookups of the date & pincode parsing caches", "counter", ["parser", "result"],
+        lambda: {(parser, result): stats[result] for parser, stats in get_parsing_stats().items() for result in ("hits", "misses")}
+    )
+    if app.state.cache is not None:
+        register_callback(
+            "loantap_prediction_cache_lookups_total", "Lookups of the prediction cache", "counter", ["result"],
+            lambda: {(result,): app.state.cache.stats()[result] for result in ("hits", "misses")}
+        )
+        register_callback("loantap_prediction_cache_size", "Entries in the prediction cache", "gauge", [], lambda: {(): app.state.cache.stats()["size"]})
+    if app.state.batcher is not None:
+        register_histogram("loantap_batch_size", "Records per micro-batch of /predict requests", app.state.batcher.batch_sizes)
+    if app.state.shadow is not None:
+        register_callback(
+            "loantap_shadow_records_total", "Records handed to the shadow models", "counter", ["result"],
+            lambda: {(result,): count for result, count in app.state.shadow.counts.items()}
+        )
+        register_callback("loantap_shadow_pending_records", "Records waiting for the shadow models", "gauge", [], lambda: {(): app.state.shadow.pending})
+
+
+# Warm up the scoring model(s) in the background & flag the app as ready
+async def warm_up_app(app):
+    try:
+        records = read_serving_records()
+        await run_in_threadpool(warm_up, app.state.model, records)
+        if app.state.pool is not None:
+            await asyncio.gather(*[app.state.pool.predict_proba_async(records) for _ in range(app.state.pool.n_workers)])
+        app.state.ready = True
+        print("ML model warm, ready to serve")
+    except Exception as e:
+        print(f"ML model warm-up failed: {e}")
+
+
 # Lifespan event
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Initialize the ML model
+    # Initialize the ML model (compiled artifact if up to date, else the pickled ensemble)
+    # The model manager then swaps in new models without restarting (see the admin endpoints)
     print("Loading ML model")
-    with open("models/ensemble_model.pkl", "rb") as f:
-        app.state.model = pickle.load(f)
-    print("ML model loaded!")
+    app.state.ready = False
+    app.state.model_manager = ModelManager(app, SERVING_WORKERS)
+    serving_model = load_startup_model(SERVING_WORKERS)
+    if serving_model.pool is not None:
+        print(f"Started {SERVING_WORKERS} scoring workers")
+    app.state.model_manager.activate(serving_model)
+    print(f"ML model loaded! (version {app.state.model_version} from {app.state.model_source}, threshold {app.state.threshold})")
+
+    # Cache of recent predictions (its keys include the model version, it starts empty with every model load)
+    app.state.cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_S) if PREDICTION_CACHE_SIZE > 0 else None
+    warmup_task = asyncio.create_task(warm_up_app(app))
+
+    # Micro-batcher of the /predict requests (scores every record with the serving model of its request)
+    app.state.batcher = None
+    if MICRO_BATCHING:
+        app.state.batcher = MicroBatcher(
+            score=lambda serving, records: predict.score_probabilities(serving.pool or serving.model, records),
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_concurrent_batches=max(SERVING_WORKERS, 1)
+        )
+        app.state.batcher.start()
+
+    # Shadow scoring of challenger models off the hot path (loaded in the background, see shadow.py)
+    app.state.shadow = None
+    if SHADOW_MODELS:
+        app.state.shadow = ShadowScorer(ShadowLog(SHADOW_LOG_PATH))
+        app.state.shadow.start()
+        threading.Thread(target=load_shadow_models, args=(app.state.shadow, SHADOW_MODELS), daemon=True).start()
+    register_app_metrics(app)
 
     yield
 
     # Cleanup
+    await warmup_task
+    app.state.ready = False
+    if app.state.batcher is not None:
+        await app.state.batcher.stop()
+    if app.state.shadow is not None:
+        await run_in_threadpool(app.state.shadow.stop)
+    app.state.model_manager.shutdown()
     app.state.model = None
     print("API shutdown complete")
 
@@ -27,5 +120,18 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Count & time the requests by route
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched" # route templates keep the label cardinality bounded
+    REQUEST_SECONDS.labels(request.method, path).observe(time.perf_counter() - start)
+    REQUESTS.labels(request.method, path, str(response.status_code)).inc()
+    return response
+
 # Include the routers
-app.include_router(predict.router)
\ No newline at end of file
+app.include_router(predict.router)
+app.include_router(monitoring.router)
+app.include_router(admin.router)
\ No newline at end of file
@@ -0,0 +1,152 @@
+import threading
+
+# In-process metrics of the API, exposed in the Prometheus text format
+
+# Bucket upper bounds for durations (seconds), row counts & sizes (bytes)
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+BYTES_BUCKETS = [4 ** power for power in range(5, 16)] # 1KB to 1GB
+
+
+# Histogram with fixed upper bounds (cumulative counts, Prometheus style)
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for idx, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    self._counts[idx] += 1
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {str(upper_bound): count for upper_bound, count in zip(self.buckets, self._counts)}
+            buckets["+Inf"] = self._count
+            return {"buckets": buckets, "sum": self._sum, "count": self._count}
+
+
+# Monotonic counter
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+# Powers of 2 up to (and including) a maximum value
+def power_of_2_buckets(max_value):
+    buckets = [1]
+    while buckets[-1] < max_value:
+        buckets.append(buckets[-1] * 2)
+    return buckets
+
+
+# Metric with one child (Histogram or Counter) per combination of label values
+class MetricFamily:
+    def __init__(self, name, help_text, metric_type, label_names, make_child):
+        self.name = name
+        self.help_text = help_text
+        self.metric_type = metric_type
+        self.label_names = label_names
+        self._make_child = make_child
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *label_values):
+        child = self._children.get(label_values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(label_values, self._make_child())
+        return child
+
+    def render(self):
+        lines = [format_help(self.name, self.help_text), f"# TYPE {self.name} {self.metric_type}"]
+        for label_values, child in list(self._children.items()):
+            if self.metric_type == "counter":
+                lines.append(format_sample(self.name, self.label_names, label_values, child.value))
+                continue
+            snapshot = child.snapshot()
+            for upper_bound, count in snapshot["buckets"].items():
+                lines.append(format_sample(f"{self.name}_bucket", self.label_names + ["le"], label_values + (upper_bound,), count))
+            lines.append(format_sample(f"{self.name}_sum", self.label_names, label_values, snapshot["sum"]))
+            lines.append(format_sample(f"{self.name}_count", self.label_names, label_values, snapshot["count"]))
+        return lines
+
+
+# Metric whose samples are read from a callback when rendering ({label values: value})
+class CallbackMetric:
+    def __init__(self, name, help_text, metric_type, label_names, collect):
+        self.name = name
+        self.help_text = help_text
+        self.metric_type = metric_type
+        self.label_names = label_names
+        self.collect = collect
+
+    def render(self):
+        lines = [format_help(self.name, self.help_text), f"# TYPE {self.name} {self.metric_type}"]
+        for label_values, value in self.collect().items():
+            if value is not None:
+                lines.append(format_sample(self.name, self.label_names, label_values, value))
+        return lines
+
+
+# Label value escaped as the text format requires (backslashes, double quotes & line feeds)
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# HELP text escaped as the text format requires (backslashes & line feeds)
+def format_help(name, help_text):
+    return f"# HELP {name} " + help_text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+# Sample line of the text format, e.g. name{label="value"} 1.0
+def format_sample(name, label_names, label_values, value):
+    if not label_names:
+        return f"{name} {value}"
+    labels = ",".join(f'{label}="{escape_label_value(label_value)}"' for label, label_value in zip(label_names, label_values))
+    return f"{name}{{{labels}}} {value}"
+
+
+# Registry of the metrics rendered by the /metrics route
+_registry = {}
+
+
+def register(metric):
+    return _registry.setdefault(metric.name, metric)
+
+
+# Callback metrics are replaced on re-registration (their callbacks read the state of the current app)
+def register_callback(name, help_text, metric_type, label_names, collect):
+    _registry[name] = CallbackMetric(name, help_text, metric_type, list(label_names), collect)
+
+
+# Expose an existing unlabelled histogram (replaced on re-registration)
+def register_histogram(name, help_text, existing_histogram):
+    family = MetricFamily(name, help_text, "histogram", [], None)
+    family._children[()] = existing_histogram
+    _registry[name] = family
+
+
+def histogram(name, help_text, label_names, buckets=LATENCY_BUCKETS):
+    return register(MetricFamily(name, help_text, "histogram", list(label_names), lambda: Histogram(buckets)))
+
+
+def counter(name, help_text, label_names):
+    return register(MetricFamily(name, help_text, "counter", list(label_names), Counter))
+
+
+def render_metrics():
+    lines = []
+    for metric in list(_registry.values()):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,129 @@
+import os
+import json
+import pickle
+import warnings
+from config import (
+    MODEL_PATH, MODEL_ARTIFACT_DIR, SERVING_EXAMPLES_PATH, MODEL_METADATA_PATH, PREDICTION_THRESHOLD, USE_MODEL_ARTIFACT,
+    COPY_FREE_TRANSFORMS, SPARSE_ONEHOT, FAST_PATH_SCORER, PROFILE_STAGES, PROFILE_ALLOCATIONS,
+    XGB_NATIVE_PREDICT, XGB_PARALLEL_MIN_ROWS, XGB_MAX_THREADS, SERVING_WORKERS
+)
+from data_preprocessing.fast_scorer import CompiledScorer
+from data_preprocessing.artifact import load_artifact, is_artifact_current, file_sha256
+from instrumentation import InstrumentedScorer, InstrumentedEnsemble, InstrumentedModel
+
+# Loading of the serving model
+# The compiled artifact only needs NumPy, so sklearn, imblearn, xgboost & category_encoders
+# are imported only when falling back to the pickled ensemble
+
+
+# Serving examples as a list of record dicts (read without pandas)
+def read_serving_records(path=SERVING_EXAMPLES_PATH):
+    with open(path) as f:
+        serving_input = json.load(f)["dataframe_split"]
+    return [dict(zip(serving_input["columns"], row)) for row in serving_input["data"]]
+
+
+# Fitted pipelines of a model (the two pipelines of an EnsembleModel, or a single raw-input pipeline)
+def get_pipelines(fitted_model):
+    if hasattr(fitted_model, "lr_pipeline"):
+        return [fitted_model.lr_pipeline, fitted_model.xgb_pipeline]
+    return [fitted_model]
+
+
+# Set up the pipelines of a fitted model for serving
+def set_serving_mode(fitted_model):
+    # Request frames are never reused, so the transformers can skip their copies
+    if COPY_FREE_TRANSFORMS:
+        from data_preprocessing.preprocessor import set_copy_mode
+        for pipeline in get_pipelines(fitted_model):
+            set_copy_mode(pipeline, copy=False, sparse_ohe=SPARSE_ONEHOT)
+    if SPARSE_ONEHOT:
+        # The sparse one-hot columns are densified by the final estimator itself
+        warnings.filterwarnings(action="ignore", message="pandas.DataFrame with sparse columns found")
+    return fitted_model
+
+
+# Fitted ensemble from its pickle, set up for serving
+def load_ensemble(path=MODEL_PATH):
+    with open(path, "rb") as f:
+        ensemble_model = pickle.load(f)
+    return set_serving_mode(ensemble_model)
+
+
+# Scoring model of the fitted ensemble (or single pipeline), checked on the serving examples of examples_path
+def prepare_model(ensemble_model, examples_path=SERVING_EXAMPLES_PATH):
+    from model_registry import read_serving_examples
+    from data_preprocessing.preprocessor import build_shared_ensemble, SharedTrunkEnsemble
+    from data_preprocessing.compiler import compile_model, check_parity
+
+    # Shared preprocessing steps of the ensemble pipelines run once per request
+    if hasattr(ensemble_model, "lr_pipeline"):
+        model = build_shared_ensemble(ensemble_model)
+    else:
+        model = SharedTrunkEnsemble(pipelines=[ensemble_model], names=["pipeline"]).split_trunk()
+
+    # Pandas-free scorer, used only if it matches the pipelines on the serving examples
+    if FAST_PATH_SCORER:
+        try:
+            scorer = compile_model(ensemble_model)
+            is_same, max_diff = check_parity(model, scorer, read_serving_examples(examples_path))
+        except Exception as e:
+            is_same, max_diff = False, str(e)
+        if is_same:
+            return scorer
+        print(f"Compiled scorer disabled (parity check failed: {max_diff})")
+
+    # Native booster inference of the XGBoost branch, the CPUs being split between the scoring processes
+    if XGB_NATIVE_PREDICT:
+        from data_preprocessing.xgb_native import use_native_xgboost
+        max_threads = XGB_MAX_THREADS or max((os.cpu_count() or 1) // max(SERVING_WORKERS, 1), 1)
+        use_native_xgboost(model, XGB_PARALLEL_MIN_ROWS, max_threads)
+    return model
+
+
+# Fitted model to serve, the function turning it into the scoring model (None if already one) & its source
+def load_fitted_model(path=MODEL_PATH):
+    # The artifact was parity-checked when exported from this exact pickle (see build_artifact.py)
+    if FAST_PATH_SCORER and USE_MODEL_ARTIFACT and is_artifact_current(MODEL_ARTIFACT_DIR, path):
+        return load_artifact(MODEL_ARTIFACT_DIR), None, "artifact"
+    return load_ensemble(path), prepare_model, "pickle"
+
+
+# Scoring model (compiled scorer or shared-trunk ensemble) recording its stage & model metrics, when profiling
+def instrument_serving_model(model):
+    if not PROFILE_STAGES:
+        return model
+    if PROFILE_ALLOCATIONS:
+        import tracemalloc
+        tracemalloc.start()
+
+    if isinstance(model, CompiledScorer):
+        return InstrumentedScorer(model, "ensemble", PROFILE_ALLOCATIONS)
+    if hasattr(model, "branches_"):
+        return InstrumentedEnsemble(model, "ensemble", PROFILE_ALLOCATIONS)
+    return InstrumentedModel(model, "ensemble", PROFILE_ALLOCATIONS)
+
+
+# Version of the fitted model (short hash of its pickle, shared with its compiled artifact)
+def get_model_version(path=MODEL_PATH):
+    return file_sha256(path)[:12]
+
+
+# Decision threshold of a model version, from its metadata
+def load_prediction_threshold(model_version, path=MODEL_METADATA_PATH):
+    try:
+        with open(path) as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        print(f"No model metadata at {path}, using the default threshold {PREDICTION_THRESHOLD}")
+        return PREDICTION_THRESHOLD
+    if metadata.get("model_version") != model_version:
+        print(f"Model metadata is for version {metadata.get('model_version')}, using the default threshold {PREDICTION_THRESHOLD}")
+        return PREDICTION_THRESHOLD
+    return metadata["threshold"]
+
+
+# Score the serving examples once, so the first request doesn't pay for lazy initializations
+def warm_up(model, records=None):
+    records = records if records is not None else read_serving_records()
+    return model.predict_proba(records)
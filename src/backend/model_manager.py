@@ -0,0 +1,298 @@
+import time
+import asyncio
+import threading
+import functools
+import numpy as np
+from pathlib import Path
+from datetime import datetime, timezone
+from worker_pool import ModelWorkerPool
+from metrics import counter
+from config import (
+    MODEL_PATH, MODEL_ARTIFACT_DIR, SERVING_EXAMPLES_PATH, FAST_PATH_SCORER, USE_MODEL_ARTIFACT, SERVING_WORKERS,
+    MODEL_PARITY_ATOL, MODEL_SWAP_GRACE_S, EXPLAIN_EXACT_CONTRIBS, LATE_WORKER_START_METHOD
+)
+from data_preprocessing.artifact import load_artifact, is_artifact_current
+from data_preprocessing.explainer import build_explainer
+from model_loader import (
+    load_fitted_model, set_serving_mode, prepare_model, get_model_version, load_prediction_threshold,
+    instrument_serving_model, read_serving_records, warm_up
+)
+
+# Zero-downtime swaps of the serving model
+# A new model (a pickle, or a model logged in the local MLflow tracking store) is loaded, prepared, warmed up & checked
+# in a background thread while the current one keeps serving. The app state is then replaced in one step on the event
+# loop, so every request is scored & labelled by one model or the other. The replaced model is kept for rollbacks.
+
+MODEL_SWAPS = counter("loantap_model_swaps_total", "Loads & rollbacks of the serving model", ["kind", "result"])
+
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+# Run a call & record its wall time (in seconds) under a name
+def timed(timings, name, call):
+    start = time.perf_counter()
+    result = call()
+    timings[name] = round(time.perf_counter() - start, 4)
+    return result
+
+
+# A scoring model & what the API serves with it
+class ServingModel:
+    def __init__(self, model, version, source, origin, threshold, fitted_model=None, prepare=None, pool=None,
+                 timings=None, parity=None):
+        self.model = model
+        self.version = version
+        self.source = source # artifact, pickle or mlflow
+        self.origin = origin # path of the pickle or id of the logged model
+        self.threshold = threshold
+        self.fitted_model = fitted_model
+        self.prepare = prepare
+        self.pool = pool
+        self.timings = timings or {}
+        self.parity = parity
+        self.loaded_at = utc_now()
+        self.retiring = False
+        self._explainer = None
+        self._explainer_lock = threading.Lock()
+
+    # Reason-code explainer of the fitted model, built on the first explained request
+    def get_explainer(self):
+        with self._explainer_lock:
+            if self._explainer is None:
+                self._explainer = build_explainer(self.fitted_model, MODEL_ARTIFACT_DIR, EXPLAIN_EXACT_CONTRIBS)
+            return self._explainer
+
+    def describe(self):
+        return {
+            "model_version": self.version,
+            "source": self.source,
+            "origin": self.origin,
+            "threshold": self.threshold,
+            "loaded_at": self.loaded_at,
+            "timings": self.timings,
+            "parity": self.parity,
+            "workers": self.pool.n_workers if self.pool is not None else 0,
+        }
+
+
+# Model served at startup (compiled artifact if up to date, else the pickled ensemble), warmed up by the app
+def load_startup_model(n_workers=SERVING_WORKERS):
+    timings = {}
+    fitted_model, prepare, source = timed(timings, "load_s", load_fitted_model)
+    version = get_model_version()
+
+    # Scoring worker processes, forked before the model is first used
+    pool = timed(timings, "pool_s", lambda: ModelWorkerPool(fitted_model, prepare, n_workers)) if n_workers > 0 else None
+    model = timed(timings, "prepare_s", lambda: prepare(fitted_model) if prepare is not None else fitted_model)
+    return ServingModel(instrument_serving_model(model), version, source, MODEL_PATH, load_prediction_threshold(version),
+                        fitted_model, prepare, pool, timings)
+
+
+# Files of a model to load: a pickle on the server, or a model logged with MLflow (by id, or the latest of a name)
+def resolve_model_files(path=None, model_id=None, model_name=None, experiment_id=None):
+    if path is not None:
+        path = Path(path)
+        return {"model_path": path, "examples_path": Path(SERVING_EXAMPLES_PATH),
+                "metadata_path": path.parent / "model_metadata.json", "source": "pickle", "origin": str(path)}
+
+    from model_registry import EXPERIMENT_ID, get_model_dir, find_logged_model
+    experiment_id = experiment_id or EXPERIMENT_ID
+    model_id = model_id or find_logged_model(model_name, experiment_id)
+    model_dir = get_model_dir(model_id, experiment_id)
+    return {"model_path": model_dir / "model.pkl", "examples_path": model_dir / "serving_input_example.json",
+            "metadata_path": model_dir / "model_metadata.json", "source": "mlflow", "origin": f"{experiment_id}/{model_id}"}
+
+
+# Probabilities of the serving examples: valid, the same in every scoring process & matching the reference
+def check_parity(outputs, reference=None, atol=MODEL_PARITY_ATOL):
+    for probs in outputs:
+        if not np.all(np.isfinite(probs)) or np.any((probs < 0) | (probs > 1)):
+            raise ValueError("The model returned invalid probabilities on the serving examples")
+    expected = reference if reference is not None else outputs[0]
+    max_diff = max(float(np.max(np.abs(probs - expected))) for probs in outputs)
+    if max_diff > atol:
+        raise ValueError(f"Parity check failed on the serving examples (max abs diff {max_diff:.3g} > {atol:g})")
+    return {
+        "examples": len(outputs[0]),
+        "max_abs_diff": max_diff,
+        "reference": "fitted model" if reference is not None else "checked when the artifact was exported",
+    }
+
+
+# Scoring model of a load request, prepared, warmed up & checked on the serving examples
+def load_candidate(path=None, model_id=None, model_name=None, experiment_id=None, threshold=None,
+                   n_workers=SERVING_WORKERS, active_model=None, nice=0):
+    from model_registry import BackendUnpickler, read_serving_examples
+    files = resolve_model_files(path, model_id, model_name, experiment_id)
+    timings, source = {}, files["source"]
+    records = read_serving_records(files["examples_path"])
+    version = get_model_version(files["model_path"])
+
+    if source == "pickle" and FAST_PATH_SCORER and USE_MODEL_ARTIFACT and is_artifact_current(MODEL_ARTIFACT_DIR, files["model_path"]):
+        # The artifact was parity-checked when exported from this exact pickle (see build_artifact.py)
+        fitted_model, prepare, reference = timed(timings, "load_s", lambda: load_artifact(MODEL_ARTIFACT_DIR)), None, None
+        source = "artifact"
+    else:
+        def unpickle():
+            with open(files["model_path"], "rb") as f:
+                return BackendUnpickler(f).load()
+        fitted_model = timed(timings, "load_s", unpickle)
+        if not hasattr(fitted_model, "lr_pipeline") and not hasattr(fitted_model, "steps"):
+            raise ValueError(f"{type(fitted_model).__name__} is not a raw-input model (ensemble or pipeline)")
+
+        # Reference probabilities of the fitted model itself, before its pipelines are set up for serving
+        examples = read_serving_examples(files["examples_path"])
+        reference = timed(timings, "reference_s", lambda: fitted_model.predict_proba(examples)[:, 1])
+        fitted_model = set_serving_mode(fitted_model)
+        prepare = functools.partial(prepare_model, examples_path=files["examples_path"])
+
+    pool = None
+    try:
+        if n_workers > 0:
+            pool = timed(timings, "pool_s", lambda: ModelWorkerPool(fitted_model, prepare, n_workers, nice, LATE_WORKER_START_METHOD))
+        model = timed(timings, "prepare_s", lambda: prepare(fitted_model) if prepare is not None else fitted_model)
+        model = instrument_serving_model(model)
+
+        # Warm-up on the serving examples, in this process & in every worker
+        outputs = [timed(timings, "warm_up_s", lambda: warm_up(model, records))[:, 1]]
+        if pool is not None:
+            outputs += [probs[:, 1] for probs in timed(timings, "pool_warm_up_s", lambda: pool.warm_up(records))]
+        parity = check_parity(outputs, reference)
+    except Exception:
+        if pool is not None:
+            pool.shutdown()
+        raise
+
+    # How much the predictions move from the model being replaced (for information, not checked)
+    if active_model is not None:
+        try:
+            parity["max_abs_diff_vs_active"] = float(np.max(np.abs(warm_up(active_model, records)[:, 1] - outputs[0])))
+        except Exception:
+            parity["max_abs_diff_vs_active"] = None
+
+    threshold = threshold if threshold is not None else load_prediction_threshold(version, files["metadata_path"])
+    timings["total_s"] = round(sum(timings.values()), 4)
+    return ServingModel(model, version, source, files["origin"], threshold, fitted_model, prepare, pool, timings, parity)
+
+
+# Active & previous serving models of the app, with the background loads & rollbacks between them
+class ModelManager:
+    def __init__(self, app, n_workers=SERVING_WORKERS, swap_grace_s=MODEL_SWAP_GRACE_S):
+        self.app = app
+        self.n_workers = n_workers
+        self.swap_grace_s = swap_grace_s
+        self.active = None
+        self.previous = None
+        self.job = None # status of the last load or rollback
+        self._thread = None
+        self._job_lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+
+    # Serve a model: the app state is replaced without awaiting, so no request handler runs in between
+    def activate(self, serving):
+        state = self.app.state
+        state.model, state.pool = serving.model, serving.pool
+        state.model_version, state.model_source, state.threshold = serving.version, serving.source, serving.threshold
+
+        # Cached probabilities are keyed by model version, so the replaced model's entries would only take up space
+        cache = getattr(state, "cache", None)
+        if cache is not None:
+            cache.clear()
+
+        replaced, self.active = self.active, serving
+        if replaced is not None:
+            self.previous = replaced
+            self.retire_pool(replaced)
+        return replaced
+
+    # The worker pool of a replaced model is shut down after the grace period, once its in-flight requests are done
+    # (the model itself is kept for a rollback)
+    def retire_pool(self, serving):
+        if serving.pool is None:
+            return
+        serving.retiring = True
+        timer = threading.Timer(self.swap_grace_s, self.shutdown_pool, args=(serving, True))
+        timer.daemon = True
+        timer.start()
+
+    def shutdown_pool(self, serving, retiring=False):
+        with self._pool_lock:
+            if retiring and not serving.retiring:
+                return # rolled back to during the grace period
+            pool, serving.pool, serving.retiring = serving.pool, None, False
+        if pool is not None:
+            pool.shutdown()
+
+    # Previous model made servable again (its worker pool is restarted if it was already shut down)
+    def restore(self, serving):
+        timings = {}
+        with self._pool_lock:
+            serving.retiring = False
+        if self.n_workers > 0 and serving.pool is None:
+            serving.pool = timed(timings, "pool_s", lambda: ModelWorkerPool(
+                serving.fitted_model, serving.prepare, self.n_workers, start_method=LATE_WORKER_START_METHOD
+            ))
+            timed(timings, "pool_warm_up_s", lambda: serving.pool.warm_up(read_serving_records()))
+        serving.timings = {**serving.timings, "rollback": timings}
+        return serving
+
+    def is_busy(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Build a serving model in a background thread & swap it in on the event loop (called from the event loop)
+    def start_job(self, kind, build, request=None):
+        loop = asyncio.get_running_loop()
+        with self._job_lock:
+            if self.is_busy():
+                raise RuntimeError(f"A model {self.job['kind']} is already running")
+            self.job = {"kind": kind, "request": request or {}, "state": "running", "started_at": utc_now(),
+                        "finished_at": None, "error": None, "model": None}
+            self._thread = threading.Thread(target=self._run_job, args=(build, loop), name=f"model-{kind}", daemon=True)
+            self._thread.start()
+            return dict(self.job)
+
+    def _run_job(self, build, loop):
+        kind = self.job["kind"]
+        try:
+            serving = build()
+            asyncio.run_coroutine_threadsafe(self._activate_async(serving), loop).result()
+            self.job.update(state="succeeded", model=serving.describe())
+            print(f"Model {kind}: serving version {serving.version} from {serving.origin} (threshold {serving.threshold})")
+        except Exception as e:
+            self.job.update(state="failed", error=f"{type(e).__name__}: {e}")
+            print(f"Model {kind} failed, still serving version {self.active.version}: {e}")
+        self.job["finished_at"] = utc_now()
+        MODEL_SWAPS.labels(kind, self.job["state"]).inc()
+
+    async def _activate_async(self, serving):
+        return self.activate(serving)
+
+    # Load a new model (path, model_id or model_name of a logged model) in the background
+    def load(self, path=None, model_id=None, model_name=None, experiment_id=None, threshold=None):
+        if path is not None and not Path(path).is_file():
+            raise FileNotFoundError(f"No model file at {path}")
+        request = {"path": path, "model_id": model_id, "model_name": model_name, "experiment_id": experiment_id, "threshold": threshold}
+        active_model = self.active.model if self.active is not None else None
+        build = lambda: load_candidate(path, model_id, model_name, experiment_id, threshold, self.n_workers, active_model)
+        return self.start_job("load", build, request)
+
+    # Serve the previous model again (the current one becomes the previous)
+    def rollback(self):
+        previous = self.previous
+        if previous is None:
+            raise LookupError("No previous model to roll back to")
+        return self.start_job("rollback", lambda: self.restore(previous), {"model_version": previous.version})
+
+    def describe(self):
+        return {
+            "active": self.active.describe() if self.active is not None else None,
+            "previous": self.previous.describe() if self.previous is not None else None,
+            "job": dict(self.job) if self.job is not None else None,
+        }
+
+    def shutdown(self):
+        for serving in (self.active, self.previous):
+            if serving is not None:
+                self.shutdown_pool(serving)
@@ -0,0 +1,74 @@
+import os
+import json
+import pickle
+import pandas as pd
+from pathlib import Path
+
+# Local MLflow tracking store (see notebooks), to be mounted in the serving image for hot swaps from it
+TRACKING_DIR = Path(os.getenv("LOANTAP_MLFLOW_TRACKING_DIR", Path(__file__).resolve().parents[2] / "mlflow_tracking" / "mlruns"))
+EXPERIMENT_ID = "529194635109779319"
+
+# Model logged by the Step-4 notebook for the deployed ensemble (Ensemble_eval_model)
+ENSEMBLE_MODEL_ID = "m-f8e3746260d546d4b71bed48aa5e2f24"
+
+
+# Artifacts directory of a logged model
+def get_model_dir(model_id, experiment_id=EXPERIMENT_ID):
+    return TRACKING_DIR / experiment_id / "models" / model_id / "artifacts"
+
+
+# Fields of the meta.yaml of a logged model (flat "key: value" lines, read without a YAML parser)
+def read_model_meta(model_id, experiment_id=EXPERIMENT_ID):
+    meta = {}
+    with open(TRACKING_DIR / experiment_id / "models" / model_id / "meta.yaml") as f:
+        for line in f:
+            key, sep, value = line.partition(":")
+            if sep and not line.startswith(" "):
+                meta[key.strip()] = value.strip().strip("'\"")
+    return meta
+
+
+# Id of the latest model logged under a name (e.g. Ensemble_eval_model)
+def find_logged_model(name, experiment_id=EXPERIMENT_ID):
+    candidates = []
+    for meta_path in (TRACKING_DIR / experiment_id / "models").glob("*/meta.yaml"):
+        meta = read_model_meta(meta_path.parent.name, experiment_id)
+        if meta.get("name") == name:
+            candidates.append((int(meta.get("creation_timestamp") or 0), meta_path.parent.name))
+    if not candidates:
+        raise LookupError(f"No model named {name} in experiment {experiment_id}")
+    return max(candidates)[1]
+
+
+# Raw-input models logged by the notebooks (Ensemble_eval_model, Logreg_eval_model, Xgboost_eval_model)
+RAW_INPUT_MODEL_IDS = [
+    ENSEMBLE_MODEL_ID,
+    "m-211a41669e3c48b4952fe3282e311cc6",
+    "m-accb3b00703242d4ba3803f43e47279f",
+]
+
+
+# Serving input example file (MLflow dataframe_split format) as a raw (uncleaned) dataframe
+def read_serving_examples(path):
+    with open(path) as f:
+        serving_input = json.load(f)["dataframe_split"]
+    return pd.DataFrame(data=serving_input["data"], columns=serving_input["columns"])
+
+
+# Serving input example logged with a model
+def load_serving_examples(model_id=ENSEMBLE_MODEL_ID, experiment_id=EXPERIMENT_ID):
+    return read_serving_examples(get_model_dir(model_id, experiment_id) / "serving_input_example.json")
+
+
+# Unpickler resolving the transformers of the notebooks (logged as src.data_preprocessing.*) from the backend
+class BackendUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if "data_preprocessing" in module:
+            module = module[module.index("data_preprocessing"):]
+        return super().find_class(module, name)
+
+
+# Fitted model logged with MLflow
+def load_logged_model(model_id, experiment_id=EXPERIMENT_ID):
+    with open(get_model_dir(model_id, experiment_id) / "model.pkl", "rb") as f:
+        return BackendUnpickler(f).load()
@@ -0,0 +1,65 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Cache of predicted probabilities for recently scored records
+# Keys hash the canonicalized record together with the model version, so a new model never reuses old entries
+
+
+# Stable key of a validated record for a model version
+def make_cache_key(record, model_version):
+    # Whitespace around strings is stripped by the DataCleaner, so it doesn't change the prediction
+    canonical = {feat: value.strip() if isinstance(value, str) else value for feat, value in record.items()}
+    payload = json.dumps([model_version, canonical], sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+# Bounded LRU cache with a time-to-live on the entries
+class PredictionCache:
+    def __init__(self, maxsize=10000, ttl_seconds=600):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict() # key -> (probability, expiry time)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key] # expired
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, probability):
+        with self._lock:
+            self._entries[key] = (probability, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False) # evict the least recently used entry
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
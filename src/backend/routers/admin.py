@@ -0,0 +1,66 @@
+import hmac
+from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from fastapi import APIRouter, Request, HTTPException, Header, Depends
+from config import ADMIN_TOKEN
+
+
+# Admin endpoints are enabled by setting LOANTAP_ADMIN_TOKEN & require it in the X-Admin-Token header
+def check_admin_token(x_admin_token: str = Header(default="")):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (LOANTAP_ADMIN_TOKEN is not set)")
+    if not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(check_admin_token)])
+
+
+# Model to load: a pickle on the server or a model logged in the MLflow tracking store
+class ModelLoadRequest(BaseModel):
+    path: Optional[str] = Field(default=None, description="Path of a pickled fitted model on the server")
+    model_id: Optional[str] = Field(default=None, description="Id of a model logged in the MLflow tracking store")
+    model_name: Optional[str] = Field(default=None, description="Name of a logged model (its latest version is loaded)")
+    experiment_id: Optional[str] = Field(default=None, description="MLflow experiment of the logged model (the project's by default)")
+    threshold: Optional[float] = Field(default=None, gt=0, lt=1, description="Decision threshold (from the model metadata by default)")
+
+    @model_validator(mode="after")
+    def check_source(self):
+        if sum(value is not None for value in (self.path, self.model_id, self.model_name)) != 1:
+            raise ValueError("Set exactly one of path, model_id & model_name")
+        return self
+
+
+# Active & previous models (version, origin, threshold, load timings & parity) & the status of the last load
+@router.get("/model")
+def model_status(request: Request):
+    return request.app.state.model_manager.describe()
+
+
+# Load a model in the background & swap it in once warm & checked (poll GET /admin/model for the outcome)
+@router.post("/model/load", status_code=202)
+async def load_model(load_request: ModelLoadRequest, request: Request):
+    try:
+        return request.app.state.model_manager.load(**load_request.model_dump())
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+# Swap the previous model back in
+@router.post("/model/rollback", status_code=202)
+async def rollback_model(request: Request):
+    try:
+        return request.app.state.model_manager.rollback()
+    except (LookupError, RuntimeError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+# Shadow models, their queue (pending, queued & shed records) & their agreement with the served model
+@router.get("/shadow")
+def shadow_status(request: Request):
+    shadow = request.app.state.shadow
+    if shadow is None:
+        raise HTTPException(status_code=404, detail="Shadow scoring is disabled (LOANTAP_SHADOW_MODELS is not set)")
+    return shadow.describe()
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import PlainTextResponse
+from metrics import render_metrics
+from data_preprocessing.parsing import get_parsing_stats
+
+
+router = APIRouter()
+
+
+# Runtime statistics of the serving components
+@router.get("/stats")
+def stats(request: Request):
+    batcher = request.app.state.batcher
+    cache = request.app.state.cache
+    return {
+        "model_version": request.app.state.model_version,
+        "threshold": request.app.state.threshold,
+        "batching": batcher.stats() if batcher is not None else None,
+        "prediction_cache": cache.stats() if cache is not None else None,
+        "parsing": get_parsing_stats(),
+    }
+
+
+# Readiness of the API: model loaded & warmed up (503 until then)
+@router.get("/ready")
+def ready(request: Request):
+    if not getattr(request.app.state, "ready", False):
+        raise HTTPException(status_code=503, detail="Model is not ready")
+    return {"ready": True, "model_source": request.app.state.model_source}
+
+
+# Metrics in the Prometheus text format
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
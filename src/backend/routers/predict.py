@@ -1,7 +1,13 @@
-import pandas as pd
+import io
+import json
+import numpy as np
 from typing import Literal
-from pydantic import BaseModel, Field
-from fastapi import APIRouter, Request, HTTPException
+from pydantic import BaseModel, Field, ValidationError
+from fastapi import APIRouter, Request, Response, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from config import PREDICTION_THRESHOLD, BATCH_CHUNK_SIZE, EXPLAIN_TOP_K, EXPLAIN_EXACT_CONTRIBS
+from prediction_cache import make_cache_key
+from columnar import ARROW_STREAM_TYPE, get_field_domains, is_columnar_type, read_table, validate_table, to_columns, build_response
 
 
 router = APIRouter()
@@ -37,25 +43,236 @@ class InputRecord(BaseModel):
     address: str = Field(description="Address of the applicant")
 
 
+# Field domains of the records, checked column-wise on columnar bodies
+INPUT_DOMAINS = get_field_domains(InputRecord)
+
+
+# Label for a predicted probability of default
+def get_label(y_prob, threshold=PREDICTION_THRESHOLD):
+    if y_prob >= threshold:
+        return "Defaulter"
+    return "Not a defaulter"
+
+
+# Probability for class=1 of each record
+def score_probabilities(model, records):
+    return model.predict_proba(records)[:, 1].tolist()
+
+
+# Serving model of a request, read once: its model, threshold & version serve the whole request, even when another
+# model is swapped in meanwhile (see model_manager.py)
+def get_serving(request):
+    serving = request.app.state.model_manager.active
+    if serving is None or not request.app.state.model:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    return serving
+
+
+# Hand scored records to the shadow models, if any (never waits, see shadow.py)
+def submit_shadow(app, serving, records, probs):
+    shadow = getattr(app.state, "shadow", None)
+    if shadow is not None:
+        shadow.submit(records, probs, serving.version, serving.threshold)
+
+
+# Probability for class=1 of a single record
+async def score_record(app, serving, data_dict):
+    # Concurrent requests are coalesced into a single predict_proba call by the micro-batcher
+    if app.state.batcher is not None:
+        return await app.state.batcher.submit(data_dict, serving)
+    if serving.pool is not None:
+        return (await serving.pool.predict_proba_async([data_dict]))[0, 1]
+    return (await run_in_threadpool(score_probabilities, serving.model, [data_dict]))[0]
+
+
+# Reason codes of records: the fields pushing each one the most towards default, as {field, contribution} objects
+def format_reasons(reasons):
+    return [[{"field": field, "contribution": contribution} for field, contribution in row] for row in reasons]
+
+
+# Probability & reason codes of a single record (explained by the serving model it was scored with)
+def explain_record(serving, data_dict, top_k):
+    explainer = serving.get_explainer()
+    probs, _, contributions = explainer.explain([data_dict])
+    return float(probs[0]), format_reasons(explainer.top_reasons(contributions, top_k))[0]
+
+
 @router.post("/predict")
-def predict(record: InputRecord, request: Request):
+async def predict(record: InputRecord, request: Request, use_cache: bool = Query(default=True, description="Set to false to bypass the prediction cache"),
+                  explain: bool = Query(default=False, description="Set to true to return the probability & the reason codes"),
+                  top_k: int = Query(default=EXPLAIN_TOP_K, ge=1, le=26, description="Number of reason codes")):
     try:
-        model = request.app.state.model
+        serving = get_serving(request)
 
-        if not model:
-            raise HTTPException(status_code=500, detail="Model not loaded")
+        # Explained records are scored by the explainer (in one pass), without the cache or the micro-batcher
+        if explain:
+            y_prob, reasons = await run_in_threadpool(explain_record, serving, record.model_dump(), top_k)
+            return {"prediction": get_label(y_prob, serving.threshold), "probability": y_prob, "reasons": reasons}
 
+        # Records scored recently by the same model are answered from the cache
+        # (bypassed with use_cache=false or a Cache-Control: no-cache header)
         data_dict = record.model_dump()
-        record_df = pd.DataFrame([data_dict])
-        y_probs = model.predict_proba(record_df)[:, 1] # probability for class=1
+        cache = request.app.state.cache
+        use_cache = use_cache and cache is not None and "no-cache" not in request.headers.get("cache-control", "")
+        if use_cache:
+            cache_key = make_cache_key(data_dict, serving.version)
+            y_prob = cache.get(cache_key)
+            if y_prob is not None:
+                submit_shadow(request.app, serving, [data_dict], [y_prob])
+                return get_label(y_prob, serving.threshold)
+
+        y_prob = await score_record(request.app, serving, data_dict)
+        if use_cache:
+            cache.put(cache_key, y_prob)
+        submit_shadow(request.app, serving, [data_dict], [y_prob])
 
         # Return prediction
-        threshold = 0.6088
-        if y_probs[0] >= threshold:
-            prediction = "Defaulter"
-        else:
-            prediction = "Not a defaulter"
-        return prediction
+        return get_label(y_prob, serving.threshold)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    
\ No newline at end of file
+
+
+# Parse the batch request body into a list of raw records
+# Accepts a JSON list of records, a columnar JSON object ({feature: [values]}) or a CSV file
+def parse_batch_body(body, content_type):
+    if content_type.startswith("text/csv"):
+        import pandas as pd # only needed for CSV bodies (kept out of the API startup)
+        batch_df = pd.read_csv(io.BytesIO(body))
+        batch_df = batch_df.astype(object).where(batch_df.notna(), None) # missing values as None
+        return batch_df.to_dict(orient="records")
+
+    payload = json.loads(body)
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        lengths = {len(values) for values in payload.values() if isinstance(values, list)}
+        if len(lengths) != 1 or len(payload) != sum(isinstance(values, list) for values in payload.values()):
+            raise ValueError("Columnar body should map every feature to a list of equal length")
+        n_records = lengths.pop()
+        return [{feat: values[i] for feat, values in payload.items()} for i in range(n_records)]
+    raise ValueError("Body should be a list of records, a columnar object or a CSV file")
+
+
+# Validate each raw record independently, collecting the errors per row
+def validate_records(raw_records):
+    records, errors = {}, {}
+    for idx, raw_record in enumerate(raw_records):
+        try:
+            records[idx] = InputRecord.model_validate(raw_record)
+        except ValidationError as e:
+            errors[idx] = e.errors(include_url=False, include_context=False, include_input=False)
+    return records, errors
+
+
+# Score validated records with one predict_proba call per chunk
+def score_records(model, records, chunk_size=BATCH_CHUNK_SIZE):
+    indices = list(records.keys())
+    probs, errors = {}, {}
+    for start in range(0, len(indices), chunk_size):
+        chunk_indices = indices[start:start + chunk_size]
+        chunk_records = [records[idx].model_dump() for idx in chunk_indices]
+        try:
+            y_probs = model.predict_proba(chunk_records)[:, 1] # probability for class=1
+        except Exception as e:
+            errors.update({idx: [{"type": "prediction_error", "loc": [], "msg": str(e)}] for idx in chunk_indices})
+            continue
+        probs.update(zip(chunk_indices, y_probs.tolist()))
+    return probs, errors
+
+
+# Score & explain validated records chunk by chunk (on the worker processes when there are some)
+# Records that cannot be scored are isolated within their chunk
+def explain_records(serving, records, chunk_size=BATCH_CHUNK_SIZE, top_k=EXPLAIN_TOP_K):
+    import pandas as pd
+    from worker_pool import explain_chunk
+
+    explainer = serving.get_explainer()
+    indices = list(records.keys())
+    probs, reasons, errors = {}, {}, {}
+    for start in range(0, len(indices), chunk_size):
+        chunk_indices = indices[start:start + chunk_size]
+        X = pd.DataFrame([records[idx].model_dump() for idx in chunk_indices])
+        if serving.pool is not None:
+            chunk_probs, contributions, chunk_errors = serving.pool.submit_explain_chunk(X, EXPLAIN_EXACT_CONTRIBS).result()
+        else:
+            chunk_probs, contributions, chunk_errors = explain_chunk(explainer, X)
+        errors.update({chunk_indices[row]: [{"type": "prediction_error", "loc": [], "msg": msg}] for row, msg in chunk_errors.items()})
+
+        scored = [row for row in range(len(chunk_indices)) if row not in chunk_errors]
+        chunk_reasons = format_reasons(explainer.top_reasons(contributions[scored], top_k)) if scored else []
+        for row, row_reasons in zip(scored, chunk_reasons):
+            probs[chunk_indices[row]] = float(chunk_probs[row])
+            reasons[chunk_indices[row]] = row_reasons
+    return probs, reasons, errors
+
+
+@router.post("/predict_batch")
+async def predict_batch(request: Request, chunk_size: int = Query(default=BATCH_CHUNK_SIZE, gt=0),
+                        explain: bool = Query(default=False, description="Set to true to return the reason codes of each record"),
+                        top_k: int = Query(default=EXPLAIN_TOP_K, ge=1, le=26, description="Number of reason codes")):
+    serving = get_serving(request)
+
+    # Parse, validate & score the records (blocking work runs off the event loop)
+    body = await request.body()
+    try:
+        raw_records = await run_in_threadpool(parse_batch_body, body, request.headers.get("content-type", ""))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {e}")
+
+    records, errors = await run_in_threadpool(validate_records, raw_records)
+    reasons = None
+    if explain:
+        probs, reasons, pred_errors = await run_in_threadpool(explain_records, serving, records, chunk_size, top_k)
+    else:
+        # Chunks are scored by the worker processes when there are some
+        probs, pred_errors = await run_in_threadpool(score_records, serving.pool or serving.model, records, chunk_size)
+    errors.update(pred_errors)
+    submit_shadow(request.app, serving, [records[idx] for idx in probs], list(probs.values()))
+
+    # Results in the input order
+    results = []
+    for idx in range(len(raw_records)):
+        if idx in probs:
+            results.append({"index": idx, "probability": probs[idx], "prediction": get_label(probs[idx], serving.threshold)})
+            if reasons is not None:
+                results[-1]["reasons"] = reasons[idx]
+        else:
+            results.append({"index": idx, "errors": errors[idx]})
+    return {"results": results}
+
+
+# Score a columnar body: validate the columns, then score the valid rows chunk by chunk as arrays
+def score_table(model, body, content_type, chunk_size=BATCH_CHUNK_SIZE):
+    table = read_table(body, content_type)
+    valid_table, valid_rows, errors = validate_table(table, INPUT_DOMAINS)
+
+    rows, probs = [], []
+    for start in range(0, valid_table.num_rows, chunk_size):
+        chunk_rows = valid_rows[start:start + chunk_size]
+        try:
+            probs.append(model.predict_proba(to_columns(valid_table.slice(start, chunk_size), INPUT_DOMAINS))[:, 1])
+        except Exception as e:
+            errors.update({row: [{"type": "prediction_error", "loc": [], "msg": str(e)}] for row in chunk_rows.tolist()})
+            continue
+        rows.append(chunk_rows)
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+    probs = np.concatenate(probs) if probs else np.empty(0)
+    return table.num_rows, rows, probs, errors
+
+
+# Bulk scoring of Arrow IPC (stream or file) & Parquet bodies, answered with an Arrow IPC stream of
+# (row, probability, prediction, error)
+@router.post("/predict_arrow")
+async def predict_arrow(request: Request, chunk_size: int = Query(default=BATCH_CHUNK_SIZE, gt=0)):
+    serving = get_serving(request)
+    content_type = request.headers.get("content-type", "")
+    if not is_columnar_type(content_type):
+        raise HTTPException(status_code=415, detail="Body should be an Arrow IPC stream/file or a Parquet file")
+
+    body = await request.body()
+    try:
+        n_rows, rows, probs, errors = await run_in_threadpool(score_table, serving.pool or serving.model, body, content_type, chunk_size)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid columnar body: {e}")
+    content = await run_in_threadpool(build_response, n_rows, rows, probs, errors, serving.threshold)
+    return Response(content=content, media_type=ARROW_STREAM_TYPE)
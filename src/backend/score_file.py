@@ -0,0 +1,189 @@
+# Score a CSV/Parquet file of loan records out-of-core, writing probabilities & labels to a CSV file
+# Run from src/backend: python score_file.py INPUT OUTPUT [--chunk-size 50000] [--workers N] [--start-row N | --resume]
+#                        [--explain-top-k K [--exact-contribs]]
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from collections import deque
+from concurrent.futures import Future
+
+from config import MODEL_ARTIFACT_DIR
+from worker_pool import ModelWorkerPool, score_chunk, explain_chunk
+from data_preprocessing.explainer import build_explainer
+from model_loader import load_fitted_model, get_model_version, load_prediction_threshold
+
+OUTPUT_COLUMNS = ["row", "probability", "prediction", "error"]
+
+
+# Chunks (dataframes) of the input file from a given row on, with the absolute position of their first row
+def iter_chunks(path, chunk_size, start_row=0):
+    if Path(path).suffix == ".parquet":
+        yield from iter_parquet_chunks(path, chunk_size, start_row)
+        return
+
+    # Skipped rows are dropped while reading (not kept in memory)
+    skip_rows = (lambda line: 0 < line <= start_row) if start_row else None
+    reader = pd.read_csv(path, chunksize=chunk_size, skiprows=skip_rows)
+    row = start_row
+    for chunk in reader:
+        yield row, chunk.reset_index(drop=True)
+        row += len(chunk)
+
+
+def iter_parquet_chunks(path, chunk_size, start_row=0):
+    import pyarrow.parquet as pq # only needed for Parquet inputs
+    parquet_file = pq.ParquetFile(path)
+
+    # Row groups before the start row are not read at all (reading starts with the group containing it)
+    first_group, row = 0, 0
+    while first_group < parquet_file.num_row_groups:
+        n_rows = parquet_file.metadata.row_group(first_group).num_rows
+        if row + n_rows > start_row:
+            break
+        row += n_rows
+        first_group += 1
+    row_groups = list(range(first_group, parquet_file.num_row_groups))
+    if not row_groups:
+        return
+
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups):
+        # Batches before the start row are skipped, the one crossing it is sliced
+        if row + batch.num_rows <= start_row:
+            row += batch.num_rows
+            continue
+        if row < start_row:
+            batch = batch.slice(start_row - row)
+            row = start_row
+        yield row, batch.to_pandas()
+        row += batch.num_rows
+
+
+# Input row to resume an output file from: the one after its last fully written row (default_row if it has none)
+# Every output row is a single line starting with its row id. A partially written last line (interrupted run) is cut
+# off, so the resumed run appends right after the last complete row
+def get_resume_row(path, default_row=0, block_size=1 << 16):
+    with open(path, "rb+") as f:
+        # Tail of the file holding its last complete line & the newline before it
+        end = f.seek(0, os.SEEK_END)
+        tail, tail_start = b"", end
+        while tail_start > 0 and tail.count(b"\n") < 2:
+            read_size = min(block_size, tail_start)
+            tail_start -= read_size
+            f.seek(tail_start)
+            tail = f.read(read_size) + tail
+
+        complete_end = tail_start + tail.rfind(b"\n") + 1
+        f.truncate(complete_end)
+        lines = tail[:complete_end - tail_start].splitlines()
+    if tail_start > 0 or len(lines) > 1:
+        return int(lines[-1].split(b",", 1)[0]) + 1
+    return default_row # header only (or nothing complete at all)
+
+
+# Output rows of a scored chunk (with the top reason codes of each row when explained)
+def build_output(start_row, probs, errors, threshold, reasons=None, top_k=0):
+    output = pd.DataFrame({
+        "row": np.arange(start_row, start_row + len(probs)),
+        "probability": probs,
+        "prediction": np.where(probs >= threshold, "Defaulter", "Not a defaulter"),
+        "error": [" ".join(errors.get(idx, "").split()) for idx in range(len(probs))], # one line per row
+    })
+    output.loc[output["error"] != "", "prediction"] = ""
+    for k in range(top_k):
+        output[f"reason_{k + 1}"] = [row[k][0] if idx not in errors and k < len(row) else "" for idx, row in enumerate(reasons)]
+    return output
+
+
+# In-process counterpart of ModelWorkerPool.submit_chunk (scoring with --workers 0)
+class InProcessScorer:
+    def __init__(self, model, explainer=None):
+        self.model = model
+        self.explainer = explainer
+
+    def submit_chunk(self, X):
+        future = Future()
+        future.set_result(score_chunk(self.model, X))
+        return future
+
+    def submit_explain_chunk(self, X, exact=False):
+        future = Future()
+        future.set_result(explain_chunk(self.explainer, X))
+        return future
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a CSV/Parquet file of loan records through the model in chunks")
+    parser.add_argument("input", help="Input .csv or .parquet file with the raw record features")
+    parser.add_argument("output", help="Output .csv file (row, probability, prediction, error)")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Scoring processes (0 scores in this process)")
+    parser.add_argument("--start-row", type=int, default=0, help="First input row to score (0-based, header excluded)")
+    parser.add_argument("--resume", action="store_true", help="Append to the output, starting after its last written row (at --start-row if none)")
+    parser.add_argument("--explain-top-k", type=int, default=0, help="Reason codes per row (reason_1..reason_K columns)")
+    parser.add_argument("--exact-contribs", action="store_true", help="Explain the trees with TreeSHAP (~100x slower)")
+    args = parser.parse_args()
+    output_columns = OUTPUT_COLUMNS + [f"reason_{k + 1}" for k in range(args.explain_top_k)]
+
+    # Resuming continues after the last row written to the output (from --start-row if none was)
+    start_row, mode = args.start_row, "w"
+    if args.resume and Path(args.output).exists():
+        start_row, mode = get_resume_row(args.output, args.start_row), "a"
+    write_header = mode == "w" or os.path.getsize(args.output) == 0
+
+    fitted_model, prepare_model, model_source = load_fitted_model()
+    threshold = load_prediction_threshold(get_model_version())
+    # Reason codes are ranked here, from the contributions computed with the scores
+    explainer = build_explainer(fitted_model, MODEL_ARTIFACT_DIR, args.exact_contribs) if args.explain_top_k > 0 else None
+    if args.workers > 0:
+        scorer = ModelWorkerPool(fitted_model, prepare_model, args.workers)
+    else:
+        scorer = InProcessScorer(prepare_model(fitted_model) if prepare_model is not None else fitted_model, explainer)
+    print(f"Scoring {args.input} from row {start_row} with {args.workers} workers (model from {model_source})", file=sys.stderr)
+
+    # At most 2 chunks per worker are in flight, so memory stays bounded whatever the input size
+    max_in_flight = 2 * max(args.workers, 1)
+    in_flight = deque()
+    n_rows = n_errors = 0
+    start = time.perf_counter()
+    with open(args.output, mode, newline="") as f:
+        # Chunks are written in input order as soon as they are scored
+        def write_oldest():
+            nonlocal write_header, n_rows, n_errors
+            chunk_row, future = in_flight.popleft()
+            reasons = None
+            if explainer is not None:
+                probs, contributions, errors = future.result()
+                reasons = explainer.top_reasons(np.nan_to_num(contributions, nan=-np.inf), args.explain_top_k)
+            else:
+                probs, errors = future.result()
+            output = build_output(chunk_row, probs, errors, threshold, reasons, args.explain_top_k)
+            output.to_csv(f, header=write_header, index=False, columns=output_columns)
+            f.flush()
+            write_header = False
+            n_rows += len(probs)
+            n_errors += len(errors)
+            elapsed = time.perf_counter() - start
+            print(f"{start_row + n_rows} rows done, {n_errors} errors, {n_rows / elapsed:,.0f} rows/s", file=sys.stderr)
+
+        for chunk_row, chunk in iter_chunks(args.input, args.chunk_size, start_row):
+            if explainer is not None:
+                in_flight.append((chunk_row, scorer.submit_explain_chunk(chunk, args.exact_contribs)))
+            else:
+                in_flight.append((chunk_row, scorer.submit_chunk(chunk)))
+            if len(in_flight) >= max_in_flight:
+                write_oldest()
+        while in_flight:
+            write_oldest()
+
+    if args.workers > 0:
+        scorer.shutdown()
+    elapsed = time.perf_counter() - start
+    print(f"Scored {n_rows} rows ({n_errors} errors) in {elapsed:.1f}s, {n_rows / max(elapsed, 1e-9):,.0f} rows/s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
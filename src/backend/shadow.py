@@ -0,0 +1,217 @@
+import time
+import queue
+import sqlite3
+import threading
+import numpy as np
+from pathlib import Path
+from contextlib import closing
+from metrics import histogram
+from config import SHADOW_MAX_PENDING, SHADOW_BATCH_SIZE, SHADOW_MAX_WAIT_MS, SHADOW_WORKERS, SHADOW_NICE
+
+# Shadow scoring of challenger models on the live traffic
+# The primary prediction is answered first: the records & their primary probabilities are then handed to the
+# ShadowScorer without waiting. A dispatcher thread batches them (waiting up to max_wait_ms for a full batch: the
+# fewer the batches, the less work in the API process) & scores them with every shadow model, in worker processes
+# running at a lower CPU priority, so shadow work neither holds the GIL of the API process nor gets the CPUs ahead of it.
+# At most max_pending records wait for the shadows: beyond that, new records are shed (& counted) rather than queued,
+# so a slow or overloaded shadow never builds up memory or delays the primary requests.
+# Agreement of the labels, probability deltas & latencies of every shadow prediction go to a local sqlite log.
+
+SHADOW_SECONDS = histogram("loantap_shadow_predict_seconds", "Wall time of a shadow predict_proba call", ["shadow"])
+
+LOG_COLUMNS = ["scored_at", "shadow", "shadow_version", "primary_version", "primary_probability", "shadow_probability",
+               "delta", "agree", "queue_ms", "latency_ms", "batch_size", "error"]
+
+
+# Load request of a shadow model: a logged model id (m-...), a pickle path (.pkl) or the name of a logged model
+def parse_shadow_spec(spec):
+    if spec.startswith("m-"):
+        return {"model_id": spec}
+    if spec.endswith(".pkl"):
+        return {"path": spec}
+    return {"model_name": spec}
+
+
+# Append-only sqlite log of the shadow predictions (one row per record & shadow model)
+class ShadowLog:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._conn = None # connection of the dispatcher thread (sqlite connections stay in their thread)
+
+    def connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL") # summaries are read while the dispatcher writes
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shadow_predictions (scored_at REAL, shadow TEXT, shadow_version TEXT, "
+            "primary_version TEXT, primary_probability REAL, shadow_probability REAL, delta REAL, agree INTEGER, "
+            "queue_ms REAL, latency_ms REAL, batch_size INTEGER, error TEXT)"
+        )
+        return conn
+
+    def write(self, rows):
+        if self._conn is None:
+            self._conn = self.connect()
+        with self._conn:
+            self._conn.executemany(f"INSERT INTO shadow_predictions VALUES ({', '.join('?' * len(LOG_COLUMNS))})", rows)
+
+    # Agreement with the primary model, probability deltas & latencies per shadow model version
+    def summary(self):
+        if not self.path.exists():
+            return []
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(
+                "SELECT shadow, shadow_version, COUNT(*), SUM(error IS NOT NULL), AVG(agree), AVG(delta), AVG(ABS(delta)), "
+                "MAX(ABS(delta)), AVG(queue_ms), AVG(latency_ms), MAX(latency_ms) "
+                "FROM shadow_predictions GROUP BY shadow, shadow_version ORDER BY shadow"
+            )
+            keys = ["shadow", "shadow_version", "records", "errors", "agreement", "mean_delta", "mean_abs_delta",
+                    "max_abs_delta", "mean_queue_ms", "mean_latency_ms", "max_latency_ms"]
+            return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class ShadowScorer:
+    def __init__(self, log, max_pending=SHADOW_MAX_PENDING, batch_size=SHADOW_BATCH_SIZE, max_wait_ms=SHADOW_MAX_WAIT_MS):
+        self.log = log
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.max_wait_ms = max_wait_ms
+        self.shadows = {} # name -> ServingModel (replaced, never mutated, so the dispatcher can iterate it)
+        self.load_errors = {}
+        self.pending = 0
+        self.counts = {"queued": 0, "shed": 0, "scored": 0, "failed": 0}
+        self.last_error = None # last batch lost by the dispatcher
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, name, serving):
+        self.shadows = {**self.shadows, name: serving}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="shadow-dispatcher", daemon=True)
+        self._thread.start()
+
+    # Hand records (dicts or validated pydantic records) & their primary probabilities to the shadows, without waiting
+    # Returns False if they were shed (no shadow model loaded, or too many records already waiting)
+    def submit(self, records, probs, primary_version, threshold):
+        if not self.shadows or not records:
+            return False
+        n_records = len(records)
+        with self._lock:
+            if self.pending + n_records > self.max_pending:
+                self.counts["shed"] += n_records
+                return False
+            self.pending += n_records
+            self.counts["queued"] += n_records
+        self._queue.put((records, probs, primary_version, threshold, time.perf_counter()))
+        return True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            # Requests arriving within max_wait_ms are scored together
+            batch, n_records = [item], len(item[0])
+            deadline = time.perf_counter() + self.max_wait_ms / 1000
+            while n_records < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                n_records += len(item[0])
+
+            # A batch lost by the dispatcher (e.g. the log could not be written) counts as failed for every shadow
+            try:
+                self._score_batch(batch)
+            except Exception as e:
+                with self._lock:
+                    self.counts["failed"] += n_records * max(len(self.shadows), 1)
+                self.last_error = str(e)
+                print(f"Shadow scoring failed: {e}")
+            with self._lock:
+                self.pending -= n_records
+        self.log.close() # the connection belongs to this thread
+
+    def _score_batch(self, batch):
+        # Validated records are dumped to dicts here, off the request path
+        records = [record.model_dump() if hasattr(record, "model_dump") else record for item in batch for record in item[0]]
+        primary_probs = np.concatenate([np.asarray(item[1], dtype=np.float64) for item in batch])
+        primary_versions = [item[2] for item in batch for _ in item[0]]
+        thresholds = np.concatenate([np.full(len(item[0]), item[3]) for item in batch])
+        started = time.perf_counter()
+        queue_ms = np.concatenate([np.full(len(item[0]), (started - item[4]) * 1e3) for item in batch])
+
+        rows, counts = [], {"scored": 0, "failed": 0}
+        for name, serving in self.shadows.items():
+            scoring_model = serving.pool or serving.model
+            for start in range(0, len(records), self.batch_size):
+                stop = min(start + self.batch_size, len(records))
+                call_start = time.perf_counter()
+                try:
+                    probs, error = scoring_model.predict_proba(records[start:stop])[:, 1], None
+                except Exception as e:
+                    probs, error = np.full(stop - start, np.nan), str(e)
+                latency_s = time.perf_counter() - call_start
+                SHADOW_SECONDS.labels(name).observe(latency_s)
+                counts["failed" if error else "scored"] += stop - start
+
+                primary = primary_probs[start:stop]
+                agree = (probs >= serving.threshold) == (primary >= thresholds[start:stop])
+                for idx in range(stop - start):
+                    is_scored = error is None
+                    rows.append((
+                        time.time(), name, serving.version, primary_versions[start + idx], float(primary[idx]),
+                        float(probs[idx]) if is_scored else None, float(probs[idx] - primary[idx]) if is_scored else None,
+                        int(agree[idx]) if is_scored else None, float(queue_ms[start + idx]), latency_s * 1e3, stop - start, error
+                    ))
+        self.log.write(rows)
+        # Counted once logged, so a batch failing on the way is counted once (see _run)
+        with self._lock:
+            for result, count in counts.items():
+                self.counts[result] += count
+
+    def describe(self):
+        return {
+            "models": {name: serving.describe() for name, serving in self.shadows.items()},
+            "load_errors": self.load_errors,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "counts": dict(self.counts),
+            "last_error": self.last_error,
+            "summary": self.log.summary(),
+        }
+
+    # Records still waiting are scored before the dispatcher stops
+    def stop(self, timeout=30):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+        for serving in self.shadows.values():
+            if serving.pool is not None:
+                serving.pool.shutdown()
+
+
+# Load the shadow models (in the background, while the API serves) & add them to the scorer once warm & checked
+def load_shadow_models(shadow_scorer, specs, n_workers=SHADOW_WORKERS, nice=SHADOW_NICE):
+    from model_manager import load_candidate
+    for spec in specs:
+        try:
+            serving = load_candidate(**parse_shadow_spec(spec), n_workers=n_workers, nice=nice)
+            shadow_scorer.add(spec, serving)
+            print(f"Shadow model {spec} loaded (version {serving.version}, threshold {serving.threshold})")
+        except Exception as e:
+            shadow_scorer.load_errors[spec] = str(e)
+            print(f"Shadow model {spec} could not be loaded: {e}")
@@ -0,0 +1,34 @@
+import os
+import sys
+import pickle
+import warnings
+import pytest
+from pathlib import Path
+
+# Tests run against the backend modules & the models they load (paths relative to src/backend, as when serving)
+# Run from the repository root or src/backend: python -m pytest src/backend/tests
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+os.chdir(BACKEND_DIR)
+warnings.filterwarnings(action="ignore", category=UserWarning)
+
+
+# Fitted ensemble as pickled (a fresh copy per test, as serving set-ups modify its pipelines)
+@pytest.fixture
+def ensemble_model():
+    with open(BACKEND_DIR / "models" / "ensemble_model.pkl", "rb") as f:
+        return pickle.load(f)
+
+
+# Serving examples as a frame (a fresh one per test, as copy-free pipelines modify their input)
+@pytest.fixture
+def serving_examples():
+    from model_registry import read_serving_examples
+    return read_serving_examples(BACKEND_DIR / "models" / "serving_input_example.json")
+
+
+# Valid API request bodies (synthetic InputRecords)
+@pytest.fixture
+def api_records():
+    from benchmarks.synthetic import generate_records
+    return generate_records(20, seed=0).to_dict(orient="records")
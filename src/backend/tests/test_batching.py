@@ -0,0 +1,57 @@
+import time
+import asyncio
+from batching import MicroBatcher
+
+
+class RecordingScorer:
+    def __init__(self, delay_s=0.0):
+        self.delay_s = delay_s
+        self.batches = []
+
+    def __call__(self, model, records):
+        self.batches.append(list(records))
+        time.sleep(self.delay_s)
+        return [record / 10 for record in records]
+
+
+def run_batcher(scorer, requests, max_wait_ms=200, max_batch_size=64):
+    async def run():
+        batcher = MicroBatcher(scorer, max_wait_ms=max_wait_ms, max_batch_size=max_batch_size)
+        batcher.start()
+        try:
+            return await requests(batcher)
+        finally:
+            await batcher.stop()
+    return asyncio.run(run())
+
+
+# A lone request under no load doesn't wait for the batching window
+def test_lone_request_dispatched_right_away():
+    scorer = RecordingScorer()
+
+    async def requests(batcher):
+        start = time.perf_counter()
+        prob = await batcher.submit(3)
+        return prob, time.perf_counter() - start
+
+    prob, elapsed = run_batcher(scorer, requests, max_wait_ms=1000)
+    assert prob == 0.3 and scorer.batches == [[3]]
+    assert elapsed < 0.5
+
+
+# Concurrent requests are still scored together, & requests arriving while a batch is scored wait for the window
+def test_concurrent_requests_coalesced():
+    scorer = RecordingScorer(delay_s=0.05)
+
+    async def requests(batcher):
+        first = await asyncio.gather(*[batcher.submit(record) for record in range(8)])
+        lone = asyncio.ensure_future(batcher.submit(100))
+        await asyncio.sleep(0.01)
+        late = await asyncio.gather(lone, *[batcher.submit(record) for record in range(101, 104)])
+        return first, late
+
+    first, late = run_batcher(scorer, requests, max_wait_ms=50)
+    assert first == [record / 10 for record in range(8)]
+    assert late == [record / 10 for record in range(100, 104)]
+    assert scorer.batches == [list(range(8)), [100], [101, 102, 103]]
+
@@ -0,0 +1,94 @@
+import pytest
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from xgboost import XGBClassifier
+from sklearn.linear_model import LogisticRegression
+
+from benchmarks.synthetic import generate_records
+from benchmarks.suite import (NUMERICAL_FEATURES, ENGINEERED_FEATURES, ONEHOT_FEATURES, SUPERVISED_FEATURES,
+                              ORDINAL_FEATURES, FEATURES_TO_DROP, synthetic_target)
+from benchmarks.chunked_fit import make_chunks, get_pipelines
+from data_preprocessing.compiler import compile_model, check_parity
+from data_preprocessing.transformers import DataCleaner, FeatureEngineer, CatEncoder, DtypeConverter
+from data_preprocessing.preprocessor import build_pipeline, fit_in_chunks, fit_preprocessing_in_chunks
+
+N_ROWS = 4000
+CHUNK_SIZE = 700
+
+
+@pytest.fixture(scope="module")
+def training_data():
+    X = generate_records(N_ROWS, seed=2)
+    rng = np.random.default_rng(3)
+    for feat in ["home_ownership", "purpose", "emp_length", "revol_util"]:
+        X.loc[rng.random(N_ROWS) < 0.05, feat] = np.nan
+    return X, synthetic_target(N_ROWS, seed=2)
+
+
+# Categories of a chunked fit in the same (sorted) order as a whole fit, whatever the order they are seen in
+def test_dtype_converter_chunked_fit(training_data):
+    X, y = training_data
+    X = X.iloc[::-1]
+    exact = DtypeConverter().fit(X)
+    for n_jobs in [1, 2]:
+        chunked = fit_in_chunks(DtypeConverter(), make_chunks(X, y, CHUNK_SIZE)(), n_jobs)
+        assert chunked.dtypes_.keys() == exact.dtypes_.keys()
+        for feat, dtype in exact.dtypes_.items():
+            assert list(chunked.dtypes_[feat].categories) == list(dtype.categories)
+
+
+# Target encodings of a chunked fit (kept in the encoder's own state) against the target encoder fitted on all the data:
+# categories seen, missing values (None or NaN) & unknown categories
+def test_target_encodings_chunked_fit(training_data):
+    X, y = training_data
+    X = FeatureEngineer().transform(DataCleaner().transform(X))
+    encoder = CatEncoder(ohe_features=ONEHOT_FEATURES, supervised_features=SUPERVISED_FEATURES)
+    exact = clone(encoder).fit(X, y)
+    chunked = fit_in_chunks(encoder, make_chunks(X, y, CHUNK_SIZE)(), n_jobs=2)
+    assert not hasattr(chunked, "sup_encoder_")
+
+    X_check = pd.concat([X, X.iloc[:3].assign(purpose=["unknown", None, np.nan], address="unknown")])
+    pd.testing.assert_frame_equal(chunked.transform(X_check), exact.transform(X_check), check_exact=False, rtol=1e-12)
+
+    # A whole fit after a chunked one encodes with the target encoder again
+    refitted = chunked.fit(X, y)
+    pd.testing.assert_frame_equal(refitted.transform(X_check), exact.transform(X_check))
+
+
+# A model trained on the chunked preprocessing compiles to a scorer with the same probabilities
+def test_compiled_chunked_fit(training_data):
+    X, y = training_data
+    pipeline = build_pipeline(NUMERICAL_FEATURES, ENGINEERED_FEATURES, ONEHOT_FEATURES + SUPERVISED_FEATURES + ORDINAL_FEATURES,
+                              supervised_features=SUPERVISED_FEATURES, onehot_features=ONEHOT_FEATURES,
+                              ordinal_features=ORDINAL_FEATURES, features_to_drop=FEATURES_TO_DROP)
+    pipeline.steps.append(("model", LogisticRegression(max_iter=1000)))
+    fit_preprocessing_in_chunks(pipeline, make_chunks(X, y, CHUNK_SIZE))
+    pipeline.steps[-1][1].fit(pipeline[:-1].transform(X.copy()), y)
+    ok, max_diff = check_parity(pipeline, compile_model(pipeline), X.iloc[:500])
+    assert ok, max_diff
+
+
+# The pipelines of build_pipeline, with their model appended as in training, fitted in chunks:
+# same output columns, same categorical dtypes & numerical values within the accuracy of the sketches
+@pytest.mark.parametrize("name", list(get_pipelines()))
+def test_preprocessing_chunked_fit(training_data, name):
+    X, y = training_data
+    pipeline = get_pipelines()[name]
+    exact = clone(pipeline)[:-1].fit(X.copy(), y)
+    chunked = fit_preprocessing_in_chunks(pipeline, make_chunks(X, y, CHUNK_SIZE))[:-1]
+
+    X_exact = exact.transform(X.copy())
+    X_chunked = chunked.transform(X.copy())
+    assert list(X_chunked.columns) == list(X_exact.columns)
+    pd.testing.assert_series_equal(X_chunked.dtypes, X_exact.dtypes)
+    categorical = [feat for feat in X_exact.columns if isinstance(X_exact[feat].dtype, pd.CategoricalDtype)]
+    for feat in categorical:
+        pd.testing.assert_series_equal(X_chunked[feat], X_exact[feat])
+    numerical = X_exact.columns.difference(categorical)
+    np.testing.assert_allclose(X_chunked[numerical].to_numpy(dtype=float), X_exact[numerical].to_numpy(dtype=float),
+                               rtol=0.01, atol=0.01)
+
+    # The model trains on the output of the chunked preprocessing
+    model = pipeline.steps[-1][1].fit(X_chunked, y)
+    assert isinstance(model, (LogisticRegression, XGBClassifier))
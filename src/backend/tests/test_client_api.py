@@ -0,0 +1,111 @@
+import sys
+import asyncio
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from pathlib import Path
+from main import app, lifespan
+
+# The client ships with the frontend (appended to the path: the frontend has a main.py too)
+sys.path.append(str(Path(__file__).resolve().parents[2] / "frontend"))
+from loantap_client import LoanTapClient, AsyncLoanTapClient, LoanTapError
+
+BASE_URL = "http://testserver/api/v1"
+
+
+# Transport failing the first calls ("connect" or a status code) before passing the others to the app
+class FlakyTransport(httpx.BaseTransport):
+    def __init__(self, transport, failures):
+        self.transport = transport
+        self.failures = list(failures)
+        self.calls = 0
+
+    def handle_request(self, request):
+        self.calls += 1
+        if self.failures:
+            failure = self.failures.pop(0)
+            if failure == "connect":
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(failure, json={"detail": "unavailable"}, request=request)
+        return self.transport.handle_request(request)
+
+
+class AsyncFlakyTransport(FlakyTransport, httpx.AsyncBaseTransport):
+    async def handle_async_request(self, request):
+        self.calls += 1
+        if self.failures:
+            failure = self.failures.pop(0)
+            if failure == "connect":
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(failure, json={"detail": "unavailable"}, request=request)
+        return await self.transport.handle_async_request(request)
+
+
+@pytest.fixture
+def app_client():
+    with TestClient(app, base_url=BASE_URL) as client:
+        yield client
+
+
+# Records with a few invalid ones, rejected by the API with their errors in place
+@pytest.fixture
+def batch_records(api_records):
+    records = [dict(record) for record in api_records]
+    for idx in [0, 7, 13]:
+        records[idx]["int_rate"] = 150.0
+    return records
+
+
+def check_results(results, records, expected):
+    assert [result["index"] for result in results] == list(range(len(records)))
+    for result, expected_result in zip(results, expected):
+        if "errors" in expected_result:
+            assert result == expected_result
+        else: # batches of other sizes, same probabilities up to rounding
+            assert result["prediction"] == expected_result["prediction"]
+            assert result["probability"] == pytest.approx(expected_result["probability"], rel=1e-12)
+    assert [idx for idx, result in enumerate(results) if "errors" in result] == [0, 7, 13]
+
+
+def test_client_against_app(app_client, batch_records):
+    expected = app_client.post("/predict_batch", json=batch_records).json()["results"]
+    with LoanTapClient(BASE_URL, transport=app_client._transport, batch_size=6, max_concurrency=2, backoff_s=0) as client:
+        assert client.is_ready()
+        assert client.predict(batch_records[1]) == app_client.post("/predict", json=batch_records[1]).json()
+        check_results(client.predict_batch(batch_records), batch_records, expected)
+
+        with pytest.raises(LoanTapError) as error:
+            client.predict(batch_records[0])
+        assert error.value.status_code == 422 and error.value.detail[0]["loc"] == ["body", "int_rate"]
+
+
+def test_client_retries_against_app(app_client, api_records):
+    transport = FlakyTransport(app_client._transport, ["connect", 503])
+    with LoanTapClient(BASE_URL, transport=transport, retries=2, backoff_s=0) as client:
+        assert client.predict(api_records[0]) == app_client.post("/predict", json=api_records[0]).json()
+    assert transport.calls == 3
+
+    transport = FlakyTransport(app_client._transport, [503] * 2)
+    with LoanTapClient(BASE_URL, transport=transport, retries=1, backoff_s=0) as client, pytest.raises(LoanTapError) as error:
+        client.predict(api_records[0])
+    assert transport.calls == 2 and error.value.status_code == 503
+
+
+# The async client against the app served on its own event loop (lifespan run as by the server)
+def test_async_client_against_app(batch_records):
+    async def run():
+        async with lifespan(app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=BASE_URL) as app_client:
+                label = (await app_client.post("/predict", json=batch_records[1])).json()
+                expected = (await app_client.post("/predict_batch", json=batch_records)).json()["results"]
+            transport = AsyncFlakyTransport(httpx.ASGITransport(app=app), ["connect", 429])
+            async with AsyncLoanTapClient(BASE_URL, transport=transport, batch_size=6, max_concurrency=2,
+                                          retries=2, backoff_s=0) as client:
+                prediction = await client.predict(batch_records[1])
+                results = await client.predict_batch(batch_records)
+        return label, expected, prediction, results, transport.calls
+
+    label, expected, prediction, results, calls = asyncio.run(run())
+    assert prediction == label
+    check_results(results, batch_records, expected)
+    assert calls == 3 + 4 # 2 failures & the /predict call, then the 4 batches
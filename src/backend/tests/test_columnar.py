@@ -0,0 +1,157 @@
+import io
+import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fastapi.testclient import TestClient
+from benchmarks.synthetic import generate_records
+from columnar import ARROW_STREAM_TYPE, ARROW_FILE_TYPE, PARQUET_TYPES, validate_table, to_columns, build_response
+from routers.predict import INPUT_DOMAINS
+
+# Whitespace stripped by str.strip() (the JSON path) other than a newline, which the pincode pattern doesn't skip
+SPACES = [" ", "\t", "\v", "\x1c", "\x85", "\xa0", "\u2003", "\u3000"]
+
+
+@pytest.fixture(scope="module")
+def app_client():
+    from main import app
+    with TestClient(app) as client:
+        yield client
+
+
+# Records of every kind of invalid value & of the values the two paths normalize differently, with the rows
+# (& fields) expected to be rejected
+@pytest.fixture
+def edge_records():
+    records = generate_records(60, seed=5).to_dict(orient="records")
+    invalid = {
+        0: {"sub_grade": "Z9"}, # literal
+        1: {"term": "36 months "}, # literals are compared as sent
+        2: {"int_rate": 150.0}, # lt
+        3: {"loan_amnt": 0.0, "dti": -1.0}, # gt, on two fields
+        4: {"int_rate": np.nan}, # NaN fails both bounds, reported once
+        5: {"revol_util": np.inf},
+        6: {"dti": -np.inf},
+        7: {"annual_inc": None}, # null number
+        8: {"purpose": None}, # null string
+        9: {"grade": None}, # null literal
+    }
+    for row, values in invalid.items():
+        records[row].update(values)
+
+    # Valid rows: addresses with their pincode after a whitespace, a newline or nothing, trailing whitespace,
+    # short addresses & no pincode
+    addresses = [f"1 Main St{space}Town, XX{space}70466" for space in SPACES] + [f"1 Main St{space}Town, XX 70466{space}" for space in SPACES]
+    addresses += ["1 Main St\n70466", "Town70466", "70466", " 70466", "x70466  ", " 70466", "no pincode", ""]
+    for row, address in enumerate(addresses, start=20):
+        records[row]["address"] = address
+    return records, invalid
+
+
+def json_body(records):
+    return json.dumps(records).encode() # NaN & infinite values as NaN, Infinity & -Infinity
+
+
+def columnar_bodies(table):
+    stream, file = pa.BufferOutputStream(), pa.BufferOutputStream()
+    with pa.ipc.new_stream(stream, table.schema) as writer:
+        writer.write_table(table)
+    with pa.ipc.new_file(file, table.schema) as writer:
+        writer.write_table(table)
+    parquet = io.BytesIO()
+    pq.write_table(table, parquet)
+    return {ARROW_STREAM_TYPE: stream.getvalue().to_pybytes(), ARROW_FILE_TYPE: file.getvalue().to_pybytes(),
+            PARQUET_TYPES[0]: parquet.getvalue()}
+
+
+# String columns dictionary-encoded (as pandas categoricals are written), numbers too
+def dictionary_table(records):
+    table = pa.Table.from_pylist(records)
+    for name in ["sub_grade", "purpose", "address", "issue_d", "int_rate"]:
+        idx = table.column_names.index(name)
+        table = table.set_column(idx, name, table.column(name).dictionary_encode())
+    return table
+
+
+def read_response(content):
+    return pa.ipc.open_stream(pa.BufferReader(content)).read_all().to_pylist()
+
+
+def format_errors(errors):
+    return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in errors)
+
+
+# Same rows rejected with the same errors, & the same probabilities & predictions for the others, whatever the body
+@pytest.mark.parametrize("make_table", [pa.Table.from_pylist, dictionary_table])
+def test_arrow_matches_batch(app_client, edge_records, make_table):
+    records, invalid = edge_records
+    expected = app_client.post("/predict_batch", content=json_body(records)).json()["results"]
+    assert [result["index"] for result in expected if "errors" in result] == sorted(invalid)
+
+    for content_type, body in columnar_bodies(make_table(records)).items():
+        response = app_client.post("/predict_arrow", content=body, headers={"content-type": content_type})
+        assert response.status_code == 200 and response.headers["content-type"] == ARROW_STREAM_TYPE
+        rows = read_response(response.content)
+        assert [row["row"] for row in rows] == list(range(len(records)))
+        for row, result in zip(rows, expected):
+            if "errors" in result:
+                assert row["probability"] is None and row["prediction"] is None
+                assert row["error"] == format_errors(result["errors"]), (content_type, row["row"])
+            else:
+                assert row["error"] is None
+                assert row["prediction"] == result["prediction"], (content_type, row["row"])
+                assert row["probability"] == pytest.approx(result["probability"], rel=1e-12), (content_type, row["row"])
+
+
+# Errors of every failed constraint, in the pydantic wording, per field
+def test_validate_table_errors(edge_records):
+    records, invalid = edge_records
+    valid_table, valid_rows, errors = validate_table(pa.Table.from_pylist(records), INPUT_DOMAINS)
+    assert sorted(errors) == sorted(invalid)
+    assert valid_table.num_rows == len(records) - len(invalid) and 0 not in valid_rows
+    assert errors[0] == [{"type": "literal_error", "loc": ["sub_grade"], "msg": "Input should be 'A1', 'A2', 'A3', 'A4', 'A5', "
+                          "'B1', 'B2', 'B3', 'B4', 'B5', 'C1', 'C2', 'C3', 'C4', 'C5', 'D1', 'D2', 'D3', 'D4', 'D5', 'E1', 'E2', "
+                          "'E3', 'E4', 'E5', 'F1', 'F2', 'F3', 'F4', 'F5', 'G1', 'G2', 'G3', 'G4' or 'G5'"}]
+    assert errors[1] == [{"type": "literal_error", "loc": ["term"], "msg": "Input should be '36 months' or '60 months'"}]
+    assert errors[2] == [{"type": "less_than", "loc": ["int_rate"], "msg": "Input should be less than 101"}]
+    assert errors[3] == [{"type": "greater_than", "loc": ["loan_amnt"], "msg": "Input should be greater than 0"},
+                         {"type": "greater_than", "loc": ["dti"], "msg": "Input should be greater than -1"}]
+    assert [error["type"] for error in errors[4]] == ["less_than"]
+    assert [error["type"] for error in errors[5]] == ["less_than"]
+    assert [error["type"] for error in errors[6]] == ["greater_than"]
+    assert errors[7] == [{"type": "float_type", "loc": ["annual_inc"], "msg": "Input should be a valid number"}]
+    assert errors[8] == [{"type": "string_type", "loc": ["purpose"], "msg": "Input should be a valid string"}]
+    assert errors[9] == [{"type": "literal_error", "loc": ["grade"], "msg": "Input should be 'A', 'B', 'C', 'D', 'E', 'F' or 'G'"}]
+
+    with pytest.raises(ValueError, match="Missing columns: address"):
+        validate_table(pa.Table.from_pylist(records).drop_columns(["address"]), INPUT_DOMAINS)
+    with pytest.raises(ValueError, match="Column int_rate should be numeric"):
+        validate_table(pa.Table.from_pylist([{**record, "int_rate": "high"} for record in records]), INPUT_DOMAINS)
+
+
+# Addresses cut to the 6 characters ending with the pincode, after the whitespace str.strip() removes, with a leading
+# whitespace (but a newline) marked by "_" so that the scorer's strip keeps it
+def test_to_columns_addresses():
+    addresses = [f"1 Main St{space}70466" for space in SPACES] + [f"1 Main St 70466{space}" for space in SPACES]
+    addresses += ["1 Main St\n70466", "70466", " 70466", "\u200370466", None]
+    table = pa.table({name: [1.0] * len(addresses) if domain[0] == "number" else ["x"] * len(addresses)
+                      for name, domain in INPUT_DOMAINS.items() if name != "address"} | {"address": addresses})
+    columns = to_columns(table, INPUT_DOMAINS)
+
+    cut = list(np.asarray(columns["address"]))
+    assert cut == ["_70466"] * 2 * len(SPACES) + ["\n70466", "70466", "70466", "70466", None]
+    assert len(columns["address"].values) == 3 # dictionary encoded: _70466, \n70466 & 70466
+    assert columns["int_rate"].dtype == np.float64
+
+
+# Arrow stream of the results: rows in input order, errors joined per row & missing probabilities for rejected rows
+def test_build_response():
+    errors = {1: [{"type": "less_than", "loc": ["int_rate"], "msg": "Input should be less than 101"},
+                  {"type": "prediction_error", "loc": [], "msg": "failed"}]}
+    rows = read_response(build_response(3, np.array([0, 2]), np.array([0.7, 0.2]), errors, threshold=0.6))
+    assert rows == [
+        {"row": 0, "probability": 0.7, "prediction": "Defaulter", "error": None},
+        {"row": 1, "probability": None, "prediction": None, "error": "int_rate: Input should be less than 101; record: failed"},
+        {"row": 2, "probability": 0.2, "prediction": "Not a defaulter", "error": None},
+    ]
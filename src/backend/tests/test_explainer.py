@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import model_loader
+import model_manager
+from fastapi.testclient import TestClient
+from data_preprocessing.explainer import build_explainer
+from data_preprocessing.preprocessor import build_shared_ensemble
+from data_preprocessing.xgb_native import use_native_xgboost
+
+
+# Contributions of a record add up to its probability minus the baseline
+def check_explanation(explainer, examples, expected):
+    probs, baselines, contributions = explainer.explain(examples.to_dict(orient="records"))
+    np.testing.assert_allclose(probs, expected, atol=1e-6)
+    np.testing.assert_allclose(contributions.sum(axis=1), probs - baselines, atol=1e-9)
+
+
+def test_explainer_of_fitted_ensemble(ensemble_model, serving_examples):
+    expected = ensemble_model.predict_proba(serving_examples.copy())[:, 1]
+    check_explanation(build_explainer(ensemble_model), serving_examples, expected)
+
+
+# Models whose XGBoost branch predicts with the native adapter are compiled & explained through its booster
+def test_explainer_of_native_adapters(ensemble_model, serving_examples):
+    expected = ensemble_model.predict_proba(serving_examples.copy())[:, 1]
+    model = use_native_xgboost(build_shared_ensemble(ensemble_model))
+    check_explanation(build_explainer(model), serving_examples, expected)
+
+
+# App serving the pickled ensemble through its pipelines (fast path & compiled artifact disabled)
+@pytest.fixture
+def pipeline_client(monkeypatch):
+    for module in (model_loader, model_manager):
+        monkeypatch.setattr(module, "FAST_PATH_SCORER", False)
+    from main import app
+    with TestClient(app) as client:
+        assert app.state.model_source == "pickle"
+        yield client
+
+
+def test_explain_without_fast_path(pipeline_client, api_records):
+    response = pipeline_client.post("/predict?explain=true&top_k=2", json=api_records[0])
+    assert response.status_code == 200
+    assert len(response.json()["reasons"]) <= 2
+
+    response = pipeline_client.post("/predict_batch?explain=true", json=api_records)
+    assert response.status_code == 200
+    explained = response.json()["results"]
+    plain = pipeline_client.post("/predict_batch", json=api_records).json()["results"]
+    assert [result["prediction"] for result in explained] == [result["prediction"] for result in plain]
+    np.testing.assert_allclose([result["probability"] for result in explained],
+                               [result["probability"] for result in plain], atol=1e-6)
+    assert all("reasons" in result for result in explained)
@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import generate_records
+from model_registry import RAW_INPUT_MODEL_IDS, load_logged_model, load_serving_examples
+from data_preprocessing.compiler import compile_model, check_parity
+
+
+# Every raw-input model logged under mlflow_tracking compiles to a scorer matching it on its serving examples
+@pytest.mark.parametrize("model_id", RAW_INPUT_MODEL_IDS)
+def test_logged_model_parity(model_id):
+    model = load_logged_model(model_id)
+    ok, max_diff = check_parity(model, compile_model(model), load_serving_examples(model_id))
+    assert ok, max_diff
+
+
+# Records the serving examples don't cover: missing & unknown categories, merged categories & padded values
+@pytest.fixture
+def edge_records():
+    X = generate_records(300, seed=4)
+    rng = np.random.default_rng(4)
+    for feat in ["home_ownership", "purpose", "verification_status"]:
+        X.loc[rng.random(len(X)) < 0.1, feat] = np.nan
+    X.loc[::11, "purpose"] = "time_travel"
+    X.loc[::13, "home_ownership"] = "ANY"
+    X.loc[::17, "grade"] = "Z" # dropped by the logistic regression, missing for XGBoost
+    X.loc[::19, "term"] = " 60 months"
+    X.loc[::23, "address"] = "no pincode here"
+    return X
+
+
+def test_ensemble_parity_edge_cases(ensemble_model, edge_records):
+    ok, max_diff = check_parity(ensemble_model, compile_model(ensemble_model), edge_records)
+    assert ok, max_diff
+
+
+# Missing values the logistic regression can't take are rejected by the scorer as by the pipelines
+@pytest.mark.parametrize("feat, value", [("revol_util", np.nan), ("emp_length", "forever"), ("earliest_cr_line", None)])
+def test_rejected_values(ensemble_model, edge_records, feat, value):
+    X = edge_records.iloc[:5].copy()
+    X.loc[X.index[2], feat] = value
+    with pytest.raises(ValueError):
+        ensemble_model.predict_proba(X.copy())
+    with pytest.raises(ValueError):
+        compile_model(ensemble_model).predict_proba(X)
+
+
+# Same probabilities for every input form: a record dict, a list of records, a columnar dict & a dataframe
+def test_input_forms(ensemble_model, edge_records):
+    scorer = compile_model(ensemble_model)
+    X = edge_records.iloc[:20]
+    records = X.to_dict(orient="records")
+    expected = scorer.predict_proba(X)
+    np.testing.assert_array_equal(scorer.predict_proba(records), expected)
+    np.testing.assert_array_equal(scorer.predict_proba(X.to_dict(orient="list")), expected)
+    np.testing.assert_allclose(scorer.predict_proba(records[3]), expected[3:4], rtol=1e-12) # single-record dot products
+    np.testing.assert_array_equal(scorer.predict(X), scorer.classes_[(expected[:, 1] >= 0.5).astype(int)])
+    assert isinstance(X, pd.DataFrame) and expected.shape == (20, 2)
@@ -0,0 +1,53 @@
+import cloudpickle
+import numpy as np
+import pytest
+import model_loader
+from config import MODEL_ARTIFACT_DIR
+from instrumentation import InstrumentedModel, STAGE_SECONDS, MODEL_SECONDS
+from data_preprocessing.artifact import load_artifact
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    monkeypatch.setattr(model_loader, "PROFILE_STAGES", True)
+
+
+def stage_counts():
+    return {labels: child.snapshot()["count"] for labels, child in STAGE_SECONDS._children.items()}
+
+
+# Scoring models (compiled scorer & pipelines) wrapped with their stage metrics: same probabilities, every stage
+# recorded & the fitted model left untouched (still picklable, as sent to late worker pools)
+@pytest.mark.parametrize("load", ["artifact", "pickle"])
+def test_instrumented_model(profiling, monkeypatch, ensemble_model, serving_examples, load):
+    monkeypatch.setattr(model_loader, "XGB_NATIVE_PREDICT", False)
+    monkeypatch.setattr(model_loader, "FAST_PATH_SCORER", False)
+    fitted_model = load_artifact(MODEL_ARTIFACT_DIR) if load == "artifact" else model_loader.set_serving_mode(ensemble_model)
+    model = fitted_model if load == "artifact" else model_loader.prepare_model(fitted_model)
+    attributes = set(vars(model))
+    expected = model.predict_proba(serving_examples.copy())
+
+    instrumented = model_loader.instrument_serving_model(model)
+    assert isinstance(instrumented, InstrumentedModel) and instrumented.model is model
+    before, model_calls = stage_counts(), MODEL_SECONDS.labels("ensemble").snapshot()["count"]
+    np.testing.assert_allclose(instrumented.predict_proba(serving_examples.copy()), expected, rtol=1e-12)
+    np.testing.assert_array_equal(instrumented.classes_, model.classes_)
+
+    recorded = {labels for labels, count in stage_counts().items() if count > before.get(labels, 0)}
+    if load == "artifact":
+        assert recorded == {("ensemble", "decode"), ("lr_pipeline", "features"), ("lr_pipeline", "estimator"),
+                            ("xgb_pipeline", "features"), ("xgb_pipeline", "estimator")}
+    else:
+        assert {("lr_pipeline", "data_cleaner"), ("lr_pipeline", "model"), ("xgb_pipeline", "cat_encoder"),
+                ("xgb_pipeline", "model")} <= recorded
+    assert MODEL_SECONDS.labels("ensemble").snapshot()["count"] == model_calls + 1
+
+    assert set(vars(model)) == attributes
+    assert all(not callable(value) or isinstance(value, type) for value in vars(model).values())
+    cloudpickle.loads(cloudpickle.dumps(fitted_model))
+
+
+def test_profiling_off_by_default(ensemble_model):
+    scorer = load_artifact(MODEL_ARTIFACT_DIR)
+    assert not model_loader.PROFILE_STAGES
+    assert model_loader.instrument_serving_model(scorer) is scorer
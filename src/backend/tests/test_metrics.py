@@ -0,0 +1,31 @@
+import re
+from metrics import MetricFamily, CallbackMetric, Counter, format_sample
+
+# Label value of the text format: any character but a backslash, a double quote or a line feed, or an escape sequence
+LABEL_VALUE = r'(?:[^"\\\n]|\\[\\"n])*'
+SAMPLE_LINE = re.compile(rf'^\w+\{{(\w+="{LABEL_VALUE}")(,\w+="{LABEL_VALUE}")*\}} \S+$')
+
+
+def unescape(value):
+    return re.sub(r'\\([\\"n])', lambda match: {"n": "\n"}.get(match.group(1), match.group(1)), value)
+
+
+# Label values are escaped (backslashes, double quotes & line feeds), so every sample stays one parseable line
+def test_label_values_escaped():
+    values = ['C:\\models\\m.pkl', 'say "hi"', "two\nlines", 'all \\ " \n \\n']
+    for value in values:
+        line = format_sample("loantap_test_total", ["shadow", "result"], (value, "ok"), 1)
+        assert "\n" not in line and SAMPLE_LINE.match(line), line
+        assert unescape(re.match(rf'\w+{{shadow="({LABEL_VALUE})"', line).group(1)) == value
+    assert format_sample("loantap_test_total", ["shadow"], ("plain",), 2) == 'loantap_test_total{shadow="plain"} 2'
+
+
+def test_rendered_metrics_escaped():
+    family = MetricFamily("loantap_test_total", "Calls\nper \\ shadow", "counter", ["shadow"], Counter)
+    family.labels('models\\"new"\n').inc()
+    help_line, type_line, sample = family.render()
+    assert help_line == "# HELP loantap_test_total Calls\\nper \\\\ shadow"
+    assert sample == 'loantap_test_total{shadow="models\\\\\\"new\\"\\n"} 1'
+
+    callback = CallbackMetric("loantap_test_pending", "Pending", "gauge", ["shadow"], lambda: {('a"b',): 3})
+    assert callback.render()[-1] == 'loantap_test_pending{shadow="a\\"b"} 3'
@@ -0,0 +1,91 @@
+import asyncio
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from batching import MicroBatcher
+import model_loader
+from model_loader import read_serving_records
+from model_manager import ServingModel, ModelManager, load_startup_model
+
+
+# Model predicting a constant probability, swapping another model in while it scores (as a concurrent hot swap would)
+class SwappingModel:
+    def __init__(self, prob, swap=None):
+        self.prob = prob
+        self.swap = swap
+
+    def predict_proba(self, records):
+        if self.swap is not None:
+            self.swap()
+        return np.column_stack([np.full(len(records), 1 - self.prob), np.full(len(records), self.prob)])
+
+
+@pytest.fixture
+def app_client():
+    from main import app
+    with TestClient(app) as client:
+        yield app, client
+
+
+# The request scored with model A (probability 0.5, threshold 0.3) while B (threshold 0.9) is swapped in is labelled
+# & cached by A
+@pytest.mark.parametrize("micro_batching", [True, False])
+def test_request_served_by_one_model(app_client, api_records, micro_batching):
+    app, client = app_client
+    manager = app.state.model_manager
+    model_b = ServingModel(SwappingModel(0.1), "version-b", "test", "b", threshold=0.9)
+    model_a = ServingModel(SwappingModel(0.5, swap=lambda: manager.activate(model_b)), "version-a", "test", "a", threshold=0.3)
+    batcher = app.state.batcher
+    if not micro_batching:
+        app.state.batcher = None
+
+    manager.activate(model_a)
+    assert client.post("/predict", json=api_records[0]).json() == "Defaulter"
+    assert manager.active is model_b
+    assert client.post("/predict", json=api_records[1]).json() == "Not a defaulter"
+
+    manager.activate(model_a)
+    results = client.post("/predict_batch", json=api_records[:3]).json()["results"]
+    assert [(result["probability"], result["prediction"]) for result in results] == [(0.5, "Defaulter")] * 3
+    app.state.batcher = batcher
+
+
+def test_batch_scored_per_model():
+    calls = []
+
+    def score(model, records):
+        calls.append((model, len(records)))
+        return [model] * len(records)
+
+    async def run():
+        batcher = MicroBatcher(score, max_wait_ms=50, max_batch_size=8)
+        batcher.start()
+        probs = await asyncio.gather(*[batcher.submit(idx, model=idx % 2) for idx in range(6)])
+        await batcher.stop()
+        return probs
+
+    assert asyncio.run(run()) == [0, 1, 0, 1, 0, 1]
+    assert sum(n_records for _, n_records in calls) == 6 and {model for model, _ in calls} == {0, 1}
+
+
+# Rollback to a profiled model whose worker pool was already shut down: the pool is restarted from the fitted model
+# (pickled for the late workers) & scores as the model served in process
+def test_rollback_after_pool_retired(monkeypatch):
+    monkeypatch.setattr(model_loader, "PROFILE_STAGES", True)
+    manager = ModelManager(SimpleNamespace(state=SimpleNamespace()), n_workers=1, swap_grace_s=0)
+    serving = load_startup_model(n_workers=1)
+    records = read_serving_records()
+    try:
+        expected = serving.model.predict_proba(records)
+        manager.activate(serving)
+        manager.activate(ServingModel(SwappingModel(0.1), "version-b", "test", "b", threshold=0.9))
+        manager.shutdown_pool(serving, retiring=True)
+        assert serving.pool is None and manager.previous is serving
+
+        manager.activate(manager.restore(serving))
+        assert serving.pool is not None and "pool_s" in serving.timings["rollback"]
+        np.testing.assert_allclose(serving.pool.warm_up(records)[0], expected, rtol=1e-12)
+        assert manager.app.state.pool is serving.pool
+    finally:
+        manager.shutdown()
@@ -0,0 +1,88 @@
+import sys
+import pytest
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import score_file
+from benchmarks.synthetic import generate_records
+
+N_ROWS = 3000
+
+
+# Input file of synthetic records (Parquet with row groups of 700 rows, so start rows fall inside groups & batches)
+@pytest.fixture(scope="module")
+def input_files(tmp_path_factory):
+    records = generate_records(N_ROWS, seed=1)
+    records.loc[::250, "issue_d"] = "garbage" # rows scored with an error
+    input_dir = tmp_path_factory.mktemp("inputs")
+    pq.write_table(pa.Table.from_pandas(records, preserve_index=False), input_dir / "records.parquet", row_group_size=700)
+    records.to_csv(input_dir / "records.csv", index=False)
+    return records, input_dir
+
+
+def run_scoring(monkeypatch, input_path, output_path, *options):
+    monkeypatch.setattr(sys, "argv", ["score_file.py", str(input_path), str(output_path), "--workers", "0", "--chunk-size", "256", *options])
+    score_file.main()
+    return pd.read_csv(output_path, keep_default_na=False)
+
+
+# Same rows, labels & errors, & the same probabilities (up to the rounding of differently sized batches)
+def check_same_output(output, expected):
+    expected = expected.reset_index(drop=True)
+    pd.testing.assert_frame_equal(output.drop(columns="probability"), expected.drop(columns="probability"))
+    probs, expected_probs = [pd.to_numeric(df["probability"].replace("", np.nan)) for df in (output, expected)]
+    np.testing.assert_allclose(probs, expected_probs, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".csv"])
+@pytest.mark.parametrize("start_row", [0, 256, 1000, 2999])
+def test_iter_chunks_from_start_row(input_files, suffix, start_row):
+    records, input_dir = input_files
+    chunks = list(score_file.iter_chunks(input_dir / f"records{suffix}", 256, start_row))
+    rows = np.concatenate([np.arange(row, row + len(chunk)) for row, chunk in chunks])
+    np.testing.assert_array_equal(rows, np.arange(start_row, N_ROWS))
+    scored = pd.concat([chunk for _, chunk in chunks], ignore_index=True)
+    pd.testing.assert_series_equal(scored["address"], records["address"].iloc[start_row:].reset_index(drop=True))
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".csv"])
+def test_start_row_matches_full_run(monkeypatch, tmp_path, input_files, suffix):
+    _, input_dir = input_files
+    full = run_scoring(monkeypatch, input_dir / f"records{suffix}", tmp_path / "full.csv")
+    partial = run_scoring(monkeypatch, input_dir / f"records{suffix}", tmp_path / "partial.csv", "--start-row", "1000")
+    assert len(full) == N_ROWS and (full["error"] != "").sum() == N_ROWS // 250
+    check_same_output(partial, full.iloc[1000:])
+
+
+# Output of an interrupted run: the first rows of a full output, then a partially written line
+def interrupt_output(full_path, path, n_rows, partial=b"1234,0.5,Not a def"):
+    lines = full_path.read_bytes().splitlines(keepends=True)
+    path.write_bytes(b"".join(lines[:n_rows + 1]) + partial)
+
+
+@pytest.mark.parametrize("n_rows", [0, 1, 700, 1999])
+def test_resume_after_interruption(monkeypatch, tmp_path, input_files, n_rows):
+    _, input_dir = input_files
+    full = run_scoring(monkeypatch, input_dir / "records.parquet", tmp_path / "full.csv", "--start-row", "1000")
+    interrupt_output(tmp_path / "full.csv", tmp_path / "resumed.csv", n_rows)
+
+    # Resumed from the last complete row, whatever the start row of the interrupted run & its row errors
+    # (with nothing scored yet, the run restarts from the start row it is given)
+    options = ["--resume"] + (["--start-row", "1000"] if n_rows == 0 else [])
+    resumed = run_scoring(monkeypatch, input_dir / "records.parquet", tmp_path / "resumed.csv", *options)
+    check_same_output(resumed, full)
+
+
+def test_resume_row_of_empty_output(tmp_path):
+    output_path = tmp_path / "output.csv"
+    output_path.write_bytes(b"row,probabil")
+    assert score_file.get_resume_row(output_path, 1000) == 1000
+    assert output_path.read_bytes() == b""
+
+
+# Multi-line error messages are written on the line of their row
+def test_output_rows_are_single_lines():
+    output = score_file.build_output(10, np.array([0.2, np.nan]), {1: "2 validation errors\n  issue_d\n  bad"}, 0.5)
+    assert output["error"].tolist() == ["", "2 validation errors issue_d bad"]
+    assert len(output.to_csv(index=False).splitlines()) == 3
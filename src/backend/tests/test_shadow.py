@@ -0,0 +1,120 @@
+import time
+import sqlite3
+import numpy as np
+from types import SimpleNamespace
+from contextlib import closing
+from shadow import ShadowScorer, ShadowLog, LOG_COLUMNS
+
+
+class ConstantModel:
+    def __init__(self, prob):
+        self.prob = prob
+
+    def predict_proba(self, records):
+        return np.column_stack([np.full(len(records), 1 - self.prob), np.full(len(records), self.prob)])
+
+
+class FailingModel:
+    def predict_proba(self, records):
+        raise RuntimeError("shadow model failed")
+
+
+# Log whose first writes fail, as a full disk or a locked database would
+class FailingLog(ShadowLog):
+    def __init__(self, path, failures):
+        super().__init__(path)
+        self.failures = failures
+
+    def write(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        super().write(rows)
+
+
+def make_serving(model, version="2", threshold=0.5):
+    return SimpleNamespace(model=model, pool=None, version=version, threshold=threshold, describe=lambda: {"version": version})
+
+
+def read_log(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return [dict(zip(LOG_COLUMNS, row)) for row in conn.execute("SELECT * FROM shadow_predictions ORDER BY rowid")]
+
+
+# Beyond max_pending records waiting for the shadows, new records are shed & counted, never queued
+def test_shedding_past_max_pending(tmp_path):
+    shadow = ShadowScorer(ShadowLog(tmp_path / "log.sqlite"), max_pending=5, max_wait_ms=10)
+    assert not shadow.submit([{"a": 1}], [0.1], "1", 0.5) # no shadow model loaded
+    shadow.add("challenger", make_serving(ConstantModel(0.7)))
+
+    # The dispatcher isn't started, so the submitted records stay pending
+    assert shadow.submit([{"a": 1}] * 3, [0.1] * 3, "1", 0.5)
+    assert not shadow.submit([{"a": 1}] * 3, [0.1] * 3, "1", 0.5)
+    assert shadow.submit([{"a": 1}] * 2, [0.1] * 2, "1", 0.5)
+    assert not shadow.submit([{"a": 1}], [0.1], "1", 0.5)
+    assert shadow.pending == 5
+    assert shadow.counts == {"queued": 5, "shed": 4, "scored": 0, "failed": 0}
+
+    shadow.start()
+    shadow.stop()
+    assert shadow.pending == 0
+    assert shadow.counts == {"queued": 5, "shed": 4, "scored": 5, "failed": 0}
+    assert len(read_log(tmp_path / "log.sqlite")) == 5
+
+
+# One row per record & shadow model, with the deltas & agreement against the primary prediction
+def test_log_rows(tmp_path):
+    shadow = ShadowScorer(ShadowLog(tmp_path / "log.sqlite"), batch_size=2, max_wait_ms=10)
+    shadow.add("challenger", make_serving(ConstantModel(0.6), version="7", threshold=0.5))
+    shadow.submit([{"a": 1}, {"a": 2}, {"a": 3}], [0.2, 0.9, 0.55], "3", 0.5)
+    shadow.start()
+    shadow.stop()
+
+    rows = read_log(tmp_path / "log.sqlite")
+    assert [row["primary_probability"] for row in rows] == [0.2, 0.9, 0.55]
+    assert all(row["shadow"] == "challenger" and row["shadow_version"] == "7" and row["primary_version"] == "3" for row in rows)
+    assert all(row["shadow_probability"] == 0.6 and row["error"] is None for row in rows)
+    np.testing.assert_allclose([row["delta"] for row in rows], [0.4, -0.3, 0.05])
+    assert [row["agree"] for row in rows] == [0, 1, 1]
+    assert [row["batch_size"] for row in rows] == [2, 2, 1] # records scored in calls of batch_size
+    assert all(row["queue_ms"] >= 0 and row["latency_ms"] >= 0 for row in rows)
+
+    summary, = shadow.describe()["summary"]
+    assert summary["records"] == 3 and summary["errors"] == 0
+    assert np.isclose(summary["agreement"], 2 / 3)
+
+
+# A failing shadow model is logged with its error & counted, without affecting the other shadows
+def test_failing_shadow(tmp_path):
+    shadow = ShadowScorer(ShadowLog(tmp_path / "log.sqlite"), max_wait_ms=10)
+    shadow.add("broken", make_serving(FailingModel()))
+    shadow.add("challenger", make_serving(ConstantModel(0.6)))
+    shadow.submit([{"a": 1}, {"a": 2}], [0.2, 0.9], "1", 0.5)
+    shadow.start()
+    shadow.stop()
+
+    assert shadow.counts == {"queued": 2, "shed": 0, "scored": 2, "failed": 2}
+    rows = {name: [row for row in read_log(tmp_path / "log.sqlite") if row["shadow"] == name] for name in ["broken", "challenger"]}
+    assert all(row["error"] == "shadow model failed" and row["shadow_probability"] is None and row["agree"] is None
+               for row in rows["broken"])
+    assert [row["shadow_probability"] for row in rows["challenger"]] == [0.6, 0.6]
+    assert {summary["shadow"]: summary["errors"] for summary in shadow.describe()["summary"]} == {"broken": 2, "challenger": 0}
+
+
+# A batch lost by the dispatcher is counted as failed & the dispatcher keeps serving the next batches
+def test_dispatcher_failure(tmp_path):
+    shadow = ShadowScorer(FailingLog(tmp_path / "log.sqlite", failures=1), max_wait_ms=10)
+    shadow.add("challenger", make_serving(ConstantModel(0.6)))
+    shadow.start()
+    shadow.submit([{"a": 1}, {"a": 2}], [0.2, 0.9], "1", 0.5)
+    deadline = time.time() + 10
+    while shadow.pending and time.time() < deadline:
+        time.sleep(0.01)
+    assert shadow.pending == 0
+    assert shadow.counts == {"queued": 2, "shed": 0, "scored": 0, "failed": 2}
+    assert shadow.last_error == "database is locked"
+
+    shadow.submit([{"a": 3}], [0.2], "1", 0.5)
+    shadow.stop()
+    assert shadow.counts == {"queued": 3, "shed": 0, "scored": 1, "failed": 2}
+    assert len(read_log(tmp_path / "log.sqlite")) == 1
@@ -0,0 +1,47 @@
+import pytest
+import numpy as np
+from sklearn.metrics import precision_recall_curve, average_precision_score, f1_score
+from data_preprocessing.tuning import threshold_curve, average_precision, best_threshold
+
+
+# Same curve as sklearn's precision_recall_curve (which lists the thresholds in increasing order)
+def test_threshold_curve_matches_sklearn():
+    rng = np.random.default_rng(0)
+    y = rng.binomial(1, 0.3, 500)
+    probs = np.round(rng.random(500), 2) # with ties
+    curve = threshold_curve(y, probs)
+    precision, recall, thresholds = precision_recall_curve(y, probs)
+    np.testing.assert_array_equal(curve["thresholds"], thresholds[::-1])
+    np.testing.assert_allclose(curve["precision"], precision[:-1][::-1])
+    np.testing.assert_allclose(curve["recall"], recall[:-1][::-1])
+    assert np.isclose(average_precision(curve), average_precision_score(y, probs))
+
+    best = best_threshold(y, probs)
+    assert np.isclose(best["f1"], f1_score(y, probs >= best["threshold"]))
+    assert best["f1"] == curve["f1"].max()
+
+
+# Without positive records recall & F1 are undefined: set to zero_division, as sklearn does, instead of NaN
+@pytest.mark.parametrize("zero_division", [0.0, 1.0])
+def test_no_positives(zero_division):
+    y, probs = np.zeros(4, dtype=int), np.array([0.9, 0.4, 0.4, 0.1])
+    curve = threshold_curve(y, probs, zero_division)
+    assert not any(np.isnan(values).any() for values in curve.values())
+    np.testing.assert_array_equal(curve["precision"], [0, 0, 0])
+    np.testing.assert_array_equal(curve["recall"], [zero_division] * 3)
+    np.testing.assert_array_equal(curve["f1"], [0, 0, 0])
+    with np.errstate(all="raise"):
+        best = best_threshold(y, probs, zero_division)
+    assert best["threshold"] == 0.9 and best["recall"] == zero_division
+    assert best["average_precision"] == 0
+
+
+def test_all_positives_and_empty():
+    curve = threshold_curve(np.ones(3), np.array([0.2, 0.2, 0.7]))
+    np.testing.assert_array_equal(curve["precision"], [1, 1])
+    np.testing.assert_allclose(curve["recall"], [1 / 3, 1])
+
+    curve = threshold_curve([], [])
+    assert all(len(values) == 0 for values in curve.values())
+    with pytest.raises(ValueError):
+        best_threshold([], [])
@@ -0,0 +1,77 @@
+import gc
+import threading
+import numpy as np
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from config import MODEL_ARTIFACT_DIR
+from worker_pool import ModelWorkerPool, score_chunk
+from model_loader import load_ensemble, prepare_model
+from data_preprocessing.artifact import load_artifact
+
+# Lock held by a thread of the API process while a pool starts (a forked child inherits it held)
+_held_lock = threading.Lock()
+
+
+def prepare_under_lock(fitted_model):
+    if not _held_lock.acquire(timeout=2):
+        raise RuntimeError("Lock inherited held from the parent process")
+    _held_lock.release()
+    return fitted_model
+
+
+@pytest.fixture
+def lock_held_by_thread():
+    acquired, release = threading.Event(), threading.Event()
+
+    def hold():
+        with _held_lock:
+            acquired.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    acquired.wait()
+    yield
+    release.set()
+    thread.join()
+
+
+@pytest.mark.parametrize("load", ["artifact", "pickle"])
+def test_forkserver_pool_matches_in_process(serving_examples, load):
+    if load == "artifact":
+        fitted_model, prepare = load_artifact(MODEL_ARTIFACT_DIR), None
+    else:
+        fitted_model, prepare = load_ensemble(), prepare_model # notebook ensemble, pickled by value for the workers
+    model = prepare(fitted_model) if prepare is not None else fitted_model
+
+    pool = ModelWorkerPool(fitted_model, prepare, 1, start_method="forkserver")
+    try:
+        probs, errors = pool.submit_chunk(serving_examples.copy()).result(timeout=300)
+    finally:
+        pool.shutdown()
+    expected, expected_errors = score_chunk(model, serving_examples.copy())
+    np.testing.assert_allclose(probs, expected, atol=1e-9)
+    assert errors == expected_errors == {}
+
+
+# Workers of a pool started while another thread holds a lock: forked ones inherit it held, others start clean
+@pytest.mark.filterwarnings("ignore:This process .* is multi-threaded")
+def test_pool_started_while_lock_held(lock_held_by_thread):
+    with pytest.raises(BrokenProcessPool):
+        ModelWorkerPool(None, prepare_under_lock, 1, start_method="fork")
+
+    pool = ModelWorkerPool(None, prepare_under_lock, 1, start_method="forkserver")
+    pool.shutdown()
+    assert gc.get_freeze_count() == 0
+
+
+# The GC freeze of the forked pools is lifted only when the last of them shuts down
+def test_gc_freeze_lifted_by_last_forked_pool():
+    first, second = ModelWorkerPool(None, None, 1), ModelWorkerPool(None, None, 1)
+    assert gc.get_freeze_count() > 0
+    first.shutdown()
+    assert gc.get_freeze_count() > 0
+    first.shutdown() # shutting a pool down twice doesn't release the freeze of the others
+    assert gc.get_freeze_count() > 0
+    second.shutdown()
+    assert gc.get_freeze_count() == 0
@@ -0,0 +1,16 @@
+import numpy as np
+from data_preprocessing.preprocessor import build_shared_ensemble
+from data_preprocessing.xgb_native import NativeXGBClassifier, use_native_xgboost
+
+
+def test_native_adapters_leave_fitted_model_untouched(ensemble_model, serving_examples):
+    xgb_estimator = ensemble_model.xgb_pipeline.steps[-1][1]
+    model = use_native_xgboost(build_shared_ensemble(ensemble_model))
+
+    # The scoring model predicts with the adapter, the fitted ensemble still with its own classifier
+    assert isinstance(model.pipelines[1].steps[-1][1], NativeXGBClassifier)
+    assert isinstance(model.branches_[1].steps[-1][1], NativeXGBClassifier)
+    assert ensemble_model.xgb_pipeline.steps[-1][1] is xgb_estimator
+
+    expected = ensemble_model.predict_proba(serving_examples.copy())
+    np.testing.assert_allclose(model.predict_proba(serving_examples.copy()), expected, atol=1e-6)
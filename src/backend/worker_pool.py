@@ -0,0 +1,152 @@
+import gc
+import os
+import pickle
+import asyncio
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from data_preprocessing.fast_scorer import CompiledScorer
+from instrumentation import unwrap_model
+
+# Pool of scoring worker processes sharing the model loaded by the parent
+# The workers are forked right after the model is unpickled, so its memory pages are shared copy-on-write
+# & no worker pays the unpickling time again
+# Pools created while the API serves (hot swaps, rollbacks & shadow models) are not forked: the API process then runs
+# threads (event loop, threadpool, shadow dispatcher), & a child forked while one of them holds a lock would wait on it
+# forever. Their workers are started from a fork server (or spawned) & get the model pickled instead
+
+# Model of the current worker process (set by the pool initializer), its fitted model & explainer (built on first use)
+_worker_model = None
+_worker_fitted_model = None
+_worker_explainer = None
+
+# Forked pools alive: the GC freeze they rely on is lifted when the last one shuts down
+_forked_pools = 0
+_forked_pools_lock = threading.Lock()
+
+
+def _init_worker(prepare_model, fitted_model, nice=0):
+    global _worker_model, _worker_fitted_model
+    if nice:
+        os.nice(nice) # lower CPU priority (e.g. shadow models, which must not slow down the serving model)
+    if isinstance(fitted_model, bytes):
+        fitted_model = pickle.loads(fitted_model) # sent by a pool that is not forked
+    _worker_model = prepare_model(fitted_model) if prepare_model is not None else fitted_model
+    _worker_fitted_model = fitted_model
+
+
+def _worker_predict_proba(records):
+    return _worker_model.predict_proba(records)
+
+
+# Probabilities for class=1 of a chunk (dataframe) of records & the errors of the records that could not be scored
+def score_chunk(model, X):
+    probs, errors = np.full(len(X), np.nan), {}
+    # Copy-free pipelines modify their input, so the rows are kept intact for the fallback
+    predict = lambda X_rows: (model.predict_proba(X_rows if isinstance(unwrap_model(model), CompiledScorer) else X_rows.copy())[:, 1],)
+    _score_rows(predict, X, 0, len(X), [probs], errors)
+    return probs, errors
+
+
+# Probabilities, contributions of the raw fields (see ReasonExplainer) & errors of a chunk of records
+def explain_chunk(explainer, X):
+    probs, errors = np.full(len(X), np.nan), {}
+    contributions = np.full((len(X), len(explainer.fields)), np.nan)
+    predict = lambda X_rows: explainer.explain(X_rows)[::2] # probabilities & contributions
+    _score_rows(predict, X, 0, len(X), [probs, contributions], errors)
+    return probs, contributions, errors
+
+
+def _score_rows(predict, X, start, stop, outputs, errors):
+    try:
+        for output, values in zip(outputs, predict(X.iloc[start:stop])):
+            output[start:stop] = values
+        return
+    except Exception as e:
+        if stop - start == 1:
+            errors[start] = str(e)
+            return
+
+    # An invalid record fails all the rows scored with it, so the rows are split in halves to isolate it
+    middle = (start + stop) // 2
+    _score_rows(predict, X, start, middle, outputs, errors)
+    _score_rows(predict, X, middle, stop, outputs, errors)
+
+
+def _worker_score_chunk(X):
+    return score_chunk(_worker_model, X)
+
+
+def _worker_explain_chunk(X, exact=False):
+    global _worker_explainer
+    if _worker_explainer is None:
+        from config import MODEL_ARTIFACT_DIR
+        from data_preprocessing.explainer import build_explainer
+        _worker_explainer = build_explainer(_worker_fitted_model, MODEL_ARTIFACT_DIR, exact)
+    return explain_chunk(_worker_explainer, X)
+
+
+class ModelWorkerPool:
+    def __init__(self, fitted_model, prepare_model, n_workers, nice=0, start_method="fork"):
+        global _forked_pools
+        self.n_workers = n_workers
+        self.start_method = start_method
+        self._is_frozen = start_method == "fork"
+
+        if self._is_frozen:
+            # Objects alive before the fork are moved out of the GC generations,
+            # so collections in the workers don't write to (& un-share) their pages
+            with _forked_pools_lock:
+                _forked_pools += 1
+                gc.freeze()
+        else:
+            # The notebook ensembles are classes pickled by value (cloudpickle), which the standard pickle of the
+            # pool arguments cannot serialize
+            import cloudpickle
+            fitted_model = cloudpickle.dumps(fitted_model)
+
+        # The workers prepare their own scoring model (compiled scorer or pipelines) from the shared fitted model,
+        # so XGBoost's OpenMP runtime is never used by the parent before forking (a compiled artifact needs no preparation)
+        self._executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(prepare_model, fitted_model, nice)
+        )
+
+        # With fork, all the workers are started on the first submission (otherwise, as submissions find them busy)
+        try:
+            self._executor.submit(int).result()
+        except Exception:
+            self.shutdown() # e.g. a failing initializer
+            raise
+
+    def predict_proba(self, records):
+        return self._executor.submit(_worker_predict_proba, records).result()
+
+    def submit_chunk(self, X):
+        # Future of score_chunk on a worker
+        return self._executor.submit(_worker_score_chunk, X)
+
+    def submit_explain_chunk(self, X, exact=False):
+        # Future of explain_chunk on a worker
+        return self._executor.submit(_worker_explain_chunk, X, exact)
+
+    # Score records once on every worker (the calls are submitted together, so each idle worker takes one)
+    def warm_up(self, records):
+        futures = [self._executor.submit(_worker_predict_proba, records) for _ in range(self.n_workers)]
+        return [future.result() for future in futures]
+
+    async def predict_proba_async(self, records):
+        return await asyncio.wrap_future(self._executor.submit(_worker_predict_proba, records))
+
+    def shutdown(self):
+        global _forked_pools
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._is_frozen:
+            with _forked_pools_lock:
+                self._is_frozen = False
+                _forked_pools -= 1
+                if _forked_pools == 0:
+                    gc.unfreeze()
@@ -0,0 +1 @@
+from loantap_client.client import DEFAULT_BASE_URL, LoanTapError, LoanTapClient, AsyncLoanTapClient
@@ -0,0 +1,180 @@
+import os
+import time
+import random
+import asyncio
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+
+# Clients of the Loan Defaulter API
+# Both keep a pool of keep-alive connections, time out every call & retry the calls that failed on the way (connection
+# errors, timeouts, 429 & 5xx answers of a busy or restarting API) with exponential backoff. Scoring is idempotent,
+# so a retried call never scores a record twice in a way that matters. Many records are sent as /predict_batch calls of
+# batch_size records, up to max_concurrency at a time, & the results come back in input order.
+
+DEFAULT_BASE_URL = os.getenv("LOANTAP_API_URL", "http://fastapi-app:8000/api/v1")
+
+# Answers worth retrying (the API is overloaded, restarting or behind a failing proxy)
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+# Error answer of the API (4xx after validation, or a call still failing after the retries)
+class LoanTapError(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+# Options shared by the sync & async clients
+class ClientConfig:
+    def __init__(self, base_url=DEFAULT_BASE_URL, timeout=10.0, connect_timeout=2.0, retries=2, backoff_s=0.2,
+                 batch_size=1000, max_concurrency=4, max_connections=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        # One connection per concurrent batch call, plus one for single-record calls
+        max_connections = max_connections or max_concurrency + 1
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+    # Wait before a retry: exponential backoff with jitter (so retrying clients don't hit the API together)
+    def get_backoff(self, attempt):
+        return self.backoff_s * 2 ** attempt * (0.5 + random.random() / 2)
+
+
+def check_response(response):
+    if response.status_code >= 400:
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        raise LoanTapError(response.status_code, detail)
+    return response.json()
+
+
+def predict_params(explain, top_k):
+    params = {}
+    if explain:
+        params["explain"] = "true"
+        if top_k is not None:
+            params["top_k"] = top_k
+    return params
+
+
+# Chunks of records (with the position of their first record) sent as one /predict_batch call each
+def iter_batches(records, batch_size):
+    records = list(records)
+    for start in range(0, len(records), batch_size):
+        yield start, records[start:start + batch_size]
+
+
+# Results of the batch calls merged back into one list, indexed by the position of the records in the input
+def merge_batches(batch_results):
+    results = []
+    for start, batch in batch_results:
+        for result in batch["results"]:
+            results.append({**result, "index": start + result["index"]})
+    return results
+
+
+# Pooled client for scripts, bulk jobs & the Streamlit frontend (thread-safe, one per process)
+class LoanTapClient:
+    def __init__(self, base_url=DEFAULT_BASE_URL, transport=None, **options):
+        self.config = ClientConfig(base_url, **options)
+        self._client = httpx.Client(base_url=self.config.base_url, timeout=self.config.timeout,
+                                    limits=self.config.limits, transport=transport)
+
+    def request(self, method, path, **kwargs):
+        for attempt in range(self.config.retries + 1):
+            try:
+                response = self._client.request(method, path, **kwargs)
+            except httpx.TransportError as e: # connection errors & timeouts
+                if attempt == self.config.retries:
+                    raise LoanTapError(None, f"{type(e).__name__}: {e}") from e
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.config.retries:
+                    return check_response(response)
+            time.sleep(self.config.get_backoff(attempt))
+
+    # Label of a record ("Defaulter" or "Not a defaulter"), or {prediction, probability, reasons} with explain=True
+    def predict(self, record, explain=False, top_k=None):
+        return self.request("POST", "/predict", json=record, params=predict_params(explain, top_k))
+
+    # Result of every record, in input order: {index, probability, prediction} or {index, errors}
+    def predict_batch(self, records, explain=False, top_k=None):
+        params = predict_params(explain, top_k)
+        send = lambda batch: (batch[0], self.request("POST", "/predict_batch", json=batch[1], params=params))
+        batches = list(iter_batches(records, self.config.batch_size))
+        if len(batches) <= 1:
+            return merge_batches(map(send, batches))
+        with ThreadPoolExecutor(max_workers=min(self.config.max_concurrency, len(batches))) as executor:
+            return merge_batches(executor.map(send, batches))
+
+    # Whether the model is loaded & warm
+    def is_ready(self):
+        try:
+            self.request("GET", "/ready")
+            return True
+        except LoanTapError:
+            return False
+
+    def close(self):
+        self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Asynchronous counterpart, for asyncio services & jobs (one per event loop)
+class AsyncLoanTapClient:
+    def __init__(self, base_url=DEFAULT_BASE_URL, transport=None, **options):
+        self.config = ClientConfig(base_url, **options)
+        self._client = httpx.AsyncClient(base_url=self.config.base_url, timeout=self.config.timeout,
+                                         limits=self.config.limits, transport=transport)
+
+    async def request(self, method, path, **kwargs):
+        for attempt in range(self.config.retries + 1):
+            try:
+                response = await self._client.request(method, path, **kwargs)
+            except httpx.TransportError as e: # connection errors & timeouts
+                if attempt == self.config.retries:
+                    raise LoanTapError(None, f"{type(e).__name__}: {e}") from e
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.config.retries:
+                    return check_response(response)
+            await asyncio.sleep(self.config.get_backoff(attempt))
+
+    async def predict(self, record, explain=False, top_k=None):
+        return await self.request("POST", "/predict", json=record, params=predict_params(explain, top_k))
+
+    async def predict_batch(self, records, explain=False, top_k=None):
+        params = predict_params(explain, top_k)
+        slots = asyncio.Semaphore(self.config.max_concurrency)
+
+        async def send(start, batch):
+            async with slots:
+                return start, await self.request("POST", "/predict_batch", json=batch, params=params)
+
+        batches = iter_batches(records, self.config.batch_size)
+        return merge_batches(await asyncio.gather(*[send(start, batch) for start, batch in batches]))
+
+    async def is_ready(self):
+        try:
+            await self.request("GET", "/ready")
+            return True
+        except LoanTapError:
+            return False
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -1,6 +1,14 @@
-import requests
+import pandas as pd
 import streamlit as st
 from datetime import date
+from loantap_client import LoanTapClient, LoanTapError
+
+
+# Pooled client of the API, shared by the sessions of this Streamlit server (base URL from LOANTAP_API_URL)
+@st.cache_resource
+def get_client():
+    return LoanTapClient(timeout=10.0, retries=2)
+
 
 # Request processing function
 def predict():
@@ -44,18 +52,28 @@ def predict():
         "address": st.session_state.address,
     }
 
-    server_url = "http://fastapi-app:8000/api/v1/predict"
     try:
-        response = requests.post(
-            url=server_url,
-            json=model_input
-        )
-        if response.text.strip('"').startswith("Not"):
-            st.markdown(f"<p style='text-align: center; color: green; font-size: 20px;'>Prediction: {response.text.strip('"')}</p>", unsafe_allow_html=True)
+        prediction = get_client().predict(model_input)
+        if prediction.startswith("Not"):
+            st.markdown(f"<p style='text-align: center; color: green; font-size: 20px;'>Prediction: {prediction}</p>", unsafe_allow_html=True)
         else:
-            st.markdown(f"<p style='text-align: center; color: red; font-size: 20px;'>Prediction: {response.text.strip('"')}</p>", unsafe_allow_html=True)
-    except Exception as e:
+            st.markdown(f"<p style='text-align: center; color: red; font-size: 20px;'>Prediction: {prediction}</p>", unsafe_allow_html=True)
+    except LoanTapError as e:
+        st.write(f"Error occurred: {e}")
+
+
+# Score a CSV file of records (columns as in the form's model input) with batch calls
+def predict_file(uploaded_file):
+    records = pd.read_csv(uploaded_file)
+    records = records.astype(object).where(records.notna(), None) # missing values as None
+    try:
+        results = get_client().predict_batch(records.to_dict(orient="records"))
+    except LoanTapError as e:
         st.write(f"Error occurred: {e}")
+        return
+    results = pd.DataFrame(results).set_index("index").reindex(range(len(records)))
+    st.dataframe(results, use_container_width=True)
+    st.download_button("Download predictions", results.to_csv().encode(), file_name="predictions.csv", mime="text/csv")
 
 
 # Application title
@@ -110,4 +128,10 @@ with form_container:
     submit = st.form_submit_button(label="Predict", type="primary", use_container_width=True)
 
 if submit:
-    predict()
\ No newline at end of file
+    predict()
+
+# Many applicants at once, from a CSV file
+with st.expander("Score a CSV file of applicants"):
+    uploaded_file = st.file_uploader(label="CSV file with one applicant per row", type="csv")
+    if uploaded_file is not None and st.button(label="Predict all", use_container_width=True):
+        predict_file(uploaded_file)
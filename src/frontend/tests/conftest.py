@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# Tests of the client package shipped with the frontend
+# Run from the repository root or src/frontend: python -m pytest src/frontend/tests
+# The frontend is appended to the path, as its main.py would shadow the backend's in a run of both test suites
+FRONTEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(FRONTEND_DIR))
@@ -0,0 +1,175 @@
+import json
+import time
+import asyncio
+import threading
+import httpx
+import pytest
+from loantap_client import LoanTapClient, AsyncLoanTapClient, LoanTapError
+
+BASE_URL = "http://api.test/api/v1"
+
+
+# Handler answering with the given failures first ("connect", "timeout" or a status code), then with a label
+class FlakyHandler:
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def __call__(self, request):
+        self.calls += 1
+        if self.failures:
+            failure = self.failures.pop(0)
+            if failure == "connect":
+                raise httpx.ConnectError("connection refused", request=request)
+            if failure == "timeout":
+                raise httpx.ReadTimeout("timed out", request=request)
+            return httpx.Response(failure, json={"detail": "unavailable"})
+        return httpx.Response(200, json="Not a defaulter")
+
+
+# /predict_batch answers (records are numbers: negative ones are rejected), the later batches answered first,
+# with the peak number of calls in flight
+class BatchHandler:
+    def __init__(self):
+        self.in_flight = self.peak = self.calls = 0
+        self._lock = threading.Lock()
+
+    def answer(self, request):
+        records = json.loads(request.content)
+        results = [{"index": idx, "errors": ["invalid"]} if record < 0 else
+                   {"index": idx, "probability": record / 1000, "prediction": "Not a defaulter"}
+                   for idx, record in enumerate(records)]
+        return httpx.Response(200, json={"results": results})
+
+    def delay(self, request):
+        return 0.05 / (1 + abs(json.loads(request.content)[0]))
+
+    def enter(self):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def __call__(self, request):
+        self.enter()
+        try:
+            time.sleep(self.delay(request))
+            return self.answer(request)
+        finally:
+            self.exit()
+
+
+class AsyncBatchHandler(BatchHandler):
+    async def __call__(self, request):
+        self.enter()
+        try:
+            await asyncio.sleep(self.delay(request))
+            return self.answer(request)
+        finally:
+            self.exit()
+
+
+def make_client(handler, **options):
+    return LoanTapClient(BASE_URL, transport=httpx.MockTransport(handler), backoff_s=0, **options)
+
+
+def make_async_client(handler, **options):
+    return AsyncLoanTapClient(BASE_URL, transport=httpx.MockTransport(handler), backoff_s=0, **options)
+
+
+def check_merged(results, records):
+    assert [result["index"] for result in results] == list(range(len(records)))
+    for result, record in zip(results, records):
+        if record < 0:
+            assert result["errors"] == ["invalid"] and "probability" not in result
+        else:
+            assert result["probability"] == record / 1000
+
+
+@pytest.mark.parametrize("failures", [[429], [503, 502], ["connect"], ["timeout", 504]])
+def test_retried_failures(failures):
+    handler = FlakyHandler(failures)
+    with make_client(handler, retries=2) as client:
+        assert client.predict({"loan_amnt": 1000}) == "Not a defaulter"
+    assert handler.calls == len(failures) + 1
+
+
+def test_retries_used_up():
+    handler = FlakyHandler([503] * 3)
+    with make_client(handler, retries=2) as client, pytest.raises(LoanTapError) as error:
+        client.predict({"loan_amnt": 1000})
+    assert handler.calls == 3
+    assert error.value.status_code == 503 and error.value.detail == "unavailable"
+    assert str(error.value) == "503: unavailable"
+
+    handler = FlakyHandler(["connect"] * 2)
+    with make_client(handler, retries=1) as client, pytest.raises(LoanTapError) as error:
+        client.predict({"loan_amnt": 1000})
+    assert handler.calls == 2
+    assert error.value.status_code is None and error.value.detail == "ConnectError: connection refused"
+
+
+# Validation errors are returned at once, with the detail of the API (or the body of a non-JSON answer)
+def test_client_errors_not_retried():
+    details = [{"loc": ["body", "loan_amnt"], "msg": "Input should be greater than 0"}]
+    answers = iter([httpx.Response(422, json={"detail": details}), httpx.Response(404, text="Not Found")])
+    calls = []
+    handler = lambda request: calls.append(request) or next(answers)
+    with make_client(handler, retries=2) as client:
+        with pytest.raises(LoanTapError) as error:
+            client.predict({"loan_amnt": -1})
+        assert error.value.status_code == 422 and error.value.detail == details
+        with pytest.raises(LoanTapError) as error:
+            client.predict({"loan_amnt": 1})
+        assert error.value.status_code == 404 and error.value.detail == "Not Found"
+    assert len(calls) == 2
+
+
+def test_explain_params():
+    requests = []
+    handler = lambda request: requests.append(request) or httpx.Response(200, json={"prediction": "Defaulter"})
+    with make_client(handler) as client:
+        client.predict({"loan_amnt": 1000})
+        client.predict({"loan_amnt": 1000}, explain=True, top_k=3)
+    assert [dict(request.url.params) for request in requests] == [{}, {"explain": "true", "top_k": "3"}]
+
+
+# Batches answered out of order are merged back in input order, within max_concurrency calls at a time
+def test_batches_merged_in_input_order():
+    records = [-1 if idx % 7 == 0 else idx for idx in range(103)]
+    handler = BatchHandler()
+    with make_client(handler, batch_size=10, max_concurrency=3) as client:
+        results = client.predict_batch(records)
+    check_merged(results, records)
+    assert handler.calls == 11 and 1 < handler.peak <= 3
+
+
+def test_async_batches_merged_in_input_order():
+    records = [-1 if idx % 7 == 0 else idx for idx in range(103)]
+    handler = AsyncBatchHandler()
+
+    async def run():
+        async with make_async_client(handler, batch_size=10, max_concurrency=3) as client:
+            return await client.predict_batch(records)
+
+    check_merged(asyncio.run(run()), records)
+    assert handler.calls == 11 and 1 < handler.peak <= 3
+
+
+def test_async_retries():
+    async def run(handler, retries):
+        async with make_async_client(handler, retries=retries) as client:
+            return await client.predict({"loan_amnt": 1000})
+
+    handler = FlakyHandler(["connect", 429])
+    assert asyncio.run(run(handler, retries=2)) == "Not a defaulter"
+    assert handler.calls == 3
+
+    handler = FlakyHandler([503] * 2)
+    with pytest.raises(LoanTapError) as error:
+        asyncio.run(run(handler, retries=1))
+    assert handler.calls == 2 and error.value.status_code == 503